@@ -0,0 +1,28 @@
+"""
+Python client for the Task Management APIs
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+
+One client for the Django, Flask and FastAPI services and the dashboard
+gateway. It keeps a pool of keep-alive connections, keeps each service's
+tokens and refreshes Django's access token before it expires or when a
+request is rejected, retries failed requests with jittered backoff, pages
+through listings with generators and uses the bulk endpoints for batches:
+
+    from taskmanager_client import Client
+
+    with Client() as api:
+        api.login('alice', 'secret')
+        api.create_tasks([{'title': f'Task {i}'} for i in range(5000)])
+        for task in api.iter_tasks(status='todo'):
+            print(task['title'])
+
+``AsyncClient`` offers the same methods for asyncio.
+"""
+
+from ._base import APIError, AuthenticationError, RetryPolicy, Tokens
+from .aio import AsyncClient
+from .sync import Client
+
+__all__ = ['APIError', 'AsyncClient', 'AuthenticationError', 'Client', 'RetryPolicy', 'Tokens']
@@ -0,0 +1,245 @@
+"""
+Shared parts of the sync and async clients
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+
+Configuration, errors, the retry policy, token bookkeeping and the endpoints
+that are a single request, which ``Client`` and ``AsyncClient`` both inherit.
+On ``AsyncClient`` those methods return coroutines.
+"""
+
+import base64
+import json
+import os
+import random
+import time
+from dataclasses import dataclass
+
+import httpx
+
+# Base URL of each service, overridable with TASKMANAGER_<SERVICE>_URL
+DEFAULT_URLS = {
+    'django': 'http://localhost:8000/api',
+    'flask': 'http://localhost:5000/api',
+    'fastapi': 'http://localhost:8001/api',
+    'gateway': 'http://localhost:8002/api',
+}
+
+# Largest batch the Django bulk endpoint takes (TASK_BULK_MAX_ITEMS)
+BULK_MAX_ITEMS = 1000
+
+# Methods that can be sent again after a failure without doing the work twice
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+
+# Statuses worth retrying. 429 and 503 mean the request was not processed,
+# so they are retried for every method; 502 and 504 only when idempotent.
+RETRY_ANY_METHOD = {429, 503}
+RETRY_IDEMPOTENT = {502, 504}
+
+# Errors raised before the request reached the server
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+# Refresh an access token this many seconds before it expires
+REFRESH_LEEWAY = 30
+
+
+class APIError(Exception):
+    """A service answered with an error status."""
+
+    def __init__(self, status, data, method, url):
+        super().__init__(f'{method} {url} returned {status}: {data}')
+        self.status = status
+        self.data = data
+
+
+class AuthenticationError(APIError):
+    """A service rejected the credentials, even after a token refresh."""
+
+
+@dataclass
+class Tokens:
+    """The JWTs a client holds for one service."""
+    access: str = None
+    refresh: str = None
+
+    def expiring(self):
+        """Whether the access token expires within REFRESH_LEEWAY seconds."""
+        expires_at = _jwt_expiry(self.access)
+        return expires_at is not None and expires_at - REFRESH_LEEWAY < time.time()
+
+
+def _jwt_expiry(token):
+    # Read without verifying: only the services check signatures
+    if not token:
+        return None
+    try:
+        payload = token.split('.')[1]
+        return json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))['exp']
+    except (IndexError, KeyError, ValueError):
+        return None
+
+
+@dataclass
+class RetryPolicy:
+    """Retries with exponential backoff and full jitter.
+
+    Attempt ``n`` waits a random time between 0 and ``backoff * 2 ** n``
+    seconds, at most ``max_backoff``, or the ``Retry-After`` the service
+    asked for, so clients that failed together do not retry together.
+    """
+    retries: int = 3
+    backoff: float = 0.2
+    max_backoff: float = 5.0
+
+    def delay(self, method, attempt, response=None, error=None):
+        """Seconds to wait before retrying, or None to give up."""
+        if attempt >= self.retries:
+            return None
+        if error is not None:
+            if not isinstance(error, NOT_SENT_ERRORS) and method not in IDEMPOTENT_METHODS:
+                return None
+        elif not (response.status_code in RETRY_ANY_METHOD
+                  or response.status_code in RETRY_IDEMPOTENT and method in IDEMPOTENT_METHODS):
+            return None
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(float(retry_after), self.max_backoff))
+        return delay
+
+
+def _result(response):
+    """The decoded body of a successful response; raise APIError otherwise."""
+    try:
+        data = response.json() if response.content else None
+    except ValueError:
+        data = response.text
+    if response.status_code >= 400:
+        error = AuthenticationError if response.status_code == 401 else APIError
+        raise error(response.status_code, data, response.request.method, response.request.url)
+    return data
+
+
+def _chunks(items, size=BULK_MAX_ITEMS):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class BaseClient:
+    """Settings and endpoints shared by ``Client`` and ``AsyncClient``.
+
+    ``urls`` overrides the base URL of any of the services in DEFAULT_URLS.
+    Flask does not issue tokens, so its token is passed as ``flask_token``.
+    ``pool_size`` keep-alive connections are kept per service.
+    """
+
+    def __init__(self, urls=None, *, flask_token=None, timeout=10.0, pool_size=10,
+                 retries=3, backoff=0.2, max_backoff=5.0):
+        self.urls = {
+            service: os.environ.get(f'TASKMANAGER_{service.upper()}_URL', url).rstrip('/')
+            for service, url in DEFAULT_URLS.items()
+        }
+        self.urls.update({service: url.rstrip('/') for service, url in (urls or {}).items()})
+        self.tokens = {'django': Tokens(), 'flask': Tokens(access=flask_token), 'fastapi': Tokens()}
+        self.retry = RetryPolicy(retries, backoff, max_backoff)
+        self._http_options = {
+            'timeout': timeout,
+            'limits': httpx.Limits(max_connections=pool_size * len(self.urls),
+                                   max_keepalive_connections=pool_size * len(self.urls)),
+        }
+
+    def _headers(self, service):
+        tokens = self.tokens.get(service, self.tokens['django'])
+        headers = {}
+        if tokens.access:
+            headers['Authorization'] = f'Bearer {tokens.access}'
+        if service == 'gateway':
+            # The gateway passes each service its own token
+            for name in ('flask', 'fastapi'):
+                if self.tokens[name].access:
+                    headers[f'X-{name.capitalize()}-Authorization'] = f'Bearer {self.tokens[name].access}'
+        return headers
+
+    def _url(self, service, path):
+        # Pagination links are absolute
+        return path if path.startswith(('http://', 'https://')) else self.urls[service] + path
+
+    def _store_tokens(self, data):
+        tokens = data.get('tokens', data)
+        self.tokens['django'].access = tokens['access']
+        self.tokens['django'].refresh = tokens.get('refresh', self.tokens['django'].refresh)
+        return data
+
+    @staticmethod
+    def _task_list_path(search, status, priority, overdue):
+        if sum(bool(f) for f in (search, status, priority, overdue)) > 1:
+            raise ValueError('The task listings take one of search, status, priority or overdue')
+        if search:
+            return '/tasks/search/', {'q': search}
+        if status:
+            return '/tasks/by_status/', {'status': status}
+        if priority:
+            return '/tasks/by_priority/', {'priority': priority}
+        if overdue:
+            return '/tasks/overdue/', {}
+        return '/tasks/', {}
+
+    # Django
+    def profile(self):
+        return self._request('django', 'GET', '/users/profile/')
+
+    def get_task(self, task_id, include_archived=False):
+        params = {'include_archived': 'true'} if include_archived else None
+        return self._request('django', 'GET', f'/tasks/{task_id}/', params=params)
+
+    def create_task(self, **fields):
+        return self._request('django', 'POST', '/tasks/', json=fields)
+
+    def update_task(self, task_id, **fields):
+        return self._request('django', 'PATCH', f'/tasks/{task_id}/', json=fields)
+
+    def delete_task(self, task_id):
+        return self._request('django', 'DELETE', f'/tasks/{task_id}/')
+
+    def complete_task(self, task_id):
+        return self._request('django', 'POST', f'/tasks/{task_id}/complete/')
+
+    def cancel_task(self, task_id):
+        return self._request('django', 'POST', f'/tasks/{task_id}/cancel/')
+
+    def graphql(self, query, variables=None):
+        """Run a query on the GraphQL endpoint; return the whole response body."""
+        return self._request('django', 'POST', '/graphql/', json={'query': query, 'variables': variables})
+
+    # Flask
+    def categories(self):
+        return self._request('flask', 'GET', '/categories')
+
+    def create_category(self, name, **fields):
+        return self._request('flask', 'POST', '/categories', json={'name': name, **fields})
+
+    def task_stats(self, include_archived=False):
+        params = {'include_archived': 'true'} if include_archived else None
+        return self._request('flask', 'GET', '/tasks/stats', params=params)
+
+    def patch_tasks(self, patch, *, ids=None, filter=None):
+        """Apply ``patch`` to the tasks selected by ``ids`` or ``filter`` in one request.
+
+        Flask only takes the columns it owns, i.e. ``category_id``; other
+        fields are changed with ``update_tasks``.
+        """
+        body = {'patch': patch, **({'ids': list(ids)} if filter is None else {'filter': filter})}
+        return self._request('flask', 'PATCH', '/tasks/bulk', json=body)
+
+    # FastAPI
+    def analytics(self, report='overview', include_archived=False):
+        """One of the analytics reports: overview, realtime, performance or insights."""
+        params = {'include_archived': 'true'} if include_archived else None
+        return self._request('fastapi', 'GET', f'/analytics/{report}', params=params)
+
+    # Gateway
+    def dashboard(self, sections=None):
+        params = {'sections': ','.join(sections)} if sections else None
+        return self._request('gateway', 'GET', '/dashboard', params=params)
@@ -0,0 +1,167 @@
+"""
+Asynchronous client for the Task Management APIs
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+
+The same methods as ``taskmanager_client.Client``, as coroutines, with the
+``iter_*`` helpers as async generators.
+"""
+
+import asyncio
+
+import httpx
+
+from ._base import AuthenticationError, BaseClient, _chunks, _result
+
+
+class AsyncClient(BaseClient):
+    """One pooled, keep-alive connection set to all services, for asyncio.
+
+    Use it as an async context manager, or await ``aclose()``. Requests may
+    run concurrently; a token refresh is shared by all of them.
+    """
+
+    def __init__(self, urls=None, **options):
+        super().__init__(urls, **options)
+        self._http = httpx.AsyncClient(**self._http_options)
+        self._refresh_lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._http.aclose()
+
+    async def _request(self, service, method, path, *, params=None, json=None, auth=True):
+        refreshes = service in ('django', 'gateway') and auth
+        if refreshes and self.tokens['django'].expiring():
+            await self._refresh(self.tokens['django'].access)
+        refreshed = False
+        attempt = 0
+        while True:
+            headers = self._headers(service) if auth else {}
+            try:
+                response = await self._http.request(method, self._url(service, path), params=params, json=json,
+                                                    headers=headers)
+            except httpx.TransportError as exc:
+                delay = self.retry.delay(method, attempt, error=exc)
+                if delay is None:
+                    raise
+            else:
+                if response.status_code == 401 and refreshes and not refreshed and self.tokens['django'].refresh:
+                    # Expired early or revoked: refresh once and send it again
+                    await self._refresh(headers.get('Authorization', '')[len('Bearer '):])
+                    refreshed = True
+                    continue
+                delay = self.retry.delay(method, attempt, response=response)
+                if delay is None:
+                    return _result(response)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _refresh(self, stale_access):
+        async with self._refresh_lock:
+            # Another request may have refreshed while this one waited
+            if self.tokens['django'].access == stale_access:
+                await self.refresh()
+
+    # Authentication
+    async def register(self, username, email, password, **fields):
+        """Register a user and keep its tokens; return the new user."""
+        data = await self._request('django', 'POST', '/users/register/', auth=False, json={
+            'username': username, 'email': email, 'password': password, 'password_confirm': password, **fields,
+        })
+        return self._store_tokens(data)['user']
+
+    async def login(self, username, password):
+        """Log in to Django and keep the tokens; return the user."""
+        data = await self._request('django', 'POST', '/users/login/', auth=False,
+                                   json={'username': username, 'password': password})
+        return self._store_tokens(data)['user']
+
+    async def refresh(self):
+        """Get a new access token with the refresh token."""
+        if not self.tokens['django'].refresh:
+            raise AuthenticationError(401, 'No refresh token, log in first', 'POST', '/token/refresh/')
+        self._store_tokens(await self._request('django', 'POST', '/token/refresh/', auth=False,
+                                               json={'refresh': self.tokens['django'].refresh}))
+
+    async def login_fastapi(self, username, password):
+        """Log in to the analytics API and keep its token."""
+        data = await self._request('fastapi', 'POST', '/auth/login', auth=False,
+                                   params={'username': username, 'password': password})
+        self.tokens['fastapi'].access = data['access_token']
+
+    # Pagination
+    async def paginate(self, service, path, params=None):
+        """Yield the items of a Django cursor-paginated listing, page after page."""
+        url = path
+        while url:
+            page = await self._request(service, 'GET', url, params=params)
+            for item in page['results']:
+                yield item
+            # The next link carries the query
+            url, params = page['next'], None
+
+    def iter_tasks(self, *, search=None, status=None, priority=None, overdue=False,
+                   include_archived=False, page_size=100):
+        """Yield the user's tasks, newest first, optionally filtered by one criterion."""
+        path, params = self._task_list_path(search, status, priority, overdue)
+        params['page_size'] = page_size
+        if include_archived:
+            params['include_archived'] = 'true'
+        return self.paginate('django', path, params)
+
+    async def iter_changes(self, cursor=None):
+        """Yield pages of the changes feed until caught up.
+
+        Each page has ``tasks``, ``deleted`` and the ``cursor`` to resume from.
+        """
+        while True:
+            page = await self._request('django', 'GET', '/tasks/changes/',
+                                       params={'cursor': cursor} if cursor else None)
+            yield page
+            if not page['more']:
+                return
+            cursor = page['cursor']
+
+    async def iter_filtered_tasks(self, per_page=100, **filters):
+        """Yield the tasks matching Flask's ``/api/tasks/filter`` parameters."""
+        page = 1
+        while True:
+            data = await self._request('flask', 'GET', '/tasks/filter',
+                                       params={**filters, 'page': page, 'per_page': per_page})
+            for task in data['tasks']:
+                yield task
+            if not data['pagination']['has_next']:
+                return
+            page += 1
+
+    # Bulk
+    async def create_tasks(self, tasks):
+        """Create many tasks with the bulk endpoint; return them.
+
+        Each batch of BULK_MAX_ITEMS is created atomically; the batches are not.
+        """
+        created = []
+        for chunk in _chunks(tasks):
+            created.extend((await self._request('django', 'POST', '/tasks/bulk/', json=chunk))['results'])
+        return created
+
+    async def update_tasks(self, changes):
+        """Partially update many tasks, each given as a dict with its ``id``; return them."""
+        updated = []
+        for chunk in _chunks(changes):
+            updated.extend((await self._request('django', 'PATCH', '/tasks/bulk/', json=chunk))['results'])
+        return updated
+
+    async def delete_tasks(self, ids):
+        """Delete many tasks by id; return how many were deleted."""
+        deleted = 0
+        for chunk in _chunks(ids):
+            deleted += (await self._request('django', 'DELETE', '/tasks/bulk/', json={'ids': chunk}))['deleted']
+        return deleted
@@ -0,0 +1,159 @@
+"""
+Synchronous client for the Task Management APIs
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+"""
+
+import threading
+import time
+
+import httpx
+
+from ._base import AuthenticationError, BaseClient, _chunks, _result
+
+
+class Client(BaseClient):
+    """One pooled, keep-alive connection set to all services.
+
+    Use it as a context manager, or call ``close()``, to close the
+    connections. It can be shared between threads.
+    """
+
+    def __init__(self, urls=None, **options):
+        super().__init__(urls, **options)
+        self._http = httpx.Client(**self._http_options)
+        self._refresh_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._http.close()
+
+    def _request(self, service, method, path, *, params=None, json=None, auth=True):
+        refreshes = service in ('django', 'gateway') and auth
+        if refreshes and self.tokens['django'].expiring():
+            self._refresh(self.tokens['django'].access)
+        refreshed = False
+        attempt = 0
+        while True:
+            headers = self._headers(service) if auth else {}
+            try:
+                response = self._http.request(method, self._url(service, path), params=params, json=json,
+                                              headers=headers)
+            except httpx.TransportError as exc:
+                delay = self.retry.delay(method, attempt, error=exc)
+                if delay is None:
+                    raise
+            else:
+                if response.status_code == 401 and refreshes and not refreshed and self.tokens['django'].refresh:
+                    # Expired early or revoked: refresh once and send it again
+                    self._refresh(headers.get('Authorization', '')[len('Bearer '):])
+                    refreshed = True
+                    continue
+                delay = self.retry.delay(method, attempt, response=response)
+                if delay is None:
+                    return _result(response)
+            time.sleep(delay)
+            attempt += 1
+
+    def _refresh(self, stale_access):
+        with self._refresh_lock:
+            # Another thread may have refreshed while this one waited
+            if self.tokens['django'].access == stale_access:
+                self.refresh()
+
+    # Authentication
+    def register(self, username, email, password, **fields):
+        """Register a user and keep its tokens; return the new user."""
+        data = self._request('django', 'POST', '/users/register/', auth=False, json={
+            'username': username, 'email': email, 'password': password, 'password_confirm': password, **fields,
+        })
+        return self._store_tokens(data)['user']
+
+    def login(self, username, password):
+        """Log in to Django and keep the tokens; return the user."""
+        data = self._request('django', 'POST', '/users/login/', auth=False,
+                             json={'username': username, 'password': password})
+        return self._store_tokens(data)['user']
+
+    def refresh(self):
+        """Get a new access token with the refresh token."""
+        if not self.tokens['django'].refresh:
+            raise AuthenticationError(401, 'No refresh token, log in first', 'POST', '/token/refresh/')
+        self._store_tokens(self._request('django', 'POST', '/token/refresh/', auth=False,
+                                         json={'refresh': self.tokens['django'].refresh}))
+
+    def login_fastapi(self, username, password):
+        """Log in to the analytics API and keep its token."""
+        data = self._request('fastapi', 'POST', '/auth/login', auth=False,
+                             params={'username': username, 'password': password})
+        self.tokens['fastapi'].access = data['access_token']
+
+    # Pagination
+    def paginate(self, service, path, params=None):
+        """Yield the items of a Django cursor-paginated listing, page after page."""
+        url = path
+        while url:
+            page = self._request(service, 'GET', url, params=params)
+            yield from page['results']
+            # The next link carries the query
+            url, params = page['next'], None
+
+    def iter_tasks(self, *, search=None, status=None, priority=None, overdue=False,
+                   include_archived=False, page_size=100):
+        """Yield the user's tasks, newest first, optionally filtered by one criterion."""
+        path, params = self._task_list_path(search, status, priority, overdue)
+        params['page_size'] = page_size
+        if include_archived:
+            params['include_archived'] = 'true'
+        return self.paginate('django', path, params)
+
+    def iter_changes(self, cursor=None):
+        """Yield pages of the changes feed until caught up.
+
+        Each page has ``tasks``, ``deleted`` and the ``cursor`` to resume from.
+        """
+        while True:
+            page = self._request('django', 'GET', '/tasks/changes/', params={'cursor': cursor} if cursor else None)
+            yield page
+            if not page['more']:
+                return
+            cursor = page['cursor']
+
+    def iter_filtered_tasks(self, per_page=100, **filters):
+        """Yield the tasks matching Flask's ``/api/tasks/filter`` parameters."""
+        page = 1
+        while True:
+            data = self._request('flask', 'GET', '/tasks/filter', params={**filters, 'page': page, 'per_page': per_page})
+            yield from data['tasks']
+            if not data['pagination']['has_next']:
+                return
+            page += 1
+
+    # Bulk
+    def create_tasks(self, tasks):
+        """Create many tasks with the bulk endpoint; return them.
+
+        Each batch of BULK_MAX_ITEMS is created atomically; the batches are not.
+        """
+        created = []
+        for chunk in _chunks(tasks):
+            created.extend(self._request('django', 'POST', '/tasks/bulk/', json=chunk)['results'])
+        return created
+
+    def update_tasks(self, changes):
+        """Partially update many tasks, each given as a dict with its ``id``; return them."""
+        updated = []
+        for chunk in _chunks(changes):
+            updated.extend(self._request('django', 'PATCH', '/tasks/bulk/', json=chunk)['results'])
+        return updated
+
+    def delete_tasks(self, ids):
+        """Delete many tasks by id; return how many were deleted."""
+        return sum(self._request('django', 'DELETE', '/tasks/bulk/', json={'ids': chunk})['deleted']
+                   for chunk in _chunks(ids))
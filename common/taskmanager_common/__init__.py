@@ -0,0 +1,17 @@
+"""
+Code shared by the Task Management API services
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+
+Plain Python with no dependencies, used by the Django, Flask and FastAPI
+services alike:
+
+- ``taskmanager_common.sqlite``: the SQLite connection profile and the
+  periodic statistics and WAL maintenance;
+- ``taskmanager_common.queries``: per-request query counts, timings and
+  N+1 detection by statement fingerprint.
+
+Each service wires these into its own framework. Put ``common/`` on
+``PYTHONPATH``; the Docker images copy it to ``/opt/common``.
+"""
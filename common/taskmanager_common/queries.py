@@ -0,0 +1,89 @@
+"""
+Per-request database query instrumentation
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+
+A ``QueryStats`` collects the count, time and SQL of the statements one
+request runs; each service records into it from its own database hooks.
+Statements are grouped by fingerprint, their SQL with literals and
+placeholder lists collapsed. When one fingerprint runs more than the N+1
+threshold times in a request, the request is flagged as a likely N+1.
+
+``report()`` returns the numbers as ``X-DB-Query-Count``, ``X-DB-Time-Ms``
+and ``Server-Timing`` response headers, plus ``X-DB-N-Plus-One`` when
+flagged, and logs them as one JSON line.
+"""
+
+import json
+import re
+from collections import Counter
+
+RESPONSE_HEADERS = ['X-DB-Query-Count', 'X-DB-Time-Ms', 'X-DB-N-Plus-One', 'Server-Timing']
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+# The ? and %s placeholders of the DB-API drivers and SQLAlchemy's :name
+_PLACEHOLDER = r'(?:\?|%s|:\w+)'
+_IN_LIST = re.compile(rf'\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})*\s*\)')
+
+
+def fingerprint(sql):
+    """Return ``sql`` with literals and placeholder lists normalized."""
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    return _IN_LIST.sub('(...)', sql)
+
+
+class QueryStats:
+    """Statement count, time and fingerprints collected during one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def record(self, sql, duration):
+        self.count += 1
+        self.duration += duration
+        self.statements[sql] += 1
+
+    def repeated(self, threshold):
+        """Return ``(fingerprint, count)`` pairs run more than ``threshold`` times."""
+        # Fingerprinting once per distinct statement keeps the per-query cost flat
+        counts = Counter()
+        for sql, n in self.statements.items():
+            counts[fingerprint(sql)] += n
+        return [(sql, n) for sql, n in counts.most_common() if n > threshold]
+
+
+def report(stats, threshold, logger, method, path, status, elapsed):
+    """Log the request's JSON line on ``logger`` and return its response headers.
+
+    ``elapsed`` is the request's duration in seconds. Flagged requests are
+    logged as warnings with their three most repeated fingerprints.
+    """
+    repeated = stats.repeated(threshold)
+    db_ms = stats.duration * 1000
+    headers = {
+        'X-DB-Query-Count': str(stats.count),
+        'X-DB-Time-Ms': f'{db_ms:.2f}',
+        'Server-Timing': f'db;dur={db_ms:.2f};desc="{stats.count} queries"',
+    }
+    if repeated:
+        headers['X-DB-N-Plus-One'] = str(repeated[0][1])
+
+    record = {
+        'method': method,
+        'path': path,
+        'status': status,
+        'duration_ms': round(elapsed * 1000, 2),
+        'db_queries': stats.count,
+        'db_time_ms': round(db_ms, 2),
+    }
+    if repeated:
+        record['n_plus_one'] = [{'sql': sql, 'count': n} for sql, n in repeated[:3]]
+        logger.warning(json.dumps(record))
+    else:
+        logger.info(json.dumps(record))
+    return headers
@@ -0,0 +1,86 @@
+"""
+SQLite connection profile and maintenance
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+
+Every service opens its SQLite connections with the same pragmas:
+
+- WAL, so readers do not block the writer and the writer does not block
+  readers;
+- ``synchronous=NORMAL``, which in WAL mode syncs at checkpoints instead of
+  on every commit and still cannot corrupt the database;
+- a memory map and a larger page cache (``cache_size`` is in KiB when
+  negative), and temporary tables and indexes in memory.
+
+Each can be overridden with the ``SQLITE_*`` environment variable of the
+same name. Two things the profile leaves to a periodic ``optimize()``:
+
+- query planner statistics, which SQLite only gathers when asked. The
+  statistics pass reads at most ``ANALYSIS_LIMIT`` rows of each index, so
+  it takes milliseconds even on large tables;
+- the WAL file. SQLite copies it back into the database after commits, but
+  a checkpoint cannot pass readers that are still using older pages, and
+  under steady reads the file keeps growing. A ``TRUNCATE`` checkpoint waits
+  up to the busy timeout for them and empties the file.
+"""
+
+import os
+import sqlite3
+
+CHECKPOINT_MODES = ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE')
+
+# Rows of each index the statistics pass reads
+ANALYSIS_LIMIT = 1000
+
+
+def pragmas_from_env(environ=os.environ, write=True):
+    """Return the connection pragmas, with the ``SQLITE_*`` overrides in ``environ``.
+
+    ``write=False`` leaves out the journal mode and sync setting, for
+    read-only copies that keep those of the database they were copied from.
+    """
+    pragmas = {}
+    if write:
+        pragmas['journal_mode'] = environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+        pragmas['synchronous'] = environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    pragmas['cache_size'] = int(environ.get('SQLITE_CACHE_SIZE', '-65536'))
+    pragmas['mmap_size'] = int(environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+    pragmas['temp_store'] = environ.get('SQLITE_TEMP_STORE', 'MEMORY')
+    return pragmas
+
+
+def pragma_statements(pragmas):
+    """Return the ``PRAGMA name=value`` statements for ``pragmas``."""
+    return [f'PRAGMA {name}={value}' for name, value in pragmas.items()]
+
+
+def apply_pragmas(connection, pragmas):
+    """Run ``pragmas`` on a new DB-API ``connection``."""
+    cursor = connection.cursor()
+    try:
+        for statement in pragma_statements(pragmas):
+            cursor.execute(statement)
+    finally:
+        cursor.close()
+
+
+def optimize(cursor, checkpoint='TRUNCATE'):
+    """Refresh the planner statistics of ``cursor``'s database and checkpoint its WAL.
+
+    ``cursor`` is a DB-API cursor on a connection with no open transaction.
+    Returns SQLite's ``(busy, wal_pages, checkpointed)``: ``busy`` is 1 when
+    readers or a writer kept the checkpoint from finishing, and the page
+    counts are -1 without WAL.
+    """
+    if checkpoint not in CHECKPOINT_MODES:
+        raise ValueError(f'Unknown checkpoint mode {checkpoint!r}')
+    cursor.execute(f'PRAGMA analysis_limit={ANALYSIS_LIMIT}')
+    if sqlite3.sqlite_version_info >= (3, 46):
+        # Every table, not only those this connection has queried
+        cursor.execute('PRAGMA optimize=0x10002')
+    else:
+        # Before 3.46 optimize on a new connection analyzes nothing
+        cursor.execute('ANALYZE')
+    cursor.execute(f'PRAGMA wal_checkpoint({checkpoint})')
+    return tuple(cursor.fetchone())
@@ -0,0 +1,156 @@
+"""
+Benchmark for the async read views
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+
+Serves a throwaway database with gunicorn (WSGI, the DRF views) and with
+uvicorn (ASGI, TASK_ASYNC_VIEWS=1), one process each, and reports the
+throughput and latency of concurrent GET requests against both:
+
+    python benchmarks/async_views.py [--tasks 500] [--concurrency 32] [--seconds 10]
+        [--path /api/tasks/search/?q=task] [--threads 4]
+
+--threads is the number of gunicorn worker threads, i.e. how many requests
+the WSGI server handles at once.
+"""
+
+import argparse
+import http.client
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'taskmanager.settings')
+DB_DIR = tempfile.mkdtemp(prefix='async-views-bench-')
+os.environ['DJANGO_DB_PATH'] = os.path.join(DB_DIR, 'db.sqlite3')
+
+import django
+
+django.setup()
+
+from django.core.management import call_command
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from tasks.models import Task, User
+
+STATUSES = ['todo', 'in_progress', 'review', 'done']
+PRIORITIES = ['low', 'medium', 'high', 'urgent']
+
+
+def seed(tasks):
+    call_command('migrate', verbosity=0)
+    user = User.objects.create_user(username='bench', email='bench@example.com', password='x')
+    Task.objects.bulk_create([
+        Task(title=f'Task {i}', description=f'Benchmark task {i}', user=user,
+             status=STATUSES[i % len(STATUSES)], priority=PRIORITIES[i % len(PRIORITIES)])
+        for i in range(tasks)
+    ])
+    return str(RefreshToken.for_user(user).access_token)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(kind, port, threads):
+    env = dict(os.environ, TASK_ASYNC_VIEWS='1' if kind == 'asgi' else '0')
+    if kind == 'asgi':
+        command = ['uvicorn', 'taskmanager.asgi:application', '--port', str(port),
+                   '--log-level', 'warning', '--no-access-log']
+    else:
+        command = ['gunicorn', 'taskmanager.wsgi:application', '--bind', f'127.0.0.1:{port}',
+                   '--workers', '1', '--threads', str(threads), '--log-level', 'warning']
+    server = subprocess.Popen(command, cwd=BASE_DIR, env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError(f'{kind} server did not start')
+
+
+def load(port, path, token, concurrency, seconds):
+    """Run ``concurrency`` keep-alive clients for ``seconds``; return latencies and errors."""
+    headers = {'Authorization': f'Bearer {token}'}
+    latencies = []
+    errors = []
+    stop_at = time.monotonic() + seconds
+
+    def client():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        mine = []
+        while time.monotonic() < stop_at:
+            started = time.perf_counter()
+            try:
+                conn.request('GET', path, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    errors.append(response.status)
+            except (OSError, http.client.HTTPException) as exc:
+                errors.append(type(exc).__name__)
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                continue
+            mine.append(time.perf_counter() - started)
+        conn.close()
+        latencies.extend(mine)
+
+    clients = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    return sorted(latencies), errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--path', default='/api/tasks/search/?q=task')
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    try:
+        run(args)
+    finally:
+        shutil.rmtree(DB_DIR, ignore_errors=True)
+
+
+def run(args):
+    token = seed(args.tasks)
+    for kind in ('wsgi', 'asgi'):
+        port = free_port()
+        server = start_server(kind, port, args.threads)
+        try:
+            load(port, args.path, token, 2, 1)
+            latencies, errors = load(port, args.path, token, args.concurrency, args.seconds)
+        finally:
+            server.terminate()
+            server.wait()
+        if not latencies:
+            print(f'{kind:<5} no successful requests, {len(errors)} errors')
+            continue
+        p50 = latencies[len(latencies) // 2] * 1000
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000
+        print(f'{kind:<5} {len(latencies) / args.seconds:10,.0f} req/s  '
+              f'p50 {p50:7.1f}ms  p99 {p99:7.1f}ms  errors {len(errors)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark for the SQLite connection profile
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+
+Runs --readers processes that list a user's latest tasks and --writers
+processes that create tasks, all at once for --seconds, against a throwaway
+database opened with SQLite's defaults and then with the profile in
+settings.SQLITE_*, and reports the reads and writes per second of each with
+their 99th percentile latency:
+
+    python benchmarks/sqlite_profile.py [--readers 4] [--writers 2] [--seconds 5] [--tasks 5000]
+
+Queries that wait longer than the busy timeout count as errors.
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# SQLite's own settings, as the API used them before the profile
+DEFAULTS = {
+    'SQLITE_JOURNAL_MODE': 'DELETE',
+    'SQLITE_SYNCHRONOUS': 'FULL',
+    'SQLITE_CACHE_SIZE': '-2000',
+    'SQLITE_MMAP_SIZE': '0',
+    'SQLITE_TEMP_STORE': 'DEFAULT',
+    'SQLITE_TRANSACTION_MODE': '',
+}
+
+PROFILES = {
+    'defaults': DEFAULTS,
+    'profile': {},
+}
+
+
+def setup_django(db_dir, profile):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'taskmanager.settings')
+    os.environ['DJANGO_DB_PATH'] = os.path.join(db_dir, 'db.sqlite3')
+    os.environ.update(PROFILES[profile])
+    sys.path.insert(0, BASE_DIR)
+    import django
+
+    django.setup()
+
+
+def seed(db_dir, profile, users, tasks):
+    setup_django(db_dir, profile)
+    from django.core.management import call_command
+    from tasks.models import Task, User
+
+    call_command('migrate', verbosity=0)
+    for i in range(users):
+        user = User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='x')
+        Task.objects.bulk_create([Task(title=f'Task {n}', user=user) for n in range(tasks)], batch_size=500)
+
+
+def work(db_dir, profile, role, username, seconds):
+    setup_django(db_dir, profile)
+    from django.db import OperationalError, close_old_connections
+    from tasks.models import Task, User
+
+    user = User.objects.get(username=username)
+    errors = 0
+    latencies = []
+    stop_at = time.monotonic() + seconds
+    while time.monotonic() < stop_at:
+        started = time.monotonic()
+        try:
+            if role == 'read':
+                list(Task.objects.filter(user=user).order_by('-created_at')[:20])
+            else:
+                Task.objects.create(title=f'Task {len(latencies)}', user=user)
+            latencies.append(time.monotonic() - started)
+        except OperationalError:
+            errors += 1
+        # A new connection per operation, as in a request
+        close_old_connections()
+    print(errors, *latencies)
+
+
+def run(profile, readers, writers, seconds, tasks):
+    db_dir = tempfile.mkdtemp(prefix='sqlite-profile-bench-')
+    try:
+        command = [sys.executable, __file__, '--db-dir', db_dir, '--profile', profile]
+        subprocess.run([*command, '--seed', '--users', str(readers + writers), '--tasks', str(tasks)], check=True)
+        roles = ['read'] * readers + ['write'] * writers
+        processes = [
+            (role, subprocess.Popen([*command, '--work', role, f'user{i}', '--seconds', str(seconds)],
+                                    stdout=subprocess.PIPE, text=True))
+            for i, role in enumerate(roles)
+        ]
+        latencies = {'read': [], 'write': []}
+        errors = 0
+        for role, process in processes:
+            out, _ = process.communicate()
+            failed, *done = out.split()
+            latencies[role].extend(float(latency) for latency in done)
+            errors += int(failed)
+    finally:
+        shutil.rmtree(db_dir, ignore_errors=True)
+    line = f'{profile:<8}'
+    for role, done in latencies.items():
+        done.sort()
+        p99 = done[int(len(done) * 0.99)] * 1000 if done else 0
+        line += f'  {len(done) / seconds:8,.0f} {role}s/s (p99 {p99:6.1f} ms)'
+    print(f'{line}  errors {errors}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--tasks', type=int, default=5000, help='Tasks seeded per user.')
+    # Used by the processes the benchmark starts
+    parser.add_argument('--db-dir', help=argparse.SUPPRESS)
+    parser.add_argument('--profile', choices=PROFILES, help=argparse.SUPPRESS)
+    parser.add_argument('--seed', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--users', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--work', nargs=2, metavar=('ROLE', 'USERNAME'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.seed:
+        seed(args.db_dir, args.profile, args.users, args.tasks)
+    elif args.work:
+        work(args.db_dir, args.profile, *args.work, args.seconds)
+    else:
+        for profile in PROFILES:
+            run(profile, args.readers, args.writers, args.seconds, args.tasks)
+
+
+if __name__ == '__main__':
+    main()
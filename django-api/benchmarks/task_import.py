@@ -0,0 +1,73 @@
+"""
+Benchmark for the streaming task import
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+
+Streams a generated CSV or NDJSON file through tasks.importer and reports
+throughput. Rows are generated on the fly, so the file never exists in
+memory. Runs against a throwaway test database:
+
+    python benchmarks/task_import.py [--rows 200000] [--format csv]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'taskmanager.settings')
+
+import django
+
+django.setup()
+
+from django.db import connection
+from django.test.utils import setup_test_environment
+
+from tasks import importer
+from tasks.models import Task, User
+
+STATUSES = ['todo', 'in_progress', 'review', 'done']
+
+
+def generate(rows, file_format):
+    if file_format == 'csv':
+        yield b'title,description,priority,status,due_date\n'
+    for i in range(rows):
+        row = {
+            'title': f'Task {i}',
+            'description': f'Imported task number {i}',
+            'priority': 'high' if i % 2 else 'low',
+            'status': STATUSES[i % len(STATUSES)],
+            'due_date': f'2026-{i % 12 + 1:02d}-{i % 28 + 1:02d}T09:00:00Z',
+        }
+        if file_format == 'csv':
+            yield ','.join(row.values()).encode() + b'\n'
+        else:
+            yield json.dumps(row).encode() + b'\n'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--format', dest='file_format', choices=importer.FORMATS, default='csv')
+    parser.add_argument('--chunk-size', type=int)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        user = User.objects.create_user(username='bench', email='bench@example.com', password='x')
+        result = importer.import_tasks(user, generate(args.rows, args.file_format), args.file_format,
+                                       chunk_size=args.chunk_size)
+        assert result.created == args.rows == Task.objects.filter(user=user).count()
+        print(f'{args.file_format:<8} {result.created:,} rows in {result.elapsed_seconds:.2f}s  '
+              f'{result.rows_per_second:12,.0f} rows/s')
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark for task list serialization
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+
+Compares the per-field DRF serialization used before the fast path with
+TaskListSerializer(many=True) on a 1,000-row response. Runs against a
+throwaway test database:
+
+    python benchmarks/task_list_serialization.py [--rows 1000] [--repeat 20]
+"""
+
+import argparse
+import os
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'taskmanager.settings')
+
+import django
+
+django.setup()
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+from django.utils import timezone
+from rest_framework import serializers
+
+from tasks.models import Task, User
+from tasks.serializers import TaskListSerializer
+
+
+class LegacyTaskListSerializer(serializers.ModelSerializer):
+    """The list serializer as it was before the fast path."""
+    user = serializers.StringRelatedField()
+
+    class Meta:
+        model = Task
+        fields = ['id', 'title', 'priority', 'status', 'due_date', 'user', 'created_at']
+
+
+def measure(label, build, rows, repeat):
+    connection.queries_log.clear()
+    with CaptureQueriesContext(connection) as queries:
+        data = build()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        build()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f'{label:<16} {elapsed * 1000:8.2f} ms  {rows / elapsed:12,.0f} rows/s  '
+          f'{len(queries)} queries')
+    return data, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    # DEBUG keeps a bounded query log; overflowing it during timing is expected
+    warnings.filterwarnings('ignore', message='Limit for query logging exceeded')
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        user = User.objects.create_user(username='bench', email='bench@example.com', password='x')
+        now = timezone.now()
+        Task.objects.bulk_create([
+            Task(title=f'Task {i}', user=user, priority='high',
+                 due_date=now if i % 2 else None)
+            for i in range(args.rows)
+        ])
+
+        legacy, legacy_time = measure(
+            'legacy', lambda: LegacyTaskListSerializer(
+                Task.objects.filter(user=user), many=True).data,
+            args.rows, args.repeat)
+        measure(
+            'legacy+related', lambda: LegacyTaskListSerializer(
+                Task.objects.filter(user=user).select_related('user'), many=True).data,
+            args.rows, args.repeat)
+        fast, fast_time = measure(
+            'fast', lambda: TaskListSerializer(
+                Task.objects.filter(user=user), many=True).data,
+            args.rows, args.repeat)
+
+        assert legacy == fast, 'fast path output differs from legacy output'
+        print(f'speedup          {legacy_time / fast_time:.1f}x')
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
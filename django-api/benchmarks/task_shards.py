@@ -0,0 +1,110 @@
+"""
+Benchmark for the task shards
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+
+Runs --writers processes that each create tasks for their own user through
+Task.save() for --seconds, against throwaway databases with each of the
+given shard counts, and reports the combined writes per second:
+
+    python benchmarks/task_shards.py [--shards 1 2 4] [--writers 4] [--seconds 5]
+
+Writers whose transaction waits longer than SQLite's busy timeout count as
+errors.
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django(db_dir, shards):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'taskmanager.settings')
+    os.environ['DJANGO_DB_PATH'] = os.path.join(db_dir, 'db.sqlite3')
+    os.environ['TASK_SHARDS'] = str(shards)
+    sys.path.insert(0, BASE_DIR)
+    import django
+
+    django.setup()
+
+
+def seed(db_dir, shards, writers):
+    setup_django(db_dir, shards)
+    from django.conf import settings
+    from django.core.management import call_command
+    from tasks.models import User
+
+    for alias in settings.DATABASES:
+        call_command('migrate', database=alias, verbosity=0)
+    # Consecutive ids, so the writers' users spread evenly over the shards
+    for i in range(writers):
+        User.objects.create_user(username=f'writer{i}', email=f'writer{i}@example.com', password='x')
+
+
+def write(db_dir, shards, username, seconds):
+    setup_django(db_dir, shards)
+    from django.db import OperationalError
+    from tasks.models import Task, User
+
+    user = User.objects.get(username=username)
+    written = errors = 0
+    stop_at = time.monotonic() + seconds
+    while time.monotonic() < stop_at:
+        try:
+            Task.objects.create(title=f'Task {written}', user=user)
+            written += 1
+        except OperationalError:
+            errors += 1
+    print(written, errors)
+
+
+def run(shards, writers, seconds):
+    db_dir = tempfile.mkdtemp(prefix='task-shards-bench-')
+    try:
+        command = [sys.executable, __file__, '--db-dir', db_dir, '--shards', str(shards)]
+        subprocess.run([*command, '--seed', '--writers', str(writers)], check=True)
+        processes = [
+            subprocess.Popen([*command, '--write', f'writer{i}', '--seconds', str(seconds)],
+                             stdout=subprocess.PIPE, text=True)
+            for i in range(writers)
+        ]
+        written = errors = 0
+        for process in processes:
+            out, _ = process.communicate()
+            w, e = out.split()
+            written += int(w)
+            errors += int(e)
+    finally:
+        shutil.rmtree(db_dir, ignore_errors=True)
+    print(f'{shards} shard(s)  {written / seconds:10,.0f} writes/s  errors {errors}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5)
+    # Used by the processes the benchmark starts
+    parser.add_argument('--db-dir', help=argparse.SUPPRESS)
+    parser.add_argument('--seed', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--write', metavar='USERNAME', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.seed:
+        seed(args.db_dir, args.shards[0], args.writers)
+    elif args.write:
+        write(args.db_dir, args.shards[0], args.write, args.seconds)
+    else:
+        for shards in args.shards:
+            run(shards, args.writers, args.seconds)
+
+
+if __name__ == '__main__':
+    main()
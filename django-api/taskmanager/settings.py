@@ -8,8 +8,10 @@ This module contains Django configuration settings for the task management appli
 """
 
 from pathlib import Path
+from urllib.parse import quote
 import os
 from datetime import timedelta
+from taskmanager_common.sqlite import pragma_statements, pragmas_from_env
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -37,6 +39,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'tasks.middleware.QueryInstrumentationMiddleware',
+    'tasks.sharding.ShardMiddleware',
+    'tasks.read_replicas.ReadReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -70,9 +75,121 @@ WSGI_APPLICATION = 'taskmanager.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('DJANGO_DB_PATH', BASE_DIR / 'db.sqlite3'),
     }
 }
+DATABASE_ROUTERS = []
+
+# Task shards (tasks.sharding): with TASK_SHARDS above 1 each user's tasks
+# live in one of that many SQLite files next to the main database, e.g.
+# db_shard_0.sqlite3. Migrate each with `migrate --database shard_N` and run
+# `rebalance_task_shards` after changing the number. Task ids are reserved
+# from the main database TASK_ID_BLOCK_SIZE at a time.
+TASK_SHARDS = int(os.environ.get('TASK_SHARDS', '1'))
+TASK_ID_BLOCK_SIZE = 1000
+if TASK_SHARDS > 1:
+    _main_db = Path(DATABASES['default']['NAME'])
+    for _index in range(TASK_SHARDS):
+        DATABASES[f'shard_{_index}'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': _main_db.with_name(f'{_main_db.stem}_shard_{_index}{_main_db.suffix}'),
+        }
+    DATABASE_ROUTERS.append('tasks.sharding.TaskShardRouter')
+
+# Read replicas (tasks.read_replicas): with DB_READ_REPLICAS above 0 each
+# database above gets that many read-only copies next to it, e.g.
+# db_replica_0.sqlite3, refreshed every READ_REPLICA_SYNC_INTERVAL seconds by
+# `sync_read_replicas`. GET requests under READ_REPLICA_PATHS read from a copy
+# at most READ_REPLICA_MAX_LAG seconds old, and a user's requests stay on the
+# primary for READ_REPLICA_MAX_LAG seconds after each write.
+# A refresh after a write rereads the whole primary file, so under steady
+# writes each interval costs a full read of the database, growing with it;
+# a refresh with no write since the last only restamps the copies. Raise the
+# interval for large databases, keeping it well below READ_REPLICA_MAX_LAG.
+DB_READ_REPLICAS = int(os.environ.get('DB_READ_REPLICAS', '0'))
+READ_REPLICA_SYNC_INTERVAL = float(os.environ.get('READ_REPLICA_SYNC_INTERVAL', '1'))
+READ_REPLICA_MAX_LAG = float(os.environ.get('READ_REPLICA_MAX_LAG', '5'))
+READ_REPLICA_PATHS = ['/api/']  # The admin reads and writes the primary
+if DB_READ_REPLICAS > 0:
+    for _primary, _config in list(DATABASES.items()):
+        _path = Path(_config['NAME'])
+        for _index in range(DB_READ_REPLICAS):
+            _replica = _path.with_name(f'{_path.stem}_replica_{_index}{_path.suffix}')
+            DATABASES[f'{_primary}_replica_{_index}'] = {
+                'ENGINE': 'django.db.backends.sqlite3',
+                # Read-only, and never created empty when the copy is missing
+                'NAME': f'file:{quote(str(_replica))}?mode=ro',
+                'READ_REPLICA_OF': _primary,
+                'TEST': {'MIRROR': _primary},
+            }
+    DATABASE_ROUTERS.insert(0, 'tasks.read_replicas.ReadReplicaRouter')
+
+# SQLite connection profile, applied to every new connection of the databases
+# above. WAL lets readers and a writer work at the same time, and with it
+# synchronous=NORMAL only syncs at checkpoints instead of on every commit.
+# Transactions start IMMEDIATE: in WAL mode a transaction that has read cannot
+# wait for the write lock, it fails at once. Connections last one request, so
+# the memory map, shared through the OS page cache, does most of the caching.
+# `optimize_sqlite` refreshes the query planner statistics and checkpoints the
+# WAL; run it periodically.
+# The pragmas, and their SQLITE_* overrides, are shared with the other services
+SQLITE_PRAGMAS = pragmas_from_env()
+SQLITE_BUSY_TIMEOUT = float(os.environ.get('SQLITE_BUSY_TIMEOUT', '5'))
+SQLITE_TRANSACTION_MODE = os.environ.get('SQLITE_TRANSACTION_MODE', 'IMMEDIATE') or None
+for _config in DATABASES.values():
+    _options = {'timeout': SQLITE_BUSY_TIMEOUT}
+    if 'READ_REPLICA_OF' in _config:
+        # The read-only replicas keep the journal mode of their copy and never write
+        _pragmas = pragmas_from_env(write=False)
+    else:
+        _pragmas = SQLITE_PRAGMAS
+        _options['transaction_mode'] = SQLITE_TRANSACTION_MODE
+    _options['init_command'] = '; '.join(pragma_statements(_pragmas))
+    _config['OPTIONS'] = _options
+
+# Cache
+# Redis (the docker-compose `redis` service) when REDIS_URL is set, otherwise
+# an in-process cache; CACHE_BACKEND/CACHE_LOCATION select e.g. a file cache.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+            'LOCATION': os.environ.get('CACHE_LOCATION', 'taskmanager'),
+        }
+    }
+
+# Seconds a cached task list, task or profile response is kept
+TASK_CACHE_TIMEOUT = 300
+
+# Background job queue (tasks.jobs): attempts per job, retry backoff and how
+# long a claimed job stays invisible to other workers, all in seconds
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BASE_DELAY = 10
+JOB_RETRY_MAX_DELAY = 3600
+JOB_VISIBILITY_TIMEOUT = 300
+JOB_POLL_INTERVAL = 1
+
+# Read-side SQLite stores that ``replicate_changes`` copies users and tasks
+# into. ``schema`` selects the table layout in tasks.replication.
+REPLICATION_TARGETS = {
+    'flask': {
+        'schema': 'flask',
+        'path': os.environ.get('REPLICA_FLASK_DB', str(BASE_DIR.parent / 'flask-api' / 'instance' / 'tasks.db')),
+    },
+    'fastapi': {
+        'schema': 'fastapi',
+        'path': os.environ.get('REPLICA_FASTAPI_DB', str(BASE_DIR.parent / 'fastapi-api' / 'analytics.db')),
+    },
+}
+REPLICATION_BATCH_SIZE = 500
+REPLICATION_POLL_INTERVAL = 1
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -112,7 +229,7 @@ AUTH_USER_MODEL = 'tasks.User'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'tasks.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -121,6 +238,59 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
 }
 
+# Per-request query count and timing (tasks.middleware). A request that runs
+# the same statement more than QUERY_N_PLUS_ONE_THRESHOLD times is flagged.
+QUERY_INSTRUMENTATION_ENABLED = os.environ.get('QUERY_INSTRUMENTATION', '1') == '1'
+QUERY_N_PLUS_ONE_THRESHOLD = 5
+
+# Serve the hot task and profile reads with the async views in
+# tasks.async_views; only worthwhile under an ASGI server such as uvicorn
+TASK_ASYNC_VIEWS = os.environ.get('TASK_ASYNC_VIEWS', '0') == '1'
+
+# Largest page a client may request from the task listings with ?page_size=
+TASK_MAX_PAGE_SIZE = 100
+
+# GraphQL endpoint (tasks.schema): tasks per list by default and at most, and
+# the limits on a query's cost (the objects it can return, lists counted at
+# their page size) and nesting, checked before it runs
+GRAPHQL_PAGE_SIZE = 20
+GRAPHQL_MAX_PAGE_SIZE = 500
+GRAPHQL_MAX_COST = 5000
+GRAPHQL_MAX_DEPTH = 6
+
+# Admin changelists count rows exactly up to this many and estimate above it
+ADMIN_EXACT_COUNT_LIMIT = 10000
+
+# Largest number of items accepted by the bulk task endpoint
+TASK_BULK_MAX_ITEMS = 1000
+
+# Changes feed (tasks.sync): tasks per poll by default and at most, how far
+# back a caught-up cursor restarts to cover late commits, and how long
+# tombstones of deleted tasks are kept
+TASK_SYNC_PAGE_SIZE = 100
+TASK_SYNC_MAX_PAGE_SIZE = 500
+TASK_SYNC_SETTLE_SECONDS = 2
+TASK_SYNC_TOMBSTONE_DAYS = 30
+
+# Streaming task import: rows validated and inserted per transaction, and
+# how many row errors an import report lists
+TASK_IMPORT_CHUNK_SIZE = 5000
+TASK_IMPORT_MAX_ERRORS = 1000
+
+# Done and cancelled tasks older than this many days are moved to the
+# archive table by ``archive_tasks``, in batches with a pause in seconds
+TASK_ARCHIVE_AFTER_DAYS = int(os.environ.get('TASK_ARCHIVE_AFTER_DAYS', 90))
+TASK_ARCHIVE_BATCH_SIZE = 500
+TASK_ARCHIVE_BATCH_PAUSE = 0.05
+
+# Overdue scheduler (``schedule_overdue``): due dates up to HORIZON seconds
+# ahead are kept in memory, at most MAX_PENDING of them, and reloaded every
+# REFRESH_INTERVAL seconds to pick up new and changed tasks
+OVERDUE_SCHEDULER_HORIZON = 3600
+OVERDUE_SCHEDULER_MAX_PENDING = 10000
+OVERDUE_SCHEDULER_REFRESH_INTERVAL = 30
+OVERDUE_BATCH_SIZE = 500
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -130,6 +300,7 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 CORS_ALLOW_CREDENTIALS = True
+CORS_EXPOSE_HEADERS = ['X-DB-Query-Count', 'X-DB-Time-Ms', 'X-DB-N-Plus-One', 'Server-Timing']
 
 # JWT settings
 SIMPLE_JWT = {
@@ -155,3 +326,8 @@ SIMPLE_JWT = {
 
     'JTI_CLAIM': 'jti',
 }
+
+# Seconds an authenticated user is served from the in-process cache of
+# CachedJWTAuthentication, and how many users that cache holds
+JWT_USER_CACHE_TTL = 30
+JWT_USER_CACHE_SIZE = 10000
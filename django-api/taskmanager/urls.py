@@ -14,9 +14,12 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from rest_framework_simplejwt.views import TokenRefreshView
+from tasks.async_views import graphql_view
 from tasks.views import UserViewSet, TaskViewSet
 
 # Create router and register viewsets
@@ -26,6 +29,12 @@ router.register(r'tasks', TaskViewSet, basename='task')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/graphql/', graphql_view, name='graphql'),
+    path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/', include(router.urls)),
     path('api/auth/', include('rest_framework.urls')),
 ]
+
+if settings.TASK_ASYNC_VIEWS:
+    # GET requests to the hot reads go to the async views, the rest to the router
+    urlpatterns.insert(0, path('api/', include('tasks.async_urls')))
@@ -1,29 +1,281 @@
+"""
+Admin configuration for the tasks app
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+
+The task and user changelists are built to stay fast on very large tables:
+
+- ``EstimatedCountPaginator`` counts exactly only up to
+  ``ADMIN_EXACT_COUNT_LIMIT`` rows. Beyond that an unfiltered list reports
+  the row count SQLite keeps in ``sqlite_stat1`` (written by ``ANALYZE``),
+  or the largest id, and a filtered one reports the limit.
+- ``KeysetChangeList`` pages lists in their default order with an ``after``
+  cursor and a ``WHERE created_at < ...`` seek instead of an OFFSET, so
+  page 10,000 costs what page 1 does. Lists sorted by another column fall
+  back to numbered pages.
+- ``CreatedDrillDownFilter`` replaces ``date_hierarchy``, which scans every
+  row for the distinct years and months. Its years come from the first and
+  last ``created_at`` and every choice is a range on the index.
+- The task's ``user`` is a raw id field instead of a select of every user.
+
+With shards (``tasks.sharding``) the task changelist shows one task
+database at a time, chosen with the shard filter and named above the list,
+so its rows and counts are never mistaken for all tasks. A task's change
+page looks its id up in each database.
+"""
+
+from datetime import datetime
+
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList
 from django.contrib.auth.admin import UserAdmin
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+from django.utils.functional import cached_property
+from .bulk import bulk_delete_tasks
 from .models import User, Task
+from .sharding import is_sharded, shard_aliases, task_databases, use_db
+
+AFTER_VAR = 'after'
+SHARD_VAR = 'shard'
+
+
+def estimated_table_rows(model, using='default'):
+    """Return the row count ANALYZE recorded for ``model``'s table, or None."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return None
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [model._meta.db_table])
+        except DatabaseError:
+            # ANALYZE never ran, so there is no sqlite_stat1 table
+            return None
+        row = cursor.fetchone()
+    return int(row[0].split()[0]) if row else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that avoids a full ``COUNT(*)`` on large tables. See the module docstring."""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        limit = settings.ADMIN_EXACT_COUNT_LIMIT
+        self.estimated = False
+        if not queryset.query.has_filters():
+            estimate = estimated_table_rows(queryset.model, queryset.db)
+            if estimate is None:
+                estimate = queryset.aggregate(last=Max('pk'))['last'] or 0
+            if estimate > limit:
+                self.estimated = True
+                return estimate
+        count = queryset.order_by()[:limit + 1].count()
+        if count > limit:
+            self.estimated = True
+            return limit
+        return count
+
+
+class KeysetChangeList(ChangeList):
+    """Change list paged with an ``after`` cursor. See the module docstring."""
+
+    keyset = False
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(AFTER_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Links to other filters and orderings start from the first page
+        new_params = new_params or {}
+        if AFTER_VAR not in new_params:
+            remove = [*(remove or []), AFTER_VAR]
+        return super().get_query_string(new_params, remove)
+
+    def get_results(self, request):
+        if self._use_keyset():
+            self._get_keyset_results(request)
+        else:
+            super().get_results(request)
+        self.count_is_estimate = getattr(self.paginator, 'estimated', False)
+
+    def _use_keyset(self):
+        ordering = self.model_admin.keyset_ordering
+        # The admin's ordering is applied twice, as the default and again
+        # from get_queryset(); compare without the repeats
+        effective = list(dict.fromkeys(self.queryset.query.order_by))
+        return not self.show_all and effective == list(ordering)
+
+    def _get_keyset_results(self, request):
+        ordering = self.model_admin.keyset_ordering
+        queryset = self.queryset
+        after = self.params.get(AFTER_VAR)
+        if after:
+            queryset = queryset.filter(self._after(ordering, after))
+        page = list(queryset[:self.list_per_page + 1])
+
+        self.paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        self.result_count = self.paginator.count
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.can_show_all = False
+        self.keyset = True
+        self.first_page_url = self.get_query_string() if after else None
+        self.next_page_url = None
+        if len(page) > self.list_per_page:
+            page = page[:self.list_per_page]
+            last = page[-1]
+            cursor = ','.join(self._cursor_value(last, field) for field in ordering)
+            self.next_page_url = self.get_query_string({AFTER_VAR: cursor})
+        self.multi_page = bool(self.first_page_url or self.next_page_url)
+        self.result_list = page
+
+    def _cursor_value(self, obj, field):
+        value = getattr(obj, field.lstrip('-'))
+        return value.isoformat() if isinstance(value, datetime) else str(value)
+
+    def _after(self, ordering, cursor):
+        """Return the filter for the rows after ``cursor`` in ``ordering``."""
+        parts = cursor.split(',')
+        if len(parts) != len(ordering):
+            raise IncorrectLookupParameters
+        condition = Q()
+        equal = {}
+        for field, part in zip(ordering, parts):
+            name = field.lstrip('-')
+            try:
+                value = self.opts.get_field(name).to_python(part)
+            except ValidationError:
+                raise IncorrectLookupParameters
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        # The OR alone hides the range from SQLite; bound the first column
+        # so the page starts with an index seek
+        first = ordering[0]
+        bound = {f"{first.lstrip('-')}__{'lte' if first.startswith('-') else 'gte'}": equal[first.lstrip('-')]}
+        return Q(**bound) & condition
+
+
+class ScalableChangeListMixin:
+    """Estimated counts and keyset pages for a large changelist."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+    # The default ordering pages are keyed on; it must be total and indexed
+    keyset_ordering = ('-id',)
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+
+class CreatedDrillDownFilter(admin.SimpleListFilter):
+    """Years, then months of a year, of ``created_at``. See the module docstring."""
+    title = 'created'
+    parameter_name = 'created'
+
+    def lookups(self, request, model_admin):
+        dates = model_admin.get_queryset(request).values_list('created_at', flat=True)
+        first = dates.order_by('created_at').first()
+        last = dates.order_by('-created_at').first()
+        if first is None:
+            return []
+        first, last = timezone.localtime(first), timezone.localtime(last)
+        year = self._parse()[0]
+        if year is None:
+            return [(str(y), str(y)) for y in range(last.year, first.year - 1, -1)]
+        months = [
+            (f'{year}-{month:02d}', datetime(year, month, 1).strftime('%B %Y'))
+            for month in range(12, 0, -1)
+            if (first.year, first.month) <= (year, month) <= (last.year, last.month)
+        ]
+        return [(str(year), f'All of {year}')] + months
+
+    def queryset(self, request, queryset):
+        year, month = self._parse()
+        if year is None:
+            return queryset
+        if month is None:
+            start, end = datetime(year, 1, 1), datetime(year + 1, 1, 1)
+        else:
+            start = datetime(year, month, 1)
+            end = datetime(year + month // 12, month % 12 + 1, 1)
+        return queryset.filter(created_at__gte=timezone.make_aware(start),
+                               created_at__lt=timezone.make_aware(end))
+
+    def _parse(self):
+        """Return ``(year, month)`` from the selected value; either may be None."""
+        try:
+            parts = [int(part) for part in (self.value() or '').split('-')]
+        except ValueError:
+            return None, None
+        if len(parts) == 1 and 1 <= parts[0] <= 9999:
+            return parts[0], None
+        if len(parts) == 2 and 1 <= parts[0] <= 9999 and 1 <= parts[1] <= 12:
+            return parts[0], parts[1]
+        return None, None
+
+class ShardListFilter(admin.SimpleListFilter):
+    """The task database a task changelist shows; only offered with shards."""
+    title = 'shard'
+    parameter_name = SHARD_VAR
+
+    def lookups(self, request, model_admin):
+        databases = task_databases()
+        return [(db, db) for db in databases] if len(databases) > 1 else []
+
+    def value(self):
+        return super().value() or shard_aliases()[0]
+
+    def choices(self, changelist):
+        # No "All": without a choice the list shows the first shard
+        return list(super().choices(changelist))[1:]
+
+    def queryset(self, request, queryset):
+        # TaskAdmin.get_queryset() already reads from the chosen database
+        return queryset
 
 @admin.register(User)
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(ScalableChangeListMixin, UserAdmin):
     """Admin configuration for User model."""
     list_display = ['username', 'email', 'first_name', 'last_name', 'is_active', 'created_at']
     list_filter = ['is_active', 'is_staff', 'created_at']
     search_fields = ['username', 'email', 'first_name', 'last_name']
-    ordering = ['-created_at']
-    
+    # Ids follow creation order and need no extra index
+    ordering = ['-id']
+
     fieldsets = UserAdmin.fieldsets + (
         ('Additional Info', {'fields': ('created_at', 'updated_at')}),
     )
     readonly_fields = ['created_at', 'updated_at']
 
+    def delete_queryset(self, request, queryset):
+        """Delete users one by one so User.delete() records their outbox events."""
+        with transaction.atomic():
+            for user in queryset:
+                user.delete()
+
 @admin.register(Task)
-class TaskAdmin(admin.ModelAdmin):
+class TaskAdmin(ScalableChangeListMixin, admin.ModelAdmin):
     """Admin configuration for Task model."""
     list_display = ['title', 'user', 'priority', 'status', 'due_date', 'created_at']
-    list_filter = ['priority', 'status', 'created_at', 'due_date']
-    search_fields = ['title', 'description', 'user__username']
-    ordering = ['-created_at']
-    date_hierarchy = 'created_at'
-    
+    list_filter = [ShardListFilter, 'priority', 'status', CreatedDrillDownFilter, 'due_date']
+    # Exact usernames use the unique index; titles match on their start
+    search_fields = ['=user__username', '^title']
+    search_help_text = 'Search by exact username or the start of the title.'
+    ordering = ['-created_at', '-id']
+    keyset_ordering = ('-created_at', '-id')
+    raw_id_fields = ['user']
+
     fieldsets = (
         ('Task Information', {
             'fields': ('title', 'description', 'user')
@@ -36,7 +288,37 @@ class TaskAdmin(admin.ModelAdmin):
         }),
     )
     readonly_fields = ['created_at', 'updated_at']
-    
+
+    def get_task_db(self, request):
+        """Return the task database to show: the one chosen with ?shard=, or the first shard."""
+        db = getattr(request, 'task_db', None) or request.GET.get(SHARD_VAR)
+        return db if db in task_databases() else shard_aliases()[0]
+
     def get_queryset(self, request):
         """Optimize queryset with select_related."""
-        return super().get_queryset(request).select_related('user') 
\ No newline at end of file
+        return super().get_queryset(request).using(self.get_task_db(request)).select_related('user')
+
+    def changelist_view(self, request, extra_context=None):
+        if is_sharded():
+            # The list, its filters and its count cover one database only
+            extra_context = {
+                'subtitle': f'Tasks in {self.get_task_db(request)} only, one of {len(task_databases())} '
+                            f'task databases; choose another with the shard filter.',
+                **(extra_context or {}),
+            }
+        return super().changelist_view(request, extra_context)
+
+    def get_object(self, request, object_id, from_field=None):
+        # Task ids are unique across the task databases
+        for db in task_databases():
+            request.task_db = db
+            obj = super().get_object(request, object_id, from_field)
+            if obj is not None:
+                return obj
+        request.task_db = None
+        return None
+
+    def delete_queryset(self, request, queryset):
+        """Delete through bulk_delete_tasks to keep counters and the outbox in step."""
+        with use_db(queryset.db), transaction.atomic(using=queryset.db):
+            bulk_delete_tasks(queryset, queryset.values_list('pk', flat=True))
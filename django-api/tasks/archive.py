@@ -0,0 +1,96 @@
+"""
+Archiving of old done and cancelled tasks
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+
+Tasks that have been done (by ``completed_at``) or cancelled (by
+``updated_at``) for longer than ``TASK_ARCHIVE_AFTER_DAYS`` are moved from
+``tasks`` to ``tasks_archive``, so the hot table and its indexes only hold
+live work. Each batch is copied and deleted in its own transaction,
+followed by a pause so the writes do not starve API requests of the
+database lock. Batches walk the tasks table in id order, so a run reads
+every row at most once.
+
+Archiving does not change the per-user counters. It records an
+``archive`` outbox event per task so the replicas move the rows as well,
+and a tombstone so the changes feed drops them from clients.
+
+With shards (``tasks.sharding``) each task database is archived in turn.
+"""
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from .models import ArchivedTask, OutboxEvent, Task, TaskTombstone
+from .sharding import atomic, task_databases, use_db
+
+FIELDS = ['id', 'title', 'description', 'user_id', 'priority', 'status',
+          'due_date', 'completed_at', 'created_at', 'updated_at']
+
+
+def archivable(cutoff):
+    """Return a filter matching tasks closed before ``cutoff``."""
+    return (Q(status='done', completed_at__lt=cutoff)
+            | Q(status='cancelled', updated_at__lt=cutoff))
+
+
+def archive_batch(cutoff, after_id=0, batch_size=None):
+    """Archive the next batch of tasks with an id above ``after_id``.
+
+    Returns ``(archived, last_id)``; ``last_id`` is None when there is
+    nothing left to archive. Works on the active task database.
+    """
+    batch_size = batch_size or settings.TASK_ARCHIVE_BATCH_SIZE
+    with atomic():
+        rows = list(
+            Task.objects.filter(archivable(cutoff), id__gt=after_id)
+            .order_by('id').values(*FIELDS)[:batch_size]
+        )
+        if not rows:
+            return 0, None
+        now = timezone.now()
+        ArchivedTask.objects.bulk_create(
+            [ArchivedTask(archived_at=now, **row) for row in rows],
+            batch_size=batch_size,
+        )
+        ids = [row['id'] for row in rows]
+        # A queryset delete skips Task.delete(), so the counters stay as they
+        # are; the post_delete signal still invalidates the owners' caches
+        Task.objects.filter(id__in=ids).delete()
+        OutboxEvent.record(OutboxEvent.TASKS, ids, OutboxEvent.ARCHIVE)
+        # Archived tasks leave the default listings, so clients drop them too
+        TaskTombstone.record([(row['id'], row['user_id']) for row in rows])
+    return len(rows), ids[-1]
+
+
+def archive_tasks(older_than_days=None, batch_size=None, pause=None, limit=None, progress=None):
+    """Archive every task closed more than ``older_than_days`` ago.
+
+    Stops after ``limit`` tasks if given. ``progress`` is called with the
+    running total after each batch. Returns the number of tasks archived.
+    """
+    if older_than_days is None:
+        older_than_days = settings.TASK_ARCHIVE_AFTER_DAYS
+    pause = settings.TASK_ARCHIVE_BATCH_PAUSE if pause is None else pause
+    batch_size = batch_size or settings.TASK_ARCHIVE_BATCH_SIZE
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+
+    total = 0
+    for db in task_databases():
+        last_id = 0
+        while limit is None or total < limit:
+            size = batch_size if limit is None else min(batch_size, limit - total)
+            with use_db(db):
+                archived, last_id = archive_batch(cutoff, last_id, size)
+            if last_id is None:
+                break
+            total += archived
+            if progress:
+                progress(total)
+            if pause:
+                time.sleep(pause)
+    return total
@@ -0,0 +1,21 @@
+"""
+URL patterns for the async read views
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+
+Included under ``api/`` ahead of the DRF router when ``TASK_ASYNC_VIEWS`` is
+on; the paths are the router's, so clients see no difference.
+"""
+
+from django.urls import path
+from . import async_views
+
+urlpatterns = [
+    path('tasks/', async_views.task_list),
+    path('tasks/<int:pk>/', async_views.task_detail),
+    path('tasks/search/', async_views.task_search),
+    path('tasks/by_status/', async_views.tasks_by_status),
+    path('tasks/by_priority/', async_views.tasks_by_priority),
+    path('users/profile/', async_views.user_profile),
+]
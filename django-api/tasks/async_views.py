@@ -0,0 +1,201 @@
+"""
+Async read views for the Task Management API
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+
+Native async versions of the most requested reads: the task list, a single
+task, search, by_status, by_priority and the user profile. They are routed in
+front of the DRF viewsets when ``TASK_ASYNC_VIEWS`` is on (see
+``tasks.async_urls``) and the project runs under an ASGI server such as
+uvicorn. While one of them waits on the database or the cache, its worker
+serves other requests instead of blocking a thread.
+
+DRF views are synchronous, so these are plain Django views that reuse the
+API's pieces: ``CachedJWTAuthentication.aauthenticate``, the per-user
+response cache, ``TaskCursorPagination`` and the serializers, which only read
+loaded objects. Responses match the DRF ones byte for byte and share their
+cache entries. Other methods on the same URLs (creating, updating and
+deleting tasks, OPTIONS) are passed to the DRF view.
+
+The GraphQL endpoint is here as well, as it resolves its queries with the
+async ORM.
+"""
+
+import json
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db.models import Q
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.request import Request
+from .authentication import CachedJWTAuthentication
+from .cache import auser_cache_key, aget_cached, aset_cached
+from .models import Task, TaskHistory, UserTaskStats
+from .pagination import TaskCursorPagination
+from .schema import execute_query
+from .serializers import TaskSerializer, TaskListSerializer
+from .views import UserViewSet, TaskViewSet, profile_data
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+def _json(data, status=200, headers=None):
+    # Compact and unescaped, like DRF's JSONRenderer
+    return JsonResponse(data, status=status, headers=headers, safe=False,
+                        json_dumps_params={'separators': (',', ':'), 'ensure_ascii': False})
+
+
+def read_view(fallback):
+    """Serve GET and HEAD with the decorated async view, other methods with ``fallback``.
+
+    The view is called with an authenticated ``request.user`` and returns a
+    response; unauthenticated requests get DRF's 401 response.
+    """
+    fallback = sync_to_async(fallback)
+
+    def decorator(view):
+        @csrf_exempt
+        @wraps(view)
+        async def dispatch(request, *args, **kwargs):
+            if request.method not in READ_METHODS:
+                return await fallback(request, *args, **kwargs)
+            response = await _authenticate(request)
+            if response is not None:
+                return response
+            return await view(request, *args, **kwargs)
+        return dispatch
+    return decorator
+
+
+async def _authenticate(request):
+    """Set ``request.user`` from the JWT, or return DRF's 401 response."""
+    auth = CachedJWTAuthentication()
+    try:
+        result = await auth.aauthenticate(request)
+        if result is None:
+            raise exceptions.NotAuthenticated()
+    except exceptions.APIException as exc:
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        return _json(data, status=401, headers={'WWW-Authenticate': auth.authenticate_header(request)})
+    request.user = result[0]
+    return None
+
+
+def _tasks(request):
+    """The user's tasks, with archived ones on ``?include_archived=true``."""
+    include_archived = request.GET.get('include_archived', '').lower() in ('1', 'true', 'yes')
+    model = TaskHistory if include_archived else Task
+    return model.objects.filter(user=request.user).select_related('user'), include_archived
+
+
+async def _paginated_list(request, tasks):
+    """Return one cursor page of tasks in the list representation."""
+    paginator = TaskCursorPagination()
+    drf_request = Request(request)
+    page = await paginator.apaginate_queryset(tasks, drf_request)
+    serializer = TaskListSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data).data
+
+
+@read_view(TaskViewSet.as_view({'get': 'list', 'post': 'create'}))
+async def task_list(request):
+    """List tasks, served from the per-user cache when possible."""
+    key = await auser_cache_key(request.user.pk, 'list', request.build_absolute_uri())
+    data = await aget_cached(key)
+    if data is None:
+        tasks, _ = _tasks(request)
+        data = await _paginated_list(request, tasks)
+        await aset_cached(key, data)
+    return _json(data)
+
+
+@read_view(TaskViewSet.as_view({
+    'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'
+}))
+async def task_detail(request, pk):
+    """Retrieve a task, served from the per-user cache when possible."""
+    tasks, include_archived = _tasks(request)
+    key = await auser_cache_key(request.user.pk, 'retrieve', pk, include_archived)
+    data = await aget_cached(key)
+    if data is None:
+        task = await tasks.filter(pk=pk).afirst()
+        if task is None:
+            return _json({'detail': 'No Task matches the given query.'}, status=404)
+        data = TaskSerializer(task).data
+        await aset_cached(key, data)
+    return _json(data)
+
+
+@read_view(TaskViewSet.as_view({'get': 'search'}))
+async def task_search(request):
+    """Search tasks by title or description."""
+    tasks, _ = _tasks(request)
+    query = request.GET.get('q', '')
+    if query:
+        tasks = tasks.filter(Q(title__icontains=query) | Q(description__icontains=query))
+    return _json(await _paginated_list(request, tasks))
+
+
+@read_view(TaskViewSet.as_view({'get': 'by_status'}))
+async def tasks_by_status(request):
+    """Filter tasks by status."""
+    tasks, _ = _tasks(request)
+    status_filter = request.GET.get('status', '')
+    if status_filter:
+        tasks = tasks.filter(status=status_filter)
+    return _json(await _paginated_list(request, tasks))
+
+
+@read_view(TaskViewSet.as_view({'get': 'by_priority'}))
+async def tasks_by_priority(request):
+    """Filter tasks by priority."""
+    tasks, _ = _tasks(request)
+    priority_filter = request.GET.get('priority', '')
+    if priority_filter:
+        tasks = tasks.filter(priority=priority_filter)
+    return _json(await _paginated_list(request, tasks))
+
+
+@read_view(UserViewSet.as_view({'get': 'profile'}))
+async def user_profile(request):
+    """Get current user profile with task statistics, from the per-user cache when possible."""
+    key = await auser_cache_key(request.user.pk, 'profile')
+    data = await aget_cached(key)
+    if data is None:
+        stats = await sync_to_async(UserTaskStats.for_user)(request.user.pk)
+        data = profile_data(request.user, stats)
+        await aset_cached(key, data)
+    return _json(data)
+
+
+@csrf_exempt
+async def graphql_view(request):
+    """Run a GraphQL query (``tasks.schema``) sent as GET parameters or a JSON body.
+
+    Always routed, whether ``TASK_ASYNC_VIEWS`` is on or not.
+    """
+    if request.method not in ('GET', 'POST'):
+        return _json({'detail': f'Method "{request.method}" not allowed.'}, status=405,
+                     headers={'Allow': 'GET, POST'})
+    response = await _authenticate(request)
+    if response is not None:
+        return response
+    try:
+        if request.method == 'GET':
+            params = request.GET.dict()
+            if params.get('variables'):
+                params['variables'] = json.loads(params['variables'])
+        else:
+            params = json.loads(request.body)
+    except ValueError:
+        return _json({'errors': [{'message': 'Request body and variables must be JSON.'}]}, status=400)
+    if not isinstance(params, dict) or not isinstance(params.get('query'), str):
+        return _json({'errors': [{'message': 'Must provide a query string.'}]}, status=400)
+    if not isinstance(params.get('variables') or {}, dict):
+        return _json({'errors': [{'message': 'Variables must be a JSON object.'}]}, status=400)
+    data, status = await execute_query(
+        request.user, params['query'], params.get('variables'), params.get('operationName'))
+    return _json(data, status=status)
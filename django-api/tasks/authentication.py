@@ -0,0 +1,143 @@
+"""
+Authentication classes for the Task Management API
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+
+This module contains a JWT authentication class that keeps recently seen
+users in a short-lived in-process cache instead of loading them from the
+database on every request. ``aauthenticate`` does the same for the async
+views in ``tasks.async_views``. Both send the rest of the request's task
+queries to the user's shard (see ``tasks.sharding``), and keep users who
+have just written off the read replicas (see ``tasks.read_replicas``).
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from .read_replicas import acheck_recent_writer, check_recent_writer
+from .sharding import activate_user
+
+
+class UserCache:
+    """A small thread-safe LRU cache of users with a time-to-live."""
+
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return user
+
+    def set(self, user_id, user):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache(
+    ttl=getattr(settings, 'JWT_USER_CACHE_TTL', 30),
+    max_size=getattr(settings, 'JWT_USER_CACHE_SIZE', 10000),
+)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWT authentication backed by the in-process user cache.
+
+    The user id comes from the token claims; the user row is loaded once and
+    then served from ``user_cache`` for ``JWT_USER_CACHE_TTL`` seconds, so
+    most requests run no authentication query. Saving or deleting a user
+    (deactivation, password change, profile update) drops the entry in this
+    process; other processes pick up the change within the TTL, which bounds
+    how long an inactive user can keep using a valid token.
+    """
+
+    def get_user(self, validated_token):
+        user_id = self._user_id(validated_token)
+        check_recent_writer(user_id)
+        user = user_cache.get(user_id)
+        if user is None:
+            try:
+                user = self.user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            user_cache.set(user_id, user)
+        return self._check_user(user, validated_token)
+
+    async def aauthenticate(self, request):
+        """``authenticate`` for async views; loads the user with the async ORM."""
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = self._user_id(validated_token)
+        await acheck_recent_writer(user_id)
+        user = user_cache.get(user_id)
+        if user is None:
+            try:
+                user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            user_cache.set(user_id, user)
+        return self._check_user(user, validated_token)
+
+    def _user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+    def _check_user(self, user, validated_token):
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        # The request's task queries go to the user's shard
+        activate_user(user.pk)
+        # Each request gets its own instance so views can modify it safely
+        return copy.copy(user)
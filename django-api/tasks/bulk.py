@@ -0,0 +1,96 @@
+"""
+Bulk write operations for tasks
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+
+This module writes many tasks at once with bulk_create, bulk_update and
+set-based deletes. bulk_create and bulk_update bypass Task.save(), so the
+rules it applies, the per-user counters and replication outbox it maintains
+and the cache invalidation its signals trigger are applied here explicitly.
+Callers are expected to run these functions inside a transaction on the
+active task database (see ``tasks.sharding``).
+"""
+
+from collections import Counter, defaultdict
+from django.utils import timezone
+from .cache import invalidate_user
+from .models import OutboxEvent, Task, TaskTombstone, UserTaskStats
+
+BATCH_SIZE = 500
+
+
+def bulk_create_tasks(user, items):
+    """Create tasks for ``user`` from validated serializer data."""
+    tasks = []
+    delta = Counter()
+    for attrs in items:
+        task = Task(user=user, **attrs)
+        task.sync_completed_at()
+        task.sync_is_overdue()
+        delta.update(task.stats_contribution())
+        tasks.append(task)
+    tasks = Task.objects.bulk_create(tasks, batch_size=BATCH_SIZE)
+    UserTaskStats.apply_delta(user.pk, delta)
+    OutboxEvent.record(OutboxEvent.TASKS, [task.pk for task in tasks])
+    for task in tasks:
+        task._remember_stats_state()
+    invalidate_user(user.pk)
+    return tasks
+
+
+def bulk_update_tasks(changes):
+    """Apply field changes to loaded tasks.
+
+    ``changes`` is a list of ``(task, attrs)`` pairs where ``attrs`` is the
+    validated serializer data for that task. Returns the updated tasks.
+    """
+    if not changes:
+        return []
+
+    now = timezone.now()
+    fields = {'completed_at', 'is_overdue', 'updated_at'}
+    tasks = []
+    deltas = defaultdict(Counter)
+    for task, attrs in changes:
+        old_counts = task.stats_contribution()
+        for name, value in attrs.items():
+            setattr(task, name, value)
+        fields.update(attrs)
+        task.sync_completed_at()
+        task.sync_is_overdue(now)
+        task.updated_at = now
+        deltas[task.user_id].update(task.stats_contribution())
+        deltas[task.user_id].subtract(old_counts)
+        tasks.append(task)
+
+    Task.objects.bulk_update(tasks, sorted(fields), batch_size=BATCH_SIZE)
+    OutboxEvent.record(OutboxEvent.TASKS, [task.pk for task in tasks])
+    for user_id, delta in deltas.items():
+        UserTaskStats.apply_delta(user_id, delta)
+        invalidate_user(user_id)
+    for task in tasks:
+        task._remember_stats_state()
+    return tasks
+
+
+def bulk_delete_tasks(queryset, ids):
+    """Delete the tasks in ``queryset`` whose id is in ``ids``.
+
+    Returns the set of ids that were deleted.
+    """
+    deleted = set()
+    ids = list(ids)
+    for start in range(0, len(ids), BATCH_SIZE):
+        batch = queryset.filter(id__in=ids[start:start + BATCH_SIZE])
+        rows = list(batch.values_list('id', 'user_id'))
+        found = {task_id for task_id, _ in rows}
+        if found:
+            counts = UserTaskStats.counts_by_user(batch)
+            OutboxEvent.record(OutboxEvent.TASKS, found, OutboxEvent.DELETE)
+            TaskTombstone.record(rows)
+            batch.delete()
+            for user_id, user_counts in counts.items():
+                UserTaskStats.apply_delta(user_id, UserTaskStats.negate(user_counts))
+            deleted |= found
+    return deleted
@@ -0,0 +1,109 @@
+"""
+Per-user response cache for the Task Management API
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+
+Cached entries are keyed on a per-user version number. Any write to a
+user's tasks bumps that number, which makes every older entry unreachable
+at once, so invalidation costs one cache operation however many entries
+exist. Stale entries simply expire.
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from .read_replicas import stick_to_primary
+from .sharding import current_db
+
+
+def _version_key(user_id):
+    return f'tasks:user:{user_id}:version'
+
+
+def _fresh_version():
+    # Start from the clock rather than 1 so a version key that was evicted
+    # never comes back with a number that older entries were stored under.
+    return int(time.time() * 1000)
+
+
+def get_user_version(user_id):
+    """Return the current cache version for a user."""
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _fresh_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_user_version(user_id):
+    """Invalidate every cached entry of a user."""
+    key = _version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _fresh_version(), timeout=None)
+
+
+def invalidate_user(user_id):
+    """Bump a user's version now and again once the transaction commits.
+
+    The immediate bump keeps reads later in the same request fresh; the
+    second one drops anything another request cached from the old rows
+    while the transaction was still open. From the commit on, the user's
+    reads also stay off the read replicas until they have caught up.
+    """
+    bump_user_version(user_id)
+    # The transaction is on the active task database, e.g. the user's shard
+    transaction.on_commit(lambda: _committed(user_id), using=current_db())
+
+
+def _committed(user_id):
+    bump_user_version(user_id)
+    stick_to_primary(user_id)
+
+
+def user_cache_key(user_id, name, *parts):
+    """Build a cache key in the user's current version namespace."""
+    return _user_cache_key(user_id, get_user_version(user_id), name, parts)
+
+
+def _user_cache_key(user_id, version, name, parts):
+    digest = hashlib.md5(':'.join(str(p) for p in parts).encode()).hexdigest()
+    return f'tasks:user:{user_id}:v{version}:{name}:{digest}'
+
+
+def get_cached(key):
+    return cache.get(key)
+
+
+def set_cached(key, data):
+    cache.set(key, data, settings.TASK_CACHE_TIMEOUT)
+
+
+# Async variants for tasks.async_views; they share keys with the ones above,
+# so a response cached by either view is served by both
+
+async def aget_user_version(user_id):
+    key = _version_key(user_id)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, _fresh_version(), timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+async def auser_cache_key(user_id, name, *parts):
+    return _user_cache_key(user_id, await aget_user_version(user_id), name, parts)
+
+
+async def aget_cached(key):
+    return await cache.aget(key)
+
+
+async def aset_cached(key, data):
+    await cache.aset(key, data, settings.TASK_CACHE_TIMEOUT)
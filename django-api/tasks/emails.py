@@ -0,0 +1,52 @@
+"""
+Email jobs for the Task Management API
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+"""
+
+from django.conf import settings
+from django.core.mail import send_mail
+from .jobs import job
+from .models import Task, User
+from .sharding import task_databases
+
+
+@job('send_welcome_email')
+def send_welcome_email(user_id):
+    """Send the welcome message to a newly registered user."""
+    if not getattr(settings, 'EMAIL_HOST', None):
+        return
+    user = User.objects.filter(pk=user_id).first()
+    if user is None:
+        return
+    # Errors propagate so the job is retried
+    send_mail(
+        subject='Welcome to Task Management App!',
+        message=f'Hi {user.first_name or user.username},\n\nWelcome to our Task Management Application! Your account has been successfully created.\n\nYou can now log in and start managing your tasks.\n\nBest regards,\nThe Task Management Team',
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipient_list=[user.email],
+    )
+
+
+@job('notify_task_overdue')
+def notify_task_overdue(task_id):
+    """Tell a task's owner that the task is past its due date."""
+    if not getattr(settings, 'EMAIL_HOST', None):
+        return
+    # The payload only has the id, which is unique across the shards
+    task = None
+    for db in task_databases():
+        task = Task.objects.using(db).select_related('user').filter(pk=task_id, is_overdue=True).first()
+        if task is not None:
+            break
+    if task is None:
+        # Completed, rescheduled or deleted since it became overdue
+        return
+    user = task.user
+    send_mail(
+        subject=f'Task overdue: {task.title}',
+        message=f'Hi {user.first_name or user.username},\n\nYour task "{task.title}" was due on {task.due_date:%Y-%m-%d %H:%M} UTC and is not done yet.\n\nBest regards,\nThe Task Management Team',
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipient_list=[user.email],
+    )
@@ -1,18 +1,22 @@
+import logging
+
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
 from django.db.models import Q
-from django.core.mail import send_mail
-from django.conf import settings
-from .models import User, Task
+from .models import User, UserTaskStats
+from .cache import user_cache_key, get_cached, set_cached
 from .serializers import (
-    UserSerializer, UserRegistrationSerializer, UserLoginSerializer,
+    UserSerializer, UserRegistrationSerializer, UserLoginSerializer, UserTaskStatsSerializer,
     TaskSerializer, TaskListSerializer
 )
+from .views import UserShardMixin
+
+logger = logging.getLogger(__name__)
 
-class EnhancedUserViewSet(viewsets.ModelViewSet):
+class EnhancedUserViewSet(UserShardMixin, viewsets.ModelViewSet):
     """Enhanced ViewSet for User model with additional features."""
     queryset = User.objects.all()
     serializer_class = UserSerializer
@@ -29,24 +33,12 @@ class EnhancedUserViewSet(viewsets.ModelViewSet):
         serializer = UserRegistrationSerializer(data=request.data)
         if serializer.is_valid():
             try:
+                # Also enqueues the welcome email
                 user = serializer.save()
                 refresh = RefreshToken.for_user(user)
                 
                 # Log successful registration
-                print(f"New user registered: {user.username} ({user.email})")
-                
-                # Send welcome email (if email is configured)
-                try:
-                    if hasattr(settings, 'EMAIL_HOST') and settings.EMAIL_HOST:
-                        send_mail(
-                            subject='Welcome to Task Management App!',
-                            message=f'Hi {user.first_name or user.username},\n\nWelcome to our Task Management Application! Your account has been successfully created.\n\nYou can now log in and start managing your tasks.\n\nBest regards,\nThe Task Management Team',
-                            from_email=settings.DEFAULT_FROM_EMAIL,
-                            recipient_list=[user.email],
-                            fail_silently=True,
-                        )
-                except Exception as email_error:
-                    print(f"Failed to send welcome email: {email_error}")
+                logger.info("New user registered: %s (%s)", user.username, user.email)
                 
                 return Response({
                     'message': 'User registered successfully! Welcome to our platform.',
@@ -57,7 +49,7 @@ class EnhancedUserViewSet(viewsets.ModelViewSet):
                     }
                 }, status=status.HTTP_201_CREATED)
             except Exception as e:
-                print(f"Registration error for {request.data.get('username', 'unknown')}: {str(e)}")
+                logger.exception("Registration error for %s", request.data.get('username', 'unknown'))
                 return Response({
                     'error': 'Registration failed. Please try again.'
                 }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -76,7 +68,7 @@ class EnhancedUserViewSet(viewsets.ModelViewSet):
             refresh = RefreshToken.for_user(user)
             
             # Log successful login
-            print(f"User logged in: {user.username}")
+            logger.info("User logged in: %s", user.username)
             
             return Response({
                 'message': 'Login successful',
@@ -96,22 +88,18 @@ class EnhancedUserViewSet(viewsets.ModelViewSet):
     def profile(self, request):
         """Get current user profile with additional stats."""
         user = request.user
-        user_data = UserSerializer(user).data
-        
-        # Add user statistics
-        total_tasks = Task.objects.filter(user=user).count()
-        completed_tasks = Task.objects.filter(user=user, status='done').count()
-        pending_tasks = Task.objects.filter(user=user, status='pending').count()
-        
-        return Response({
-            'user': user_data,
-            'stats': {
-                'total_tasks': total_tasks,
-                'completed_tasks': completed_tasks,
-                'pending_tasks': pending_tasks,
-                'completion_rate': round((completed_tasks / total_tasks * 100) if total_tasks > 0 else 0, 2)
-            }
-        })
+        key = user_cache_key(user.pk, 'enhanced_profile')
+        data = get_cached(key)
+        if data is not None:
+            return Response(data)
+
+        # User statistics from the denormalized counters (one primary-key read)
+        data = {
+            'user': UserSerializer(user).data,
+            'stats': UserTaskStatsSerializer(UserTaskStats.for_user(user.pk)).data,
+        }
+        set_cached(key, data)
+        return Response(data)
 
     @action(detail=False, methods=['post'])
     def change_password(self, request):
@@ -0,0 +1,154 @@
+"""
+Durable background jobs for the Task Management API
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+
+Jobs are rows in the ``jobs`` table of the application database, so no
+outside broker is needed and a job enqueued inside a transaction only
+becomes visible if that transaction commits. Workers (``manage.py
+run_jobs``) claim jobs with a conditional UPDATE that also sets a
+visibility timeout: a job whose worker dies is picked up again once the
+timeout passes. Failed jobs are retried with exponential backoff and
+jitter until ``max_attempts`` is reached.
+
+Handlers are registered with the ``job`` decorator::
+
+    @job('send_welcome_email')
+    def send_welcome_email(user_id):
+        ...
+
+    enqueue('send_welcome_email', {'user_id': user.id})
+"""
+
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+
+
+def job(name):
+    """Register the decorated function as the handler for jobs called ``name``."""
+    def decorator(func):
+        _handlers[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, payload=None, delay=0, max_attempts=None):
+    """Add a job to the queue and return it.
+
+    ``payload`` must be JSON serializable; it is passed to the handler as
+    keyword arguments.
+    """
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+
+
+def enqueue_many(name, payloads, max_attempts=None):
+    """Add one job per payload in a single batch of inserts."""
+    now = timezone.now()
+    max_attempts = max_attempts or settings.JOB_MAX_ATTEMPTS
+    return Job.objects.bulk_create(
+        [Job(name=name, payload=payload, run_at=now, max_attempts=max_attempts) for payload in payloads],
+        batch_size=500,
+    )
+
+
+def _available(now):
+    return Q(status='queued', run_at__lte=now) | Q(status='running', locked_until__lt=now)
+
+
+def claim_jobs(limit=10, visibility_timeout=None):
+    """Claim up to ``limit`` runnable jobs for this worker."""
+    now = timezone.now()
+    timeout = visibility_timeout or settings.JOB_VISIBILITY_TIMEOUT
+    candidates = list(
+        Job.objects.filter(_available(now)).order_by('run_at', 'id').values_list('id', flat=True)[:limit]
+    )
+    claimed = []
+    for job_id in candidates:
+        # Another worker may have claimed the job since it was selected
+        if Job.objects.filter(_available(now), id=job_id).update(
+            status='running',
+            locked_until=now + timedelta(seconds=timeout),
+            attempts=F('attempts') + 1,
+            updated_at=now,
+        ):
+            claimed.append(job_id)
+    return list(Job.objects.filter(id__in=claimed).order_by('run_at', 'id'))
+
+
+def retry_delay(attempts):
+    """Seconds to wait before the next attempt, with full jitter."""
+    delay = min(settings.JOB_RETRY_MAX_DELAY, settings.JOB_RETRY_BASE_DELAY * 2 ** (attempts - 1))
+    return random.uniform(delay / 2, delay)
+
+
+def _owned(claimed):
+    """The job row, while this worker's claim on it still holds.
+
+    Every claim increments ``attempts``, so once the visibility timeout has
+    passed and another worker has claimed the job, this one no longer
+    matches and its late result is dropped.
+    """
+    return Job.objects.filter(id=claimed.id, status='running', attempts=claimed.attempts)
+
+
+def run_job(claimed):
+    """Run a claimed job. Returns True if it succeeded.
+
+    The outcome is only recorded if the claim still holds; a job that ran
+    past its visibility timeout is left to the worker that claimed it next.
+    """
+    handler = _handlers.get(claimed.name)
+    try:
+        if handler is None:
+            raise LookupError(f'No handler registered for job {claimed.name!r}')
+        handler(**claimed.payload)
+    except Exception:
+        error = traceback.format_exc()
+        if claimed.attempts >= claimed.max_attempts:
+            logger.error('Job %s (%s) failed permanently after %s attempts',
+                         claimed.id, claimed.name, claimed.attempts)
+            finished = _owned(claimed).update(
+                status='failed', locked_until=None, last_error=error, updated_at=timezone.now()
+            )
+        else:
+            delay = retry_delay(claimed.attempts)
+            logger.warning('Job %s (%s) failed, retrying in %.0fs', claimed.id, claimed.name, delay)
+            finished = _owned(claimed).update(
+                status='queued',
+                run_at=timezone.now() + timedelta(seconds=delay),
+                locked_until=None,
+                last_error=error,
+                updated_at=timezone.now(),
+            )
+        if not finished:
+            logger.warning('Job %s (%s) was claimed again before it failed', claimed.id, claimed.name)
+        return False
+
+    if not _owned(claimed).delete()[0]:
+        logger.warning('Job %s (%s) was claimed again before it finished', claimed.id, claimed.name)
+    return True
+
+
+def run_pending(limit=10, visibility_timeout=None):
+    """Claim and run one batch of jobs. Returns the number of jobs processed."""
+    claimed = claim_jobs(limit, visibility_timeout)
+    for claimed_job in claimed:
+        run_job(claimed_job)
+    return len(claimed)
@@ -0,0 +1,116 @@
+"""
+Batched data loaders for the GraphQL endpoint
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+
+A loader collects the keys asked for while a GraphQL query resolves one
+level of its result and fetches them all with one query on the next turn of
+the event loop. A list of 500 tasks therefore loads its users, or their
+counters, with one statement instead of 500. Loaded values are kept for the
+rest of the request; every request gets its own ``Loaders``.
+"""
+
+import asyncio
+from collections import defaultdict
+
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+from .models import Task, TaskHistory, User, UserTaskStats
+
+# Keys fetched per query, well under SQLite's limit on bound parameters
+BATCH_SIZE = 500
+
+
+class DataLoader:
+    """Batch and cache the ``load(key)`` calls made in one event loop iteration.
+
+    ``batch_load`` is a coroutine function that takes a list of keys and
+    returns a dict of the values it found; keys it leaves out load as None.
+    """
+
+    def __init__(self, batch_load):
+        self.batch_load = batch_load
+        self._futures = {}
+        self._pending = []
+
+    def load(self, key):
+        """Return a future for the value of ``key``."""
+        future = self._futures.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._futures[key] = loop.create_future()
+            if not self._pending:
+                # After the callbacks already scheduled, i.e. once the other
+                # items of the list being resolved have asked for their keys
+                loop.call_soon(self._dispatch)
+            self._pending.append(key)
+        return future
+
+    def prime(self, key, value):
+        """Cache a value that is already loaded."""
+        if key not in self._futures:
+            future = self._futures[key] = asyncio.get_running_loop().create_future()
+            future.set_result(value)
+
+    def _dispatch(self):
+        keys, self._pending = self._pending, []
+        asyncio.ensure_future(self._fetch(keys))
+
+    async def _fetch(self, keys):
+        values = {}
+        try:
+            for start in range(0, len(keys), BATCH_SIZE):
+                values.update(await self.batch_load(keys[start:start + BATCH_SIZE]))
+        except Exception as exc:
+            for key in keys:
+                self._futures[key].set_exception(exc)
+            return
+        for key in keys:
+            self._futures[key].set_result(values.get(key))
+
+
+class Loaders:
+    """The data loaders of one GraphQL request made by ``user``."""
+
+    def __init__(self, user):
+        self.users = DataLoader(self._users)
+        self.users.prime(user.pk, user)
+        self.stats = DataLoader(self._stats)
+        self.priority_counts = DataLoader(self._priority_counts)
+        self.user_tasks = DataLoader(self._user_tasks)
+
+    async def _users(self, user_ids):
+        return {user.pk: user async for user in User.objects.filter(pk__in=user_ids)}
+
+    async def _stats(self, user_ids):
+        found = {stats.user_id: stats async for stats in UserTaskStats.objects.filter(user_id__in=user_ids)}
+        # Users who never had a task have no counters yet
+        return {user_id: found.get(user_id) or UserTaskStats(user_id=user_id) for user_id in user_ids}
+
+    async def _priority_counts(self, user_ids):
+        """Tasks per priority, archived ones included, like the counters."""
+        counts = {user_id: {priority: 0 for priority, _ in Task.PRIORITY_CHOICES} for user_id in user_ids}
+        rows = (TaskHistory.objects.filter(user_id__in=user_ids)
+                .values('user_id', 'priority').annotate(count=Count('id')).order_by())
+        async for row in rows:
+            counts[row['user_id']][row['priority']] = row['count']
+        return counts
+
+    async def _user_tasks(self, keys):
+        """The newest tasks of each user, for keys of ``(user_id, status, first)``."""
+        user_ids = defaultdict(list)
+        for user_id, status, first in keys:
+            user_ids[status, first].append(user_id)
+        found = defaultdict(list)
+        for (status, first), ids in user_ids.items():
+            tasks = Task.objects.filter(user_id__in=ids)
+            if status:
+                tasks = tasks.filter(status=status)
+            # The first tasks of every user in one query
+            tasks = tasks.annotate(row=Window(
+                RowNumber(), partition_by=F('user_id'), order_by=(F('created_at').desc(), F('id').desc()),
+            )).filter(row__lte=first).order_by('user_id', '-created_at', '-id')
+            async for task in tasks:
+                found[task.user_id, status, first].append(task)
+        return {key: found[key] for key in keys}
@@ -0,0 +1,35 @@
+"""
+SQLite maintenance for the Task Management API
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+
+Every connection is opened with the shared profile of
+``taskmanager_common.sqlite``. The statistics and WAL upkeep that profile
+leaves to a periodic task run here, as ``optimize_sqlite``, on each primary
+database.
+"""
+
+from django.db import connections
+from taskmanager_common import sqlite
+from taskmanager_common.sqlite import CHECKPOINT_MODES
+from .read_replicas import primary_of
+
+
+def primary_databases():
+    """Return every database alias except the read replicas."""
+    return [alias for alias in connections if primary_of(alias) == alias]
+
+
+def optimize(alias, checkpoint='TRUNCATE'):
+    """Refresh the planner statistics of database ``alias`` and checkpoint its WAL.
+
+    Returns the checkpoint result as a dict: ``busy`` is true when readers or
+    a writer kept it from finishing, ``wal_pages`` and ``checkpointed`` are
+    the pages in the WAL and those copied back, both -1 without WAL.
+    """
+    if checkpoint not in CHECKPOINT_MODES:
+        raise ValueError(f'Unknown checkpoint mode {checkpoint!r}')
+    with connections[alias].cursor() as cursor:
+        busy, wal_pages, checkpointed = sqlite.optimize(cursor, checkpoint)
+    return {'busy': bool(busy), 'wal_pages': wal_pages, 'checkpointed': checkpointed}
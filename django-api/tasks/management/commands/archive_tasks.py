@@ -0,0 +1,37 @@
+"""
+Move old done and cancelled tasks to the archive table
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from tasks.archive import archive_tasks
+
+
+class Command(BaseCommand):
+    help = 'Archive tasks that have been done or cancelled for longer than TASK_ARCHIVE_AFTER_DAYS.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=settings.TASK_ARCHIVE_AFTER_DAYS,
+                            help='Archive tasks closed more than this many days ago.')
+        parser.add_argument('--batch-size', type=int, default=settings.TASK_ARCHIVE_BATCH_SIZE,
+                            help='Tasks moved per transaction.')
+        parser.add_argument('--pause', type=float, default=settings.TASK_ARCHIVE_BATCH_PAUSE,
+                            help='Seconds to sleep between batches.')
+        parser.add_argument('--limit', type=int,
+                            help='Stop after archiving this many tasks.')
+
+    def handle(self, *args, **options):
+        progress = None
+        if options['verbosity'] > 1:
+            progress = lambda total: self.stdout.write(f'Archived {total} task(s)...')
+        archived = archive_tasks(
+            older_than_days=options['older_than_days'],
+            batch_size=options['batch_size'],
+            pause=options['pause'],
+            limit=options['limit'],
+            progress=progress,
+        )
+        self.stdout.write(f'Archived {archived} task(s).')
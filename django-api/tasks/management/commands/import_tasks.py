@@ -0,0 +1,61 @@
+"""
+Import tasks for a user from a CSV or NDJSON file
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+"""
+
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from tasks import importer
+from tasks.models import User
+
+
+class Command(BaseCommand):
+    help = 'Stream tasks from a CSV or NDJSON file into the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import, or - for standard input.')
+        parser.add_argument('--user', required=True,
+                            help='Username of the owner of the imported tasks.')
+        parser.add_argument('--format', dest='file_format', choices=importer.FORMATS,
+                            help='File format; detected from the file name if omitted.')
+        parser.add_argument('--chunk-size', type=int,
+                            help='Rows validated and inserted per transaction.')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist")
+
+        path = options['path']
+        file_format = options['file_format'] or importer.detect_format(path)
+        if file_format is None:
+            raise CommandError('Cannot tell the file format from its name, use --format')
+
+        stream = sys.stdin.buffer if path == '-' else open(path, 'rb')
+        try:
+            result = importer.import_tasks(
+                user, stream, file_format,
+                chunk_size=options['chunk_size'],
+                progress=self._progress,
+            )
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
+
+        for error in result.errors:
+            self.stderr.write(f"Row {error['row']}: {error['errors']}")
+        if result.errors_truncated:
+            self.stderr.write(f'... {result.failed - len(result.errors)} more invalid row(s)')
+        self.stdout.write(
+            f'Imported {result.created} task(s), skipped {result.failed} invalid row(s) '
+            f'in {result.elapsed_seconds:.1f}s ({result.rows_per_second:.0f} rows/s).'
+        )
+        if result.error:
+            raise CommandError(f'Import stopped: {result.error}')
+
+    def _progress(self, result):
+        self.stdout.write(f'{result.created + result.failed} rows, {result.rows_per_second:.0f} rows/s')
@@ -0,0 +1,55 @@
+"""
+Refresh SQLite planner statistics and checkpoint the WAL
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+"""
+
+import signal
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from tasks.maintenance import CHECKPOINT_MODES, optimize, primary_databases
+
+
+class Command(BaseCommand):
+    help = ('Update the query planner statistics of each database and checkpoint its WAL. '
+            'Run it periodically, e.g. hourly from cron, or keep it running with --interval.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', action='append', dest='databases',
+                            help='Only this database (may be repeated).')
+        parser.add_argument('--checkpoint', choices=CHECKPOINT_MODES, default='TRUNCATE',
+                            help='WAL checkpoint mode.')
+        parser.add_argument('--interval', type=float,
+                            help='Repeat every this many seconds instead of exiting.')
+
+    def handle(self, *args, **options):
+        databases = primary_databases()
+        if options['databases']:
+            unknown = set(options['databases']) - set(databases)
+            if unknown:
+                raise CommandError(f'Unknown database(s): {", ".join(sorted(unknown))}')
+            databases = options['databases']
+
+        self._stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        while not self._stopping:
+            for alias in databases:
+                result = optimize(alias, options['checkpoint'])
+                if result['wal_pages'] < 0:
+                    wal = 'no WAL'
+                else:
+                    wal = f"{result['checkpointed']} of {result['wal_pages']} WAL page(s) checkpointed"
+                    if result['busy']:
+                        wal += ', busy'
+                self.stdout.write(f'{alias}: statistics updated, {wal}.')
+            if options['interval'] is None:
+                break
+            time.sleep(options['interval'])
+
+    def _stop(self, signum, frame):
+        # Finish the current pass, then exit
+        self._stopping = True
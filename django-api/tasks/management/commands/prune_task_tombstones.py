@@ -0,0 +1,22 @@
+"""
+Delete old tombstones of deleted tasks
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from tasks.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = 'Delete task tombstones older than TASK_SYNC_TOMBSTONE_DAYS.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=settings.TASK_SYNC_TOMBSTONE_DAYS,
+                            help='Delete tombstones older than this many days.')
+
+    def handle(self, *args, **options):
+        deleted = prune_tombstones(options['older_than_days'])
+        self.stdout.write(f'Deleted {deleted} tombstone(s).')
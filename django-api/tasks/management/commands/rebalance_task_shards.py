@@ -0,0 +1,33 @@
+"""
+Move users' tasks to the shard they belong to
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+"""
+
+from django.core.management.base import BaseCommand
+from tasks.sharding import rebalance
+
+
+class Command(BaseCommand):
+    help = ('Copy users into every shard and move the tasks, archived tasks and tombstones of '
+            'users whose shard changed, e.g. after TASK_SHARDS was raised. Stop the API and the '
+            'background commands first.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Rows copied and deleted per transaction.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report what would be moved.')
+
+    def handle(self, *args, **options):
+        progress = None
+        if options['verbosity'] > 1:
+            progress = lambda user_id: self.stdout.write(f'Moved user {user_id}...')
+        users, rows = rebalance(
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+            progress=progress,
+        )
+        verb = 'Would move' if options['dry_run'] else 'Moved'
+        self.stdout.write(f'{verb} {rows} row(s) of {users} user(s).')
@@ -0,0 +1,27 @@
+"""
+Rebuild the denormalized per-user task counters
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+"""
+
+from django.core.management.base import BaseCommand
+from tasks.models import UserTaskStats
+from tasks.sharding import task_databases, use_db
+
+
+class Command(BaseCommand):
+    help = 'Recompute UserTaskStats counters from the tasks table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='Only rebuild this user id (may be given more than once).',
+        )
+
+    def handle(self, *args, **options):
+        rebuilt = 0
+        for db in task_databases():
+            with use_db(db):
+                rebuilt += UserTaskStats.rebuild(user_ids=options['user_ids'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt task stats for {rebuilt} user(s).'))
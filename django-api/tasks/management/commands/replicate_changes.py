@@ -0,0 +1,82 @@
+"""
+Replicate user and task changes to the Flask and FastAPI stores
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+"""
+
+import logging
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from tasks import replication
+
+logger = logging.getLogger('tasks.replication')
+
+
+class Command(BaseCommand):
+    help = 'Apply outbox events to the replication targets in REPLICATION_TARGETS.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', action='append', dest='targets',
+                            help='Replicate only to this target (may be repeated).')
+        parser.add_argument('--once', action='store_true',
+                            help='Catch every target up, then exit.')
+        parser.add_argument('--batch-size', type=int, default=settings.REPLICATION_BATCH_SIZE,
+                            help='Outbox events applied per replica transaction.')
+        parser.add_argument('--poll-interval', type=float, default=settings.REPLICATION_POLL_INTERVAL,
+                            help='Seconds to sleep when every target is caught up.')
+        parser.add_argument('--status', action='store_true',
+                            help='Print the checkpoint and lag of each target, then exit.')
+
+    def handle(self, *args, **options):
+        targets = settings.REPLICATION_TARGETS
+        if options['targets']:
+            unknown = set(options['targets']) - set(targets)
+            if unknown:
+                raise CommandError(f'Unknown replication target(s): {", ".join(sorted(unknown))}')
+            targets = {name: targets[name] for name in options['targets']}
+
+        if options['status']:
+            self._write_status(targets)
+            return
+
+        self._stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        applied = 0
+        while not self._stopping:
+            count = 0
+            for name, config in targets.items():
+                try:
+                    count += replication.replicate(name, config, options['batch_size'])
+                except Exception:
+                    # Leave the checkpoint where it is and retry on the next pass
+                    logger.exception('Replication to %s failed', name)
+            applied += count
+            if count == 0:
+                replication.prune()
+                for row in replication.status(targets):
+                    logger.info('Replication %(target)s: %(pending_events)d pending, lag %(lag_seconds).1fs', row)
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+
+        self.stdout.write(f'Applied {applied} event(s).')
+
+    def _write_status(self, targets):
+        for row in replication.status(targets):
+            self.stdout.write(
+                f"{row['target']}: event {row['last_event_id']}, "
+                f"{row['pending_events']} pending, lag {row['lag_seconds']:.1f}s"
+            )
+            if len(row['checkpoints']) > 1:
+                for db, last_event_id in row['checkpoints'].items():
+                    self.stdout.write(f'  {db}: event {last_event_id}')
+
+    def _stop(self, signum, frame):
+        # Finish the current batch, then exit
+        self._stopping = True
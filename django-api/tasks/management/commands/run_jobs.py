@@ -0,0 +1,47 @@
+"""
+Run the background job worker
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+"""
+
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from tasks.jobs import run_pending
+
+
+class Command(BaseCommand):
+    help = 'Process jobs from the database-backed job queue.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Process the jobs that are due now, then exit.')
+        parser.add_argument('--batch-size', type=int, default=10,
+                            help='Jobs to claim at a time.')
+        parser.add_argument('--poll-interval', type=float, default=settings.JOB_POLL_INTERVAL,
+                            help='Seconds to sleep when the queue is empty.')
+        parser.add_argument('--visibility-timeout', type=int, default=settings.JOB_VISIBILITY_TIMEOUT,
+                            help='Seconds a claimed job stays invisible to other workers.')
+
+    def handle(self, *args, **options):
+        self._stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        processed = 0
+        while not self._stopping:
+            count = run_pending(options['batch_size'], options['visibility_timeout'])
+            processed += count
+            if options['once'] and count == 0:
+                break
+            if count == 0:
+                time.sleep(options['poll_interval'])
+
+        self.stdout.write(f'Processed {processed} job(s).')
+
+    def _stop(self, signum, frame):
+        # Finish the current batch, then exit
+        self._stopping = True
@@ -0,0 +1,37 @@
+"""
+Flag tasks as overdue when their due date passes
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+"""
+
+import signal
+
+from django.core.management.base import BaseCommand
+from tasks.overdue import OverdueScheduler, mark_overdue
+from tasks.sharding import task_databases, use_db
+
+
+class Command(BaseCommand):
+    help = 'Keep Task.is_overdue and the overdue counters current as due dates pass.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Flag every task already past due, then exit.')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            flagged = 0
+            for db in task_databases():
+                with use_db(db):
+                    flagged += len(mark_overdue())
+            self.stdout.write(f'Flagged {flagged} task(s) overdue.')
+            return
+
+        self._stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        OverdueScheduler().run(should_stop=lambda: self._stopping)
+
+    def _stop(self, signum, frame):
+        self._stopping = True
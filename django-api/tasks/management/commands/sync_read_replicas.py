@@ -0,0 +1,63 @@
+"""
+Refresh the read replicas of the task databases
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+"""
+
+import logging
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from tasks import read_replicas
+
+logger = logging.getLogger('tasks.read_replicas')
+
+
+class Command(BaseCommand):
+    help = 'Copy each database to its read replicas (DB_READ_REPLICAS) with the SQLite backup API.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Refresh every replica once, then exit.')
+        parser.add_argument('--interval', type=float, default=settings.READ_REPLICA_SYNC_INTERVAL,
+                            help='Seconds between the start of two refreshes.')
+        parser.add_argument('--status', action='store_true',
+                            help='Print the lag of each replica, then exit.')
+
+    def handle(self, *args, **options):
+        if not read_replicas.replica_aliases():
+            raise CommandError('No read replicas are configured; set DB_READ_REPLICAS.')
+
+        if options['status']:
+            for row in read_replicas.status():
+                lag = 'unavailable' if row['lag'] is None else f"lag {row['lag']:.1f}s"
+                self.stdout.write(f"{row['replica']} ({row['primary']}): {lag}")
+            return
+
+        self._stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        while not self._stopping:
+            started = time.monotonic()
+            try:
+                read_replicas.sync_read_replicas()
+            except Exception:
+                # The replicas keep their last copy; the router stops reading
+                # them once that is older than READ_REPLICA_MAX_LAG
+                logger.exception('Refreshing the read replicas failed')
+            took = time.monotonic() - started
+            if took > settings.READ_REPLICA_MAX_LAG:
+                logger.warning('Refreshing the read replicas took %.1fs, more than READ_REPLICA_MAX_LAG', took)
+            if options['once']:
+                break
+            time.sleep(max(0.0, options['interval'] - took))
+
+        self.stdout.write('Read replicas refreshed.')
+
+    def _stop(self, signum, frame):
+        # Finish the current refresh, then exit
+        self._stopping = True
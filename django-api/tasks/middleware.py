@@ -0,0 +1,90 @@
+"""
+Per-request database query instrumentation
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+
+``QueryInstrumentationMiddleware`` counts and times the SQL statements a
+request runs, using a database execute wrapper, so it works with DEBUG off
+and costs a clock read and a dict update per statement. The fingerprints,
+N+1 detection (``QUERY_N_PLUS_ONE_THRESHOLD``), response headers and JSON
+log line, on the ``tasks.queries`` logger, are those of
+``taskmanager_common.queries``, shared with the other services. The
+middleware runs natively under both WSGI and ASGI.
+"""
+
+import logging
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from taskmanager_common import queries
+
+logger = logging.getLogger('tasks.queries')
+
+
+class QueryStats(queries.QueryStats):
+    """``QueryStats`` that records as a database execute wrapper."""
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.record(sql, time.perf_counter() - start)
+
+
+class QueryInstrumentationMiddleware:
+    """Report the queries each request runs. See the module docstring."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = settings.QUERY_INSTRUMENTATION_ENABLED
+        self.threshold = settings.QUERY_N_PLUS_ONE_THRESHOLD
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        stats = QueryStats()
+        started = time.perf_counter()
+        with self._instrument(stats):
+            response = self.get_response(request)
+        return self._report(request, response, stats, started)
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        stats = QueryStats()
+        started = time.perf_counter()
+        # Database connections belong to a thread, so the wrappers go on the
+        # ones of the thread the async ORM runs this request's queries in
+        stack = await sync_to_async(self._instrument)(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self._report(request, response, stats, started)
+
+    def _instrument(self, stats):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats))
+        return stack
+
+    def _report(self, request, response, stats, started):
+        headers = queries.report(stats, self.threshold, logger, request.method, request.path,
+                                 response.status_code, time.perf_counter() - started)
+        for name, value in headers.items():
+            response[name] = value
+        return response
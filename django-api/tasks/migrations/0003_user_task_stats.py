@@ -0,0 +1,53 @@
+# Generated by Django 5.2.5 on 2026-10-19 09:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def populate_stats(apps, schema_editor):
+    """Compute the counters for users that already have tasks."""
+    User = apps.get_model('tasks', 'User')
+    Task = apps.get_model('tasks', 'Task')
+    UserTaskStats = apps.get_model('tasks', 'UserTaskStats')
+
+    stats = {pk: UserTaskStats(user_id=pk) for pk in User.objects.values_list('pk', flat=True)}
+    rows = Task.objects.order_by().values('user_id', 'status').annotate(
+        n=Count('id'),
+        with_due_date=Count('id', filter=Q(due_date__isnull=False)),
+    )
+    for row in rows:
+        row_stats = stats[row['user_id']]
+        row_stats.total += row['n']
+        setattr(row_stats, row['status'], getattr(row_stats, row['status']) + row['n'])
+        if row['status'] not in ('done', 'cancelled'):
+            row_stats.overdue_candidates += row['with_due_date']
+    UserTaskStats.objects.bulk_create(stats.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0002_task_user_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserTaskStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='task_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total', models.IntegerField(default=0)),
+                ('todo', models.IntegerField(default=0)),
+                ('in_progress', models.IntegerField(default=0)),
+                ('review', models.IntegerField(default=0)),
+                ('done', models.IntegerField(default=0)),
+                ('cancelled', models.IntegerField(default=0)),
+                ('overdue_candidates', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'user_task_stats',
+            },
+        ),
+        migrations.RunPython(populate_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.5 on 2026-10-19 09:18
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def seed_outbox(apps, schema_editor):
+    """Queue every existing user and task so targets start from a full copy."""
+    User = apps.get_model('tasks', 'User')
+    Task = apps.get_model('tasks', 'Task')
+    OutboxEvent = apps.get_model('tasks', 'OutboxEvent')
+
+    events = [OutboxEvent(table='users', row_id=pk) for pk in User.objects.values_list('pk', flat=True)]
+    events += [OutboxEvent(table='tasks', row_id=pk) for pk in Task.objects.values_list('pk', flat=True)]
+    OutboxEvent.objects.bulk_create(events, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0004_job_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('table', models.CharField(choices=[('users', 'Users'), ('tasks', 'Tasks')], max_length=10)),
+                ('row_id', models.BigIntegerField()),
+                ('operation', models.CharField(choices=[('upsert', 'Upsert'), ('delete', 'Delete')], default='upsert', max_length=10)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'outbox_events',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReplicationCheckpoint',
+            fields=[
+                ('target', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('last_event_id', models.BigIntegerField(default=0)),
+                ('applied_events', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'replication_checkpoints',
+            },
+        ),
+        migrations.RunPython(seed_outbox, migrations.RunPython.noop),
+    ]
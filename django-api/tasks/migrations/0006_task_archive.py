@@ -0,0 +1,74 @@
+# Generated by Django 5.2.5 on 2026-10-19 09:35
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+COLUMNS = 'id, title, description, user_id, priority, status, due_date, completed_at, created_at, updated_at'
+
+CREATE_TASKS_ALL = f"""
+CREATE VIEW tasks_all AS
+SELECT {COLUMNS}, 0 AS archived FROM tasks
+UNION ALL
+SELECT {COLUMNS}, 1 AS archived FROM tasks_archive
+"""
+
+DROP_TASKS_ALL = 'DROP VIEW IF EXISTS tasks_all'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0005_replication_outbox'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='outboxevent',
+            name='operation',
+            field=models.CharField(choices=[('upsert', 'Upsert'), ('delete', 'Delete'), ('archive', 'Archive')], default='upsert', max_length=10),
+        ),
+        migrations.CreateModel(
+            name='ArchivedTask',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField(blank=True)),
+                ('priority', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High'), ('urgent', 'Urgent')], max_length=10)),
+                ('status', models.CharField(choices=[('todo', 'To Do'), ('in_progress', 'In Progress'), ('review', 'Review'), ('done', 'Done'), ('cancelled', 'Cancelled')], max_length=15)),
+                ('due_date', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_tasks', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'tasks_archive',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', '-created_at', '-id'], name='tasks_archive_user_created_idx')],
+            },
+        ),
+        migrations.RunSQL(CREATE_TASKS_ALL, DROP_TASKS_ALL),
+        migrations.CreateModel(
+            name='TaskHistory',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField(blank=True)),
+                ('priority', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High'), ('urgent', 'Urgent')], max_length=10)),
+                ('status', models.CharField(choices=[('todo', 'To Do'), ('in_progress', 'In Progress'), ('review', 'Review'), ('done', 'Done'), ('cancelled', 'Cancelled')], max_length=15)),
+                ('due_date', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived', models.BooleanField()),
+            ],
+            options={
+                'db_table': 'tasks_all',
+                'ordering': ['-created_at'],
+                'managed': False,
+            },
+        ),
+    ]
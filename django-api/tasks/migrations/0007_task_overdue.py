@@ -0,0 +1,79 @@
+# Generated by Django 5.2.5 on 2026-10-19 09:39
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.utils import timezone
+
+COLUMNS = 'id, title, description, user_id, priority, status, due_date, completed_at, created_at, updated_at'
+
+# SQLite rebuilds the tasks table to add the column, which fails while a
+# view refers to it, so tasks_all is dropped first and recreated after
+OLD_TASKS_ALL = f"""
+CREATE VIEW tasks_all AS
+SELECT {COLUMNS}, 0 AS archived FROM tasks
+UNION ALL
+SELECT {COLUMNS}, 1 AS archived FROM tasks_archive
+"""
+
+CREATE_TASKS_ALL = f"""
+CREATE VIEW tasks_all AS
+SELECT {COLUMNS}, is_overdue, 0 AS archived FROM tasks
+UNION ALL
+SELECT {COLUMNS}, 0 AS is_overdue, 1 AS archived FROM tasks_archive
+"""
+
+DROP_TASKS_ALL = 'DROP VIEW IF EXISTS tasks_all'
+
+
+def mark_overdue(apps, schema_editor):
+    """Flag the tasks already overdue and count them per user."""
+    Task = apps.get_model('tasks', 'Task')
+    UserTaskStats = apps.get_model('tasks', 'UserTaskStats')
+    OutboxEvent = apps.get_model('tasks', 'OutboxEvent')
+    overdue = Task.objects.filter(
+        due_date__lte=timezone.now(),
+        status__in=['todo', 'in_progress', 'review'],
+    )
+    task_ids = list(overdue.values_list('id', flat=True))
+    if not task_ids:
+        return
+    counts = overdue.order_by().values('user_id').annotate(n=Count('id'))
+    for row in counts:
+        UserTaskStats.objects.filter(user_id=row['user_id']).update(overdue=row['n'])
+    Task.objects.filter(id__in=task_ids).update(is_overdue=True)
+    now = timezone.now()
+    OutboxEvent.objects.bulk_create(
+        [OutboxEvent(table='tasks', row_id=task_id, operation='upsert', created_at=now) for task_id in task_ids],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0006_task_archive'),
+    ]
+
+    operations = [
+        migrations.RunSQL(DROP_TASKS_ALL, OLD_TASKS_ALL),
+        migrations.AddField(
+            model_name='task',
+            name='is_overdue',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='usertaskstats',
+            name='overdue',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_overdue', True)), fields=['user', '-created_at', '-id'], name='tasks_user_overdue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('due_date__isnull', False), ('is_overdue', False), ('status__in', ['todo', 'in_progress', 'review'])), fields=['due_date'], name='tasks_pending_due_idx'),
+        ),
+        migrations.RunSQL(CREATE_TASKS_ALL, DROP_TASKS_ALL),
+        migrations.RunPython(mark_overdue, migrations.RunPython.noop),
+    ]
@@ -4,12 +4,19 @@ Django Models for Task Management Application
 Author: Eon (Himanshu Shekhar)
 Email: eonhimanshu@gmail.com
 
-This module contains the database models for users and tasks.
+This module contains the database models for users, tasks and per-user
+task statistics, the background job queue and the replication outbox.
+With ``TASK_SHARDS`` above 1 the task models live in per-user shards; see
+``tasks.sharding``.
 """
 
-from django.db import models
+from collections import Counter
+from django.db import models, router, transaction
+from django.db.models import Count, F, Q
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
+from .cache import invalidate_user
+from .sharding import allocate_ids, current_db, is_sharded, shard_for_user, use_db
 
 class User(AbstractUser):
     """Custom User model for the task management system."""
@@ -41,6 +48,51 @@ class User(AbstractUser):
     def __str__(self):
         return self.username
 
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(User, instance=self)
+        # The user's outbox events go with the user, not to a task shard
+        with use_db(using), transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+            OutboxEvent.record(OutboxEvent.USERS, [self.pk])
+
+    def delete(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(User, instance=self)
+        with use_db(using), transaction.atomic(using=using):
+            # Tasks go with the user through a cascade that bypasses Task.delete();
+            # with shards it runs when the copy in the user's shard is deleted
+            task_ids = list(self.tasks.values_list('pk', flat=True))
+            task_ids += self.archived_tasks.values_list('pk', flat=True)
+            OutboxEvent.record(OutboxEvent.TASKS, task_ids, OutboxEvent.DELETE)
+            OutboxEvent.record(OutboxEvent.USERS, [self.pk], OutboxEvent.DELETE)
+            return super().delete(*args, **kwargs)
+
+class TaskQuerySet(models.QuerySet):
+    """Writes new tasks to their users' shards unless ``using()`` says otherwise."""
+
+    def create(self, **kwargs):
+        if self._db is not None or not is_sharded():
+            return super().create(**kwargs)
+        task = self.model(**kwargs)
+        task.save(force_insert=True)
+        return task
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        if not is_sharded():
+            return super().bulk_create(objs, *args, **kwargs)
+        # Ids must be unique across shards, so they are not left to SQLite
+        new = [task for task in objs if task.pk is None]
+        for task, task_id in zip(new, allocate_ids('tasks', len(new))):
+            task.pk = task_id
+        if self._db is not None:
+            return super().bulk_create(objs, *args, **kwargs)
+        by_db = {}
+        for task in objs:
+            by_db.setdefault(router.db_for_write(self.model, instance=task), []).append(task)
+        for db, tasks in by_db.items():
+            self.using(db).bulk_create(tasks, *args, **kwargs)
+        return objs
+
 class Task(models.Model):
     """Task model for the task management system."""
     PRIORITY_CHOICES = [
@@ -57,6 +109,7 @@ class Task(models.Model):
         ('done', 'Done'),
         ('cancelled', 'Cancelled'),
     ]
+    OPEN_STATUSES = ('todo', 'in_progress', 'review')
 
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
@@ -65,20 +118,491 @@ class Task(models.Model):
     status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='todo')
     due_date = models.DateTimeField(null=True, blank=True)
     completed_at = models.DateTimeField(null=True, blank=True)
+    # Kept current by save() and, as due dates pass, by the overdue scheduler
+    is_overdue = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = TaskQuerySet.as_manager()
+
     class Meta:
         db_table = 'tasks'
         ordering = ['-created_at']
+        indexes = [
+            # Backs the per-user cursor pagination on (created_at, id)
+            models.Index(fields=['user', '-created_at', '-id'], name='tasks_user_created_idx'),
+            # Backs the changes feed on (updated_at, id)
+            models.Index(fields=['user', 'updated_at', 'id'], name='tasks_user_updated_idx'),
+            # The same pagination over a user's overdue tasks only
+            models.Index(fields=['user', '-created_at', '-id'], name='tasks_user_overdue_idx',
+                         condition=Q(is_overdue=True)),
+            # The admin changelist over every user's tasks, newest first,
+            # and its created and due date filters
+            models.Index(fields=['-created_at', '-id'], name='tasks_created_idx'),
+            models.Index(fields=['due_date'], name='tasks_due_date_idx'),
+            # Open tasks still to become overdue, in the order they will
+            models.Index(fields=['due_date'], name='tasks_pending_due_idx',
+                         condition=Q(is_overdue=False, due_date__isnull=False,
+                                     status__in=['todo', 'in_progress', 'review'])),
+        ]
 
     def __str__(self):
         return self.title
 
-    def save(self, *args, **kwargs):
+    def sync_completed_at(self):
+        """Set or clear completed_at to match the current status."""
         # Auto-set completed_at when status changes to 'done'
         if self.status == 'done' and not self.completed_at:
             self.completed_at = timezone.now()
         elif self.status != 'done':
             self.completed_at = None
-        super().save(*args, **kwargs) 
\ No newline at end of file
+
+    def sync_is_overdue(self, now=None):
+        """Set is_overdue from the current status and due date."""
+        self.is_overdue = (
+            self.status in self.OPEN_STATUSES
+            and self.due_date is not None
+            and self.due_date <= (now or timezone.now())
+        )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_loaded_values()
+        instance._remember_stats_state()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self._remember_loaded_values(fields)
+        self._remember_stats_state()
+
+    def _remember_loaded_values(self, fields=None):
+        """Record the column values as they are in the database.
+
+        Only ``fields`` are recorded if given, e.g. after a partial save.
+        """
+        if fields is None or not hasattr(self, '_loaded_values'):
+            self._loaded_values = {}
+        names = None if fields is None else set(fields)
+        for field in self._meta.concrete_fields:
+            if field.attname in self.__dict__ and (
+                names is None or field.name in names or field.attname in names
+            ):
+                self._loaded_values[field.attname] = self.__dict__[field.attname]
+
+    def changed_fields(self):
+        """Return the names of the fields changed since the task was loaded or saved.
+
+        Deferred fields that were never set count as unchanged. Returns None
+        for a task that did not come from the database.
+        """
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        return [
+            field.name for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+            and (field.attname not in loaded or loaded[field.attname] != self.__dict__[field.attname])
+        ]
+
+    def _remember_stats_state(self):
+        """Record the values the per-user counters were last computed from."""
+        self._stats_state = (self.user_id, self.stats_contribution())
+
+    def stats_contribution(self):
+        """Return how this task counts towards its owner's UserTaskStats."""
+        return UserTaskStats.contribution(self.status, self.due_date, self.is_overdue)
+
+    def save(self, *args, **kwargs):
+        """Save the task, writing only the columns that changed.
+
+        A loaded task is saved with ``update_fields`` set to its changed
+        fields plus ``updated_at``, and not written at all when nothing
+        changed. Explicit ``update_fields`` are extended with the derived
+        ``completed_at`` and ``is_overdue`` when those change as well.
+        """
+        self.sync_completed_at()
+        self.sync_is_overdue()
+        old_state = None if self._state.adding else getattr(self, '_stats_state', None)
+        changed = None if self._state.adding or kwargs.get('force_insert') else self.changed_fields()
+        if changed is not None:
+            if 'id' in changed:
+                changed = None
+            elif kwargs.get('update_fields') is not None:
+                derived = [name for name in ('completed_at', 'is_overdue') if name in changed]
+                kwargs['update_fields'] = {*kwargs['update_fields'], *derived, 'updated_at'}
+            elif not changed:
+                return
+            else:
+                kwargs['update_fields'] = [*changed, 'updated_at']
+        if self._state.adding and self.pk is None and is_sharded():
+            self.pk = allocate_ids('tasks', 1)[0]
+            kwargs['force_insert'] = True
+        # The counters and outbox are in the task's shard
+        using = kwargs.get('using') or router.db_for_write(Task, instance=self)
+        with use_db(using), transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+            delta = self.stats_contribution()
+            if old_state is not None:
+                old_user_id, old_counts = old_state
+                if old_user_id == self.user_id:
+                    delta.subtract(old_counts)
+                else:
+                    UserTaskStats.apply_delta(old_user_id, UserTaskStats.negate(old_counts))
+            UserTaskStats.apply_delta(self.user_id, delta)
+            OutboxEvent.record(OutboxEvent.TASKS, [self.pk])
+        self._remember_loaded_values(kwargs.get('update_fields'))
+        self._remember_stats_state()
+
+    def transition(self, status):
+        """Move the task to ``status`` with a single conditional UPDATE.
+
+        Nothing is written when the task already has that status. The
+        UPDATE only matches while the row still has the owner, status and
+        due date this instance holds, which are what the counters depend
+        on; if another request changed them first the task is reloaded and
+        the transition tried again. Returns whether the status changed, and
+        raises ``Task.DoesNotExist`` if the task was deleted meanwhile.
+        """
+        while self.status != status:
+            match = {'user_id': self.user_id, 'status': self.status,
+                     'due_date': self.due_date, 'is_overdue': self.is_overdue}
+            old_state = getattr(self, '_stats_state', None) or (self.user_id, self.stats_contribution())
+            self.status = status
+            self.sync_completed_at()
+            self.sync_is_overdue()
+            self.updated_at = timezone.now()
+            using = router.db_for_write(Task, instance=self)
+            with use_db(using), transaction.atomic(using=using):
+                updated = Task.objects.filter(pk=self.pk, **match).update(
+                    status=self.status,
+                    completed_at=self.completed_at,
+                    is_overdue=self.is_overdue,
+                    updated_at=self.updated_at,
+                )
+                if updated:
+                    delta = self.stats_contribution()
+                    delta.subtract(old_state[1])
+                    UserTaskStats.apply_delta(self.user_id, delta)
+                    OutboxEvent.record(OutboxEvent.TASKS, [self.pk])
+                    invalidate_user(self.user_id)
+            if updated:
+                self._remember_loaded_values(['status', 'completed_at', 'is_overdue', 'updated_at'])
+                self._remember_stats_state()
+                return True
+            self.refresh_from_db()
+        return False
+
+    def delete(self, *args, **kwargs):
+        user_id, counts = getattr(self, '_stats_state', None) or (self.user_id, self.stats_contribution())
+        using = kwargs.get('using') or router.db_for_write(Task, instance=self)
+        with use_db(using), transaction.atomic(using=using):
+            OutboxEvent.record(OutboxEvent.TASKS, [self.pk], OutboxEvent.DELETE)
+            TaskTombstone.record([(self.pk, user_id)])
+            result = super().delete(*args, **kwargs)
+            UserTaskStats.apply_delta(user_id, UserTaskStats.negate(counts))
+        return result
+
+class ArchivedTask(models.Model):
+    """A done or cancelled task moved out of the tasks table by ``archive_tasks``.
+
+    Rows keep the id and timestamps they had as a Task.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_tasks')
+    priority = models.CharField(max_length=10, choices=Task.PRIORITY_CHOICES)
+    status = models.CharField(max_length=15, choices=Task.STATUS_CHOICES)
+    due_date = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'tasks_archive'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='tasks_archive_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return self.title
+
+class TaskHistory(models.Model):
+    """Read-only view over live and archived tasks (``tasks_all``).
+
+    Backs ``?include_archived=true`` on the task listings. The view is
+    created in a migration and must be recreated whenever the columns of
+    ``tasks`` or ``tasks_archive`` change.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True)
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, related_name='+')
+    priority = models.CharField(max_length=10, choices=Task.PRIORITY_CHOICES)
+    status = models.CharField(max_length=15, choices=Task.STATUS_CHOICES)
+    due_date = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    is_overdue = models.BooleanField()
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived = models.BooleanField()
+
+    class Meta:
+        managed = False
+        db_table = 'tasks_all'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return self.title
+
+class UserTaskStats(models.Model):
+    """Denormalized per-user task counters.
+
+    Kept exact inside the same transaction as every task insert, status or
+    due date change and delete, so profile statistics are a primary-key
+    read. Archived tasks still count; archiving leaves the counters alone.
+    ``rebuild_task_stats`` recomputes them from the tasks tables.
+    """
+    CLOSED_STATUSES = ('done', 'cancelled')
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='task_stats')
+    total = models.IntegerField(default=0)
+    todo = models.IntegerField(default=0)
+    in_progress = models.IntegerField(default=0)
+    review = models.IntegerField(default=0)
+    done = models.IntegerField(default=0)
+    cancelled = models.IntegerField(default=0)
+    # Open tasks with a due date, i.e. the tasks that can become overdue
+    overdue_candidates = models.IntegerField(default=0)
+    # Open tasks whose due date has passed
+    overdue = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'user_task_stats'
+
+    def __str__(self):
+        return f'Task stats for user {self.user_id}'
+
+    @property
+    def open(self):
+        return self.todo + self.in_progress + self.review
+
+    @classmethod
+    def contribution(cls, status, due_date, is_overdue=False):
+        """Return the counter increments of a single task."""
+        counts = Counter(total=1)
+        counts[status] += 1
+        if due_date is not None and status not in cls.CLOSED_STATUSES:
+            counts['overdue_candidates'] += 1
+            if is_overdue:
+                counts['overdue'] += 1
+        return counts
+
+    @staticmethod
+    def negate(counts):
+        """Return a Counter with every count negated (unary minus drops them)."""
+        return Counter({name: -n for name, n in counts.items()})
+
+    @classmethod
+    def apply_delta(cls, user_id, delta):
+        """Add ``delta`` (a Counter of field increments) to a user's counters."""
+        changes = {name: F(name) + n for name, n in delta.items() if n}
+        if not changes:
+            return
+        if not cls.objects.filter(user_id=user_id).update(**changes):
+            # No row yet: count from the tasks table, which already includes
+            # the write this delta describes
+            cls.rebuild(user_ids=[user_id])
+
+    @classmethod
+    def counts_by_user(cls, tasks):
+        """Aggregate the counters of a task queryset per user in one query."""
+        totals = {}
+        rows = tasks.order_by().values('user_id', 'status').annotate(
+            n=Count('id'),
+            with_due_date=Count('id', filter=Q(due_date__isnull=False)),
+            overdue=Count('id', filter=Q(due_date__isnull=False, is_overdue=True)),
+        )
+        for row in rows:
+            counts = totals.setdefault(row['user_id'], Counter())
+            counts['total'] += row['n']
+            counts[row['status']] += row['n']
+            if row['status'] not in cls.CLOSED_STATUSES:
+                counts['overdue_candidates'] += row['with_due_date']
+                counts['overdue'] += row['overdue']
+        return totals
+
+    @classmethod
+    def for_user(cls, user_id):
+        """Return a user's counters with one primary-key read, rebuilding a missing row."""
+        stats = cls.objects.filter(pk=user_id).first()
+        if stats is None:
+            cls.rebuild(user_ids=[user_id])
+            stats = cls.objects.get(pk=user_id)
+        return stats
+
+    @classmethod
+    def rebuild(cls, user_ids=None):
+        """Recompute counters from live and archived tasks. Returns the number of users rebuilt.
+
+        Only the users whose tasks are in the active task database are rebuilt.
+        """
+        db = current_db()
+        users = User.objects.all()
+        tasks = TaskHistory.objects.all()
+        if user_ids is not None:
+            users = users.filter(pk__in=user_ids)
+            tasks = tasks.filter(user_id__in=user_ids)
+        counts = cls.counts_by_user(tasks)
+        fields = ['total', 'todo', 'in_progress', 'review', 'done', 'cancelled', 'overdue_candidates', 'overdue']
+        rebuilt = 0
+        with transaction.atomic(using=db):
+            for user_id in users.values_list('pk', flat=True).iterator():
+                if shard_for_user(user_id) != db:
+                    continue
+                user_counts = counts.get(user_id, Counter())
+                cls.objects.update_or_create(
+                    user_id=user_id,
+                    defaults={name: user_counts[name] for name in fields},
+                )
+                rebuilt += 1
+        return rebuilt
+
+class Job(models.Model):
+    """A unit of background work in the database-backed job queue.
+
+    See ``tasks.jobs`` for enqueueing and running jobs.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('failed', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    # When the job may next run, and until when a worker that claimed it owns it
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'jobs'
+        ordering = ['run_at', 'id']
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='jobs_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.status})'
+
+class OutboxEvent(models.Model):
+    """A change to a replicated row, written in the same transaction as the change.
+
+    Events only point at the row; the replicator in ``tasks.replication``
+    reads the row's current state when it applies them, so replaying an
+    event is always safe.
+    """
+    USERS = 'users'
+    TASKS = 'tasks'
+    TABLE_CHOICES = [
+        (USERS, 'Users'),
+        (TASKS, 'Tasks'),
+    ]
+
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    ARCHIVE = 'archive'
+    OPERATION_CHOICES = [
+        (UPSERT, 'Upsert'),
+        (DELETE, 'Delete'),
+        (ARCHIVE, 'Archive'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    table = models.CharField(max_length=10, choices=TABLE_CHOICES)
+    row_id = models.BigIntegerField()
+    operation = models.CharField(max_length=10, choices=OPERATION_CHOICES, default=UPSERT)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'outbox_events'
+        ordering = ['id']
+
+    def __str__(self):
+        return f'{self.operation} {self.table}#{self.row_id}'
+
+    @classmethod
+    def record(cls, table, row_ids, operation=UPSERT):
+        """Append one event per row id. Call inside the transaction making the change."""
+        now = timezone.now()
+        cls.objects.bulk_create(
+            [cls(table=table, row_id=row_id, operation=operation, created_at=now) for row_id in row_ids],
+            batch_size=500,
+        )
+
+class TaskTombstone(models.Model):
+    """A task deleted or archived, reported to clients by the changes feed.
+
+    See ``tasks.sync``. Tombstones are pruned after
+    ``TASK_SYNC_TOMBSTONE_DAYS``.
+    """
+    id = models.BigAutoField(primary_key=True)
+    task_id = models.BigIntegerField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'task_tombstones'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['user', 'id'], name='tombstones_user_id_idx'),
+        ]
+
+    def __str__(self):
+        return f'Task {self.task_id} deleted'
+
+    @classmethod
+    def record(cls, tasks):
+        """Add a tombstone per ``(task_id, user_id)`` pair. Call inside the deleting transaction."""
+        now = timezone.now()
+        cls.objects.bulk_create(
+            [cls(task_id=task_id, user_id=user_id, deleted_at=now) for task_id, user_id in tasks],
+            batch_size=500,
+        )
+
+class IdSequence(models.Model):
+    """The last id handed out of an id sequence shared by every shard.
+
+    See ``tasks.sharding.allocate_ids``. Only used with ``TASK_SHARDS`` above 1.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    last_id = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'id_sequences'
+
+    def __str__(self):
+        return f'{self.name} at {self.last_id}'
+
+class ReplicationCheckpoint(models.Model):
+    """The last outbox event applied to a replication target."""
+    target = models.CharField(max_length=50, primary_key=True)
+    last_event_id = models.BigIntegerField(default=0)
+    applied_events = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'replication_checkpoints'
+
+    def __str__(self):
+        return f'{self.target} at event {self.last_event_id}'
@@ -0,0 +1,150 @@
+"""
+Overdue tracking for tasks
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+
+``Task.is_overdue`` is set when a task is written and, as time passes, by
+the scheduler in this module, so overdue counts and listings are reads of
+``UserTaskStats.overdue`` and the ``tasks_user_overdue_idx`` index instead of
+date comparisons over every task.
+
+``OverdueScheduler`` keeps a min-heap of the due dates of open tasks that
+fall within the next ``OVERDUE_SCHEDULER_HORIZON`` seconds, loaded from the
+``tasks_pending_due_idx`` partial index, and sleeps until the earliest one.
+Heap entries are only hints: ``mark_overdue`` re-checks every task in the
+database, so a task closed or rescheduled since the heap was loaded is left
+alone. The heap is reloaded every ``OVERDUE_SCHEDULER_REFRESH_INTERVAL``
+seconds, which bounds how late a due date added in the meantime is noticed;
+each reload also sweeps for anything already past due.
+
+Every task that becomes overdue updates its owner's counters, records an
+outbox event for the replicas and enqueues a ``notify_task_overdue`` job.
+With shards (``tasks.sharding``) the heap holds the tasks of every task
+database, each entry tagged with its database.
+"""
+
+import heapq
+import logging
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from .cache import invalidate_user
+from .jobs import enqueue_many
+from .models import OutboxEvent, Task, UserTaskStats
+from .sharding import atomic, task_databases, use_db
+
+logger = logging.getLogger(__name__)
+
+
+def pending_tasks():
+    """Open tasks with a due date that are not yet flagged overdue."""
+    return Task.objects.filter(
+        is_overdue=False,
+        due_date__isnull=False,
+        status__in=Task.OPEN_STATUSES,
+    )
+
+
+def mark_overdue(now=None, task_ids=None, batch_size=None):
+    """Flag open tasks due by ``now`` as overdue, one batch at a time.
+
+    Only tasks in ``task_ids`` are considered if it is given. Works on the
+    active task database. Returns the ids of the tasks flagged.
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or settings.OVERDUE_BATCH_SIZE
+    flagged = []
+    while True:
+        with atomic():
+            due = pending_tasks().filter(due_date__lte=now)
+            if task_ids is not None:
+                due = due.filter(id__in=task_ids)
+            rows = list(due.order_by('due_date', 'id').values_list('id', 'user_id')[:batch_size])
+            if not rows:
+                break
+            ids = [task_id for task_id, _ in rows]
+            # updated_at moves so the changes feed reports the new flag
+            Task.objects.filter(id__in=ids).update(is_overdue=True, updated_at=timezone.now())
+            per_user = Counter(user_id for _, user_id in rows)
+            for user_id, count in per_user.items():
+                UserTaskStats.apply_delta(user_id, Counter(overdue=count))
+                invalidate_user(user_id)
+            OutboxEvent.record(OutboxEvent.TASKS, ids)
+            enqueue_many('notify_task_overdue', [{'task_id': task_id} for task_id in ids])
+        flagged += ids
+        if len(rows) < batch_size:
+            break
+    if flagged:
+        logger.info('Flagged %d task(s) overdue', len(flagged))
+    return flagged
+
+
+class OverdueScheduler:
+    """Flags tasks overdue at their due date from an in-memory heap."""
+
+    def __init__(self, horizon=None, max_pending=None, refresh_interval=None):
+        self.horizon = timedelta(seconds=horizon or settings.OVERDUE_SCHEDULER_HORIZON)
+        self.max_pending = max_pending or settings.OVERDUE_SCHEDULER_MAX_PENDING
+        self.refresh_interval = timedelta(
+            seconds=refresh_interval or settings.OVERDUE_SCHEDULER_REFRESH_INTERVAL
+        )
+        self.heap = []
+        self.refresh_at = None
+
+    def refresh(self, now):
+        """Sweep for tasks already due and reload the heap of upcoming ones."""
+        flagged = 0
+        rows = []
+        for db in task_databases():
+            with use_db(db):
+                flagged += len(mark_overdue(now))
+                rows += [
+                    (due_date, task_id, db) for due_date, task_id in
+                    pending_tasks().filter(due_date__lte=now + self.horizon)
+                    .order_by('due_date', 'id').values_list('due_date', 'id')[:self.max_pending]
+                ]
+        rows = sorted(rows)[:self.max_pending]
+        self.heap = rows
+        heapq.heapify(self.heap)
+        self.refresh_at = now + self.refresh_interval
+        if len(rows) == self.max_pending:
+            # The heap ends before the horizon; reload once it runs out
+            self.refresh_at = min(self.refresh_at, rows[-1][0])
+        return flagged
+
+    def run_pending(self, now=None):
+        """Flag every task due by ``now``. Returns the number flagged."""
+        now = now or timezone.now()
+        if self.refresh_at is None or now >= self.refresh_at:
+            return self.refresh(now)
+        due = {}
+        while self.heap and self.heap[0][0] <= now:
+            _, task_id, db = heapq.heappop(self.heap)
+            due.setdefault(db, []).append(task_id)
+        flagged = 0
+        for db, task_ids in due.items():
+            with use_db(db):
+                flagged += len(mark_overdue(now, task_ids=task_ids))
+        return flagged
+
+    def seconds_until_next(self, now=None):
+        """Seconds until the next due date or heap reload."""
+        now = now or timezone.now()
+        wake_at = self.refresh_at or now
+        if self.heap:
+            wake_at = min(wake_at, self.heap[0][0])
+        return max((wake_at - now).total_seconds(), 0)
+
+    def run(self, should_stop=lambda: False, max_sleep=1):
+        """Run until ``should_stop()`` returns True.
+
+        Sleeps in steps of at most ``max_sleep`` seconds so a stop request
+        is noticed quickly.
+        """
+        while not should_stop():
+            self.run_pending()
+            time.sleep(min(self.seconds_until_next(), max_sleep))
@@ -0,0 +1,140 @@
+"""
+Pagination classes for the Task Management API
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+
+This module contains the cursor pagination used by all task listings.
+"""
+
+import base64
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def encode_position(created_at, pk, reverse=False):
+    """An opaque cursor for the position just past the task (``created_at``, ``pk``)."""
+    position = f'{created_at.isoformat()}|{pk}' + ('|r' if reverse else '')
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+
+def decode_position(cursor):
+    """The (created_at, id, reverse) of a cursor; raise ValueError if it is malformed."""
+    created_at, pk, *flags = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+    created_at = datetime.fromisoformat(created_at)
+    if flags not in ([], ['r']) or created_at.tzinfo is None:
+        raise ValueError(cursor)
+    return created_at, int(pk), bool(flags)
+
+
+def seek(queryset, created_at, pk, reverse=False):
+    """The tasks after (``created_at``, ``pk``), newest first, or before it, oldest first.
+
+    Both columns take part in the comparison, so tasks sharing a
+    ``created_at`` are split between pages by id instead of being skipped
+    or repeated.
+    """
+    if reverse:
+        after = Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk)
+        return queryset.filter(after).order_by('created_at', 'id')
+    after = Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+    return queryset.filter(after).order_by('-created_at', '-id')
+
+
+class TaskCursorPagination(BasePagination):
+    """Cursor pagination over tasks, newest first.
+
+    Rows are ordered on (``created_at``, ``id``) so the order is total, and
+    the cursor carries both values of the last row seen. Pages are fetched
+    with a ``WHERE created_at < c OR (created_at = c AND id < i)`` seek on
+    the ``(user, created_at, id)`` index instead of an OFFSET, with no
+    ``COUNT(*)``, so page cost does not grow with the number of tasks and
+    any number of tasks may share a timestamp. Clients may ask for smaller
+    or larger pages with ``page_size``, capped at ``TASK_MAX_PAGE_SIZE``.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE', 10)
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'TASK_MAX_PAGE_SIZE', 100)
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self._paginate(list(self._page_query(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request):
+        """``paginate_queryset`` for async views, fetching the page with the async ORM."""
+        return self._paginate([obj async for obj in self._page_query(queryset, request)])
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(request.query_params[self.page_size_query_param],
+                                 strict=True, cutoff=self.max_page_size)
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def _page_query(self, queryset, request):
+        """The sliced query for the requested page, with one extra row to detect more."""
+        self.base_url = request.build_absolute_uri()
+        self.page_size_value = self.get_page_size(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            try:
+                self.position = decode_position(cursor)
+            except ValueError:
+                raise NotFound(self.invalid_cursor_message)
+            queryset = seek(queryset, *self.position)
+        else:
+            self.position = None
+            queryset = queryset.order_by(*self.ordering)
+        return queryset[:self.page_size_value + 1]
+
+    def _paginate(self, rows):
+        reverse = self.position is not None and self.position[2]
+        has_more = len(rows) > self.page_size_value
+        rows = rows[:self.page_size_value]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.position is not None
+        self.page = rows
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        last = self.page[-1]
+        return replace_query_param(self.base_url, self.cursor_query_param,
+                                   encode_position(last.created_at, last.pk))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        first = self.page[0]
+        return replace_query_param(self.base_url, self.cursor_query_param,
+                                   encode_position(first.created_at, first.pk, reverse=True))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,351 @@
+"""
+Read replicas of the task databases
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+
+With ``DB_READ_REPLICAS`` above 0 every database (``default`` and each
+shard) has that many read-only copies, e.g. ``default_replica_0`` in
+``db_replica_0.sqlite3``. ``sync_read_replicas`` refreshes them every
+``READ_REPLICA_SYNC_INTERVAL`` seconds and stamps each copy with the time
+its data was current, in its ``replica_status`` table. A copy rereads the
+whole primary with SQLite's online backup API, so it is only taken when the
+primary was written since the last one; otherwise the copies are just
+stamped again.
+
+``ReadReplicaRouter`` comes before the other routers and asks them for the
+primary database of every query. Reads go to a replica of that primary
+when:
+
+- the request is a GET, HEAD or OPTIONS request under ``READ_REPLICA_PATHS``
+  (``ReadReplicaMiddleware``);
+- nothing in the request has written yet and no transaction is open on the
+  primary;
+- the user has not written in the last ``READ_REPLICA_MAX_LAG`` seconds,
+  checked by ``CachedJWTAuthentication``;
+- the replica is at most ``READ_REPLICA_MAX_LAG`` seconds old.
+
+Otherwise they go to the primary. A request sticks to the replica it first
+read for each primary, so its queries see one snapshot. Since a write keeps
+its user on the primary for as long as a replica may be older than it,
+users always read their own writes, and the response cache never stores a
+response read from before a write.
+
+Management commands and the background workers do not go through the
+middleware and always use the primaries.
+"""
+
+import contextvars
+import functools
+import math
+import os
+import random
+import shutil
+import sqlite3
+import time
+from contextlib import contextmanager
+from urllib.parse import unquote, urlsplit
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import setting_changed
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, router
+from django.dispatch import receiver
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Seconds a process trusts the snapshot time it last read from a replica
+STATUS_TTL = 1
+
+# The replica chosen for each primary in this request, or None while the
+# request must read the primaries
+_chosen = contextvars.ContextVar('read_replicas', default=None)
+
+_snapshot_times = {}
+
+# Per primary file, the connection it is watched on for writes and the
+# data_version it had when last copied
+_watchers = {}
+_copied_versions = {}
+
+
+@functools.cache
+def _replicas():
+    replicas = {}
+    for alias, config in settings.DATABASES.items():
+        if 'READ_REPLICA_OF' in config:
+            replicas.setdefault(config['READ_REPLICA_OF'], []).append(alias)
+    return replicas
+
+
+@receiver(setting_changed)
+def _reset_replicas(setting, **kwargs):
+    if setting == 'DATABASES':
+        _replicas.cache_clear()
+
+
+def replica_aliases(primary=None):
+    """Return the replicas of ``primary``, or of every database."""
+    if primary is not None:
+        return list(_replicas().get(primary, []))
+    return [alias for aliases in _replicas().values() for alias in aliases]
+
+
+def primary_of(alias):
+    """Return the database ``alias`` is a replica of, or ``alias`` itself."""
+    return settings.DATABASES.get(alias, {}).get('READ_REPLICA_OF', alias)
+
+
+@contextmanager
+def read_from_replicas(enabled=True):
+    """Let the queries inside the block read from fresh replicas."""
+    token = _chosen.set({} if enabled else None)
+    try:
+        yield
+    finally:
+        _chosen.reset(token)
+
+
+def use_primary():
+    """Send the rest of this request's reads to the primaries."""
+    _chosen.set(None)
+
+
+def _sticky_key(user_id):
+    return f'tasks:user:{user_id}:wrote'
+
+
+def stick_to_primary(user_id):
+    """Keep ``user_id``'s requests on the primaries until every replica has its last write.
+
+    Called once the write has committed.
+    """
+    if replica_aliases():
+        cache.set(_sticky_key(user_id), True, timeout=math.ceil(settings.READ_REPLICA_MAX_LAG))
+
+
+def check_recent_writer(user_id):
+    """Call ``use_primary()`` if ``user_id`` wrote too recently for the replicas."""
+    if _chosen.get() is not None and cache.get(_sticky_key(user_id)):
+        use_primary()
+
+
+async def acheck_recent_writer(user_id):
+    if _chosen.get() is not None and await cache.aget(_sticky_key(user_id)):
+        use_primary()
+
+
+def replica_lag(alias):
+    """Return how many seconds replica ``alias`` is behind, or None if it cannot be read.
+
+    The snapshot time is read from the replica at most once per
+    ``STATUS_TTL`` seconds in each process.
+    """
+    now = time.monotonic()
+    checked_at, snapshot_at = _snapshot_times.get(alias, (None, None))
+    if checked_at is None or now - checked_at >= STATUS_TTL:
+        snapshot_at = snapshot_time(alias)
+        _snapshot_times[alias] = (now, snapshot_at)
+    if snapshot_at is None:
+        return None
+    return max(0.0, time.time() - snapshot_at)
+
+
+def snapshot_time(alias):
+    """Return when replica ``alias`` was copied, as a Unix time, or None."""
+    connection = connections[alias]
+    if connection.settings_dict['NAME'] == connections[primary_of(alias)].settings_dict['NAME']:
+        # A test mirror is the primary itself
+        return time.time()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT snapshot_at FROM replica_status')
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    return row[0] if row else None
+
+
+def _read_db(primary):
+    chosen = _chosen.get()
+    if chosen is None or connections[primary].in_atomic_block:
+        return primary
+    if primary not in chosen:
+        fresh = [
+            alias for alias in replica_aliases(primary)
+            if (lag := replica_lag(alias)) is not None and lag <= settings.READ_REPLICA_MAX_LAG
+        ]
+        chosen[primary] = random.choice(fresh) if fresh else primary
+    return chosen[primary]
+
+
+class ReadReplicaMiddleware:
+    """Let safe requests under ``READ_REPLICA_PATHS`` read from the replicas."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica_aliases():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with read_from_replicas(self._reads_replicas(request)):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with read_from_replicas(self._reads_replicas(request)):
+            return await self.get_response(request)
+
+    def _reads_replicas(self, request):
+        return request.method in SAFE_METHODS and request.path_info.startswith(tuple(settings.READ_REPLICA_PATHS))
+
+
+class ReadReplicaRouter:
+    """Routes reads to the replicas. See the module docstring.
+
+    Must be the first router: it takes the primary from the routers after
+    it, or from the instance the query is about.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_db(self._primary('db_for_read', model, hints))
+
+    def db_for_write(self, model, **hints):
+        # Later reads in the request must see the write
+        use_primary()
+        return self._primary('db_for_write', model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # E.g. a user read from a replica and a task about to be saved
+        if primary_of(obj1._state.db) == primary_of(obj2._state.db):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        if primary_of(db) != db:
+            return False
+        return None
+
+    def _primary(self, action, model, hints):
+        for other in router.routers:
+            if other is self or not hasattr(other, action):
+                continue
+            alias = getattr(other, action)(model, **hints)
+            if alias:
+                return primary_of(alias)
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return primary_of(instance._state.db)
+        return DEFAULT_DB_ALIAS
+
+
+def replica_path(alias):
+    """Return the file of replica ``alias``."""
+    return unquote(urlsplit(settings.DATABASES[alias]['NAME']).path)
+
+
+def sync_read_replicas():
+    """Refresh the replicas of every primary. Returns the snapshot time of each replica."""
+    synced = {}
+    for primary, aliases in _replicas().items():
+        snapshot_at = refresh(
+            connections[primary].settings_dict['NAME'],
+            [replica_path(alias) for alias in aliases],
+        )
+        synced.update(dict.fromkeys(aliases, snapshot_at))
+    return synced
+
+
+def refresh(source, targets):
+    """Bring the copies of ``source`` in ``targets`` up to date. Returns their snapshot time.
+
+    ``source`` is copied when it was written since the last copy or a copy
+    is missing; otherwise the copies already hold its data, and only their
+    snapshot time is moved forward.
+    """
+    source = str(source)
+    # Taken first: the data is current at least as of the version read next
+    snapshot_at = time.time()
+    if source not in _watchers:
+        _watchers[source] = sqlite3.connect(source, uri=True, check_same_thread=False)
+    # Changes whenever another connection commits to the database
+    version = _watchers[source].execute('PRAGMA data_version').fetchone()[0]
+    if _copied_versions.get(source) == version and all(os.path.exists(target) for target in targets):
+        restamp(targets, snapshot_at)
+        return snapshot_at
+    _copied_versions.pop(source, None)
+    snapshot_at = snapshot(source, targets)
+    _copied_versions[source] = version
+    return snapshot_at
+
+
+def restamp(targets, snapshot_at):
+    """Set the snapshot time of the copies in ``targets``, in place."""
+    for target in targets:
+        copy = sqlite3.connect(str(target), timeout=settings.READ_REPLICA_MAX_LAG)
+        try:
+            with copy:
+                copy.execute('UPDATE replica_status SET snapshot_at = ?', [snapshot_at])
+        finally:
+            copy.close()
+
+
+def snapshot(source, targets):
+    """Copy the SQLite database ``source`` to each file in ``targets``.
+
+    Each copy is written to a temporary file and renamed over its target,
+    so readers open either the old copy or the new one. Connections already
+    open keep reading the old copy until they close at the end of their
+    request. Returns the time the copy was taken, which is at most as late
+    as the data it holds.
+    """
+    first, *others = [str(target) for target in targets]
+    temp = f'{first}.tmp'
+    snapshot_at = time.time()
+    source_db = sqlite3.connect(str(source), uri=True, timeout=settings.READ_REPLICA_MAX_LAG)
+    copy = sqlite3.connect(temp)
+    try:
+        # In one step: copying in batches starts over whenever the source is
+        # written to, and may never finish under steady writes
+        source_db.backup(copy)
+        # Read-only connections cannot open a WAL database without its -shm file
+        copy.execute('PRAGMA journal_mode=DELETE')
+        copy.execute('CREATE TABLE IF NOT EXISTS replica_status (snapshot_at REAL NOT NULL)')
+        copy.execute('DELETE FROM replica_status')
+        copy.execute('INSERT INTO replica_status (snapshot_at) VALUES (?)', [snapshot_at])
+        copy.commit()
+    except BaseException:
+        copy.close()
+        os.remove(temp)
+        raise
+    finally:
+        source_db.close()
+    copy.close()
+    for target in others:
+        shutil.copyfile(temp, f'{target}.tmp')
+        os.replace(f'{target}.tmp', target)
+    os.replace(temp, first)
+    return snapshot_at
+
+
+def status():
+    """Return the primary, snapshot time and lag in seconds of every replica."""
+    now = time.time()
+    rows = []
+    for alias in replica_aliases():
+        snapshot_at = snapshot_time(alias)
+        rows.append({
+            'replica': alias,
+            'primary': primary_of(alias),
+            'snapshot_at': snapshot_at,
+            'lag': None if snapshot_at is None else max(0.0, now - snapshot_at),
+        })
+    return rows
@@ -0,0 +1,283 @@
+"""
+Replication of users and tasks to the read-side services
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+
+Every write to a ``User`` or ``Task`` appends an ``OutboxEvent`` in the same
+transaction. ``replicate_changes`` reads the outbox in id order and applies
+it in batches to the SQLite stores of the Flask and FastAPI services
+(``settings.REPLICATION_TARGETS``), one transaction per batch, then moves
+that target's ``ReplicationCheckpoint`` forward.
+
+Events only name a row, and the row's current state is read when the batch
+is applied, so several changes to one row in a batch become one write, and
+replaying a batch after a crash between the replica commit and the
+checkpoint update writes the same rows again. Ids of the outbox are assigned
+in commit order because SQLite has a single writer.
+
+Django owns users and tasks: a replica user sharing a username or email
+with a replicated user but not its id is replaced. Columns the replicas own,
+such as a Flask task's category, are left alone.
+
+Archived tasks (see ``tasks.archive``) are moved out of a replica's task
+table into a ``<table>_archive`` table that the replicator creates there.
+Replicated columns a replica's table predates, such as ``is_overdue``, are
+added to it before the first batch is applied.
+
+With shards (``tasks.sharding``) every task database has its own outbox and
+checkpoints, and each pass applies a batch from each database in turn, the
+users in ``default`` first. A target's lag is that of its furthest behind
+database.
+"""
+
+import logging
+import sqlite3
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Min
+from django.utils import timezone
+from .models import ArchivedTask, OutboxEvent, ReplicationCheckpoint, Task, User
+from .sharding import task_databases, use_db
+
+logger = logging.getLogger(__name__)
+
+# Columns shared by live and archived tasks
+TASK_COLUMNS = ['id', 'title', 'description', 'user_id', 'priority', 'status',
+                'due_date', 'completed_at', 'created_at', 'updated_at']
+LIVE_TASK_COLUMNS = TASK_COLUMNS + ['is_overdue']
+
+# Table name and replicated columns per outbox table for each replica layout
+SCHEMAS = {
+    'flask': {
+        OutboxEvent.USERS: ('user', ['id', 'username', 'email', 'created_at', 'updated_at']),
+        OutboxEvent.TASKS: ('task', LIVE_TASK_COLUMNS),
+    },
+    'fastapi': {
+        OutboxEvent.USERS: ('users', ['id', 'username', 'email', 'created_at']),
+        OutboxEvent.TASKS: ('tasks', LIVE_TASK_COLUMNS),
+    },
+}
+
+SOURCES = {
+    OutboxEvent.USERS: (User, ['id', 'username', 'email', 'created_at', 'updated_at']),
+    OutboxEvent.TASKS: (Task, LIVE_TASK_COLUMNS),
+}
+
+ARCHIVE_COLUMNS = TASK_COLUMNS + ['archived_at']
+
+USER_UNIQUE_COLUMNS = ('username', 'email')
+
+# Definitions of replicated columns added after the replicas were created
+ADDED_COLUMNS = {
+    'is_overdue': 'BOOLEAN NOT NULL DEFAULT 0',
+}
+
+
+def to_sqlite(value):
+    """Convert a value to the form SQLAlchemy stores in SQLite.
+
+    Datetimes become naive UTC strings, which is what the replicas' ``DateTime``
+    columns read back.
+    """
+    if hasattr(value, 'tzinfo'):
+        if value.tzinfo is not None:
+            value = value.astimezone(dt_timezone.utc).replace(tzinfo=None)
+        return value.strftime('%Y-%m-%d %H:%M:%S.%f')
+    return value
+
+
+def coalesce(events):
+    """Reduce events to the last operation per row.
+
+    Returns a dict of operation to a dict of outbox table to a set of ids.
+    """
+    latest = {}
+    for event in events:
+        latest[(event.table, event.row_id)] = event.operation
+    changes = {
+        operation: {table: set() for table in SOURCES}
+        for operation, _ in OutboxEvent.OPERATION_CHOICES
+    }
+    for (table, row_id), operation in latest.items():
+        changes[operation][table].add(row_id)
+    return changes
+
+
+def load_rows(table, ids, archived=False):
+    """Read the current state of rows from the application database."""
+    model, fields = SOURCES[table]
+    if archived:
+        model, fields = ArchivedTask, ARCHIVE_COLUMNS
+    rows = {}
+    id_list = list(ids)
+    for start in range(0, len(id_list), 500):
+        for row in model.objects.filter(pk__in=id_list[start:start + 500]).values(*fields):
+            rows[row['id']] = row
+    return rows
+
+
+def _upsert(conn, table, columns, rows):
+    names = ', '.join(f'"{name}"' for name in columns)
+    placeholders = ', '.join('?' for _ in columns)
+    updates = ', '.join(f'"{name}" = excluded."{name}"' for name in columns if name != 'id')
+    conn.executemany(
+        f'INSERT INTO "{table}" ({names}) VALUES ({placeholders}) '
+        f'ON CONFLICT (id) DO UPDATE SET {updates}',
+        [[to_sqlite(row[name]) for name in columns] for row in rows],
+    )
+
+
+def _delete(conn, table, ids):
+    conn.executemany(f'DELETE FROM "{table}" WHERE id = ?', [(row_id,) for row_id in ids])
+
+
+def prepare_replica(conn, schema):
+    """Bring a replica's tables up to the replicated columns.
+
+    Adds missing columns from ``ADDED_COLUMNS``, the index behind overdue
+    counts and the archive table for tasks.
+    """
+    for table, columns in schema.values():
+        existing = {row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')}
+        for name in columns:
+            if name not in existing and name in ADDED_COLUMNS:
+                conn.execute(f'ALTER TABLE "{table}" ADD COLUMN "{name}" {ADDED_COLUMNS[name]}')
+
+    task_table, _ = schema[OutboxEvent.TASKS]
+    conn.execute(f'CREATE INDEX IF NOT EXISTS "ix_{task_table}_user_overdue" ON "{task_table}" (user_id, is_overdue)')
+    columns = ', '.join(f'"{name}"' for name in ARCHIVE_COLUMNS if name != 'id')
+    conn.execute(f'CREATE TABLE IF NOT EXISTS "{task_table}_archive" (id INTEGER PRIMARY KEY, {columns})')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS "ix_{task_table}_archive_user_id" ON "{task_table}_archive" (user_id)')
+
+
+def apply_changes(conn, schema, rows, deletes, archived=()):
+    """Write one batch to a replica connection.
+
+    ``rows`` maps outbox table to the current rows to upsert, ``deletes``
+    maps it to the ids to remove and ``archived`` holds archived task rows
+    to move to the archive table. The caller owns the transaction.
+    """
+    user_table, user_columns = schema[OutboxEvent.USERS]
+    task_table, task_columns = schema[OutboxEvent.TASKS]
+    archive_table = f'{task_table}_archive'
+
+    users = rows[OutboxEvent.USERS]
+    if users:
+        # Free usernames and emails taken by rows Django does not know by that id
+        conn.executemany(
+            f'DELETE FROM "{user_table}" WHERE id != ? AND ({" OR ".join(f"{c} = ?" for c in USER_UNIQUE_COLUMNS)})',
+            [[row['id']] + [row[c] for c in USER_UNIQUE_COLUMNS] for row in users],
+        )
+        _upsert(conn, user_table, user_columns, users)
+    _upsert(conn, task_table, task_columns, rows[OutboxEvent.TASKS])
+    if archived:
+        _upsert(conn, archive_table, ARCHIVE_COLUMNS, archived)
+        _delete(conn, task_table, [row['id'] for row in archived])
+    _delete(conn, task_table, deletes[OutboxEvent.TASKS])
+    _delete(conn, archive_table, deletes[OutboxEvent.TASKS])
+    _delete(conn, user_table, deletes[OutboxEvent.USERS])
+
+
+def connect(config):
+    return sqlite3.connect(config['path'], timeout=config.get('timeout', 15))
+
+
+def replicate(name, config, batch_size=None):
+    """Apply the next batch of outbox events of each task database to one target.
+
+    Returns the number of events applied; 0 means the target is caught up.
+    """
+    batch_size = batch_size or settings.REPLICATION_BATCH_SIZE
+    applied = 0
+    for db in task_databases():
+        with use_db(db):
+            applied += _replicate_batch(name, config, batch_size)
+    return applied
+
+
+def _replicate_batch(name, config, batch_size):
+    """Apply the next batch of the active database's outbox to one target."""
+    checkpoint, _ = ReplicationCheckpoint.objects.get_or_create(target=name)
+    events = list(OutboxEvent.objects.filter(id__gt=checkpoint.last_event_id).order_by('id')[:batch_size])
+    if not events:
+        return 0
+
+    changes = coalesce(events)
+    deletes = changes[OutboxEvent.DELETE]
+    rows = {}
+    for table, ids in changes[OutboxEvent.UPSERT].items():
+        found = load_rows(table, ids)
+        # Rows deleted since the event was written are deleted in the replica
+        deletes[table] |= ids - found.keys()
+        rows[table] = list(found.values())
+    archived_ids = changes[OutboxEvent.ARCHIVE][OutboxEvent.TASKS]
+    archived = load_rows(OutboxEvent.TASKS, archived_ids, archived=True)
+    deletes[OutboxEvent.TASKS] |= archived_ids - archived.keys()
+
+    schema = SCHEMAS[config['schema']]
+    conn = connect(config)
+    try:
+        with conn:
+            prepare_replica(conn, schema)
+            apply_changes(conn, schema, rows, deletes, list(archived.values()))
+    finally:
+        conn.close()
+
+    checkpoint.last_event_id = events[-1].id
+    checkpoint.applied_events += len(events)
+    checkpoint.save()
+    return len(events)
+
+
+def status(targets=None):
+    """Return the checkpoint and lag of each target.
+
+    ``lag_seconds`` is the age of the oldest event the target has not applied.
+    With shards the counts are totals over the task databases,
+    ``last_event_id`` is that of ``default`` and ``checkpoints`` has the last
+    event id applied from each database.
+    """
+    targets = targets or settings.REPLICATION_TARGETS
+    now = timezone.now()
+    report = {
+        name: {'target': name, 'last_event_id': 0, 'checkpoints': {}, 'applied_events': 0,
+               'pending_events': 0, 'lag_seconds': 0.0, 'last_applied_at': None}
+        for name in targets
+    }
+    for db in task_databases():
+        checkpoints = {
+            cp.target: cp
+            for cp in ReplicationCheckpoint.objects.using(db).filter(target__in=list(targets))
+        }
+        for name, row in report.items():
+            checkpoint = checkpoints.get(name)
+            last_event_id = checkpoint.last_event_id if checkpoint else 0
+            pending = OutboxEvent.objects.using(db).filter(id__gt=last_event_id)
+            oldest = pending.aggregate(oldest=Min('created_at'))['oldest']
+            row['checkpoints'][db] = last_event_id
+            row['pending_events'] += pending.count()
+            if oldest:
+                row['lag_seconds'] = max(row['lag_seconds'], (now - oldest).total_seconds())
+            if checkpoint:
+                row['applied_events'] += checkpoint.applied_events
+                if row['last_applied_at'] is None or checkpoint.updated_at > row['last_applied_at']:
+                    row['last_applied_at'] = checkpoint.updated_at
+    for row in report.values():
+        row['last_event_id'] = row['checkpoints'][DEFAULT_DB_ALIAS]
+    return list(report.values())
+
+
+def prune(targets=None):
+    """Delete outbox events every target has applied. Returns the number deleted."""
+    targets = targets or settings.REPLICATION_TARGETS
+    deleted = 0
+    for db in task_databases():
+        checkpoints = ReplicationCheckpoint.objects.using(db).filter(target__in=list(targets))
+        if checkpoints.count() < len(targets):
+            continue
+        applied = checkpoints.aggregate(applied=Min('last_event_id'))['applied']
+        deleted += OutboxEvent.objects.using(db).filter(id__lte=applied).delete()[0]
+    return deleted
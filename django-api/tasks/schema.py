@@ -0,0 +1,300 @@
+"""
+GraphQL schema for the Task Management API
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+
+Served at ``/api/graphql/`` by ``tasks.async_views.graphql_view``. A query
+reads the signed-in user's tasks, their owners, the user's profile and task
+counters in the shape the client asks for. Nested objects are resolved
+through the request's data loaders (``tasks.loaders``), so the number of SQL
+statements a query runs depends on its shape, not on how many tasks it
+returns.
+
+Before a query runs, its cost is estimated as the number of objects it can
+return, with every list counted at its page size. Queries costing more than
+``GRAPHQL_MAX_COST``, or nesting objects deeper than ``GRAPHQL_MAX_DEPTH``,
+are rejected without touching the database.
+"""
+
+from inspect import isawaitable
+
+from django.conf import settings
+from django.db.models import Q
+from graphql import (
+    FieldNode, FragmentDefinitionNode, FragmentSpreadNode, GraphQLArgument, GraphQLBoolean,
+    GraphQLError, GraphQLField, GraphQLID, GraphQLInt, GraphQLList, GraphQLNonNull,
+    GraphQLObjectType, GraphQLScalarType, GraphQLSchema, GraphQLString, OperationType,
+    execute, get_named_type, get_nullable_type, is_list_type, parse, validate,
+)
+from graphql.utilities import get_operation_ast, value_from_ast
+from rest_framework import serializers
+from .loaders import Loaders
+from .models import Task, TaskHistory
+from .pagination import decode_position, encode_position, seek
+
+
+class Context:
+    """What the resolvers of one request share: the user and their loaders."""
+
+    def __init__(self, user):
+        self.user = user
+        self.loaders = Loaders(user)
+
+
+def _page_size(first):
+    if first is None:
+        first = settings.GRAPHQL_PAGE_SIZE
+    return max(0, min(first, settings.GRAPHQL_MAX_PAGE_SIZE))
+
+
+def _field(type_, attr, description=None):
+    """A field read from the ``attr`` attribute of its object."""
+    return GraphQLField(type_, description=description, resolve=lambda obj, info: getattr(obj, attr))
+
+
+def _decode_cursor(cursor):
+    try:
+        created_at, pk, reverse = decode_position(cursor)
+    except ValueError:
+        reverse = True
+    if reverse:
+        raise GraphQLError('Invalid cursor.')
+    return created_at, pk
+
+
+# Dates and times as the REST API formats them
+DateTime = GraphQLScalarType(
+    'DateTime',
+    description='An ISO 8601 date and time.',
+    serialize=serializers.DateTimeField().to_representation,
+)
+
+PriorityCountType = GraphQLObjectType('PriorityCount', {
+    'priority': GraphQLField(GraphQLNonNull(GraphQLString)),
+    'count': GraphQLField(GraphQLNonNull(GraphQLInt)),
+})
+
+TaskStatsType = GraphQLObjectType('TaskStats', {
+    'total': _field(GraphQLNonNull(GraphQLInt), 'total', 'All tasks, archived ones included.'),
+    'todo': _field(GraphQLNonNull(GraphQLInt), 'todo'),
+    'inProgress': _field(GraphQLNonNull(GraphQLInt), 'in_progress'),
+    'review': _field(GraphQLNonNull(GraphQLInt), 'review'),
+    'done': _field(GraphQLNonNull(GraphQLInt), 'done'),
+    'cancelled': _field(GraphQLNonNull(GraphQLInt), 'cancelled'),
+    'open': _field(GraphQLNonNull(GraphQLInt), 'open'),
+    'overdue': _field(GraphQLNonNull(GraphQLInt), 'overdue'),
+    'byPriority': GraphQLField(
+        GraphQLNonNull(GraphQLList(GraphQLNonNull(PriorityCountType))),
+        description='Tasks per priority, archived ones included.',
+        resolve=lambda stats, info: _priority_counts(stats, info),
+        # Counted at this many items by the cost limit
+        extensions={'size': len(Task.PRIORITY_CHOICES)},
+    ),
+})
+
+
+async def _priority_counts(stats, info):
+    counts = await info.context.loaders.priority_counts.load(stats.user_id)
+    return [{'priority': priority, 'count': count} for priority, count in counts.items()]
+
+
+FIRST = GraphQLArgument(GraphQLInt, description='Page size, capped at GRAPHQL_MAX_PAGE_SIZE.')
+
+UserType = GraphQLObjectType('User', lambda: {
+    'id': _field(GraphQLNonNull(GraphQLID), 'pk'),
+    'username': _field(GraphQLNonNull(GraphQLString), 'username'),
+    'email': _field(GraphQLNonNull(GraphQLString), 'email'),
+    'firstName': _field(GraphQLNonNull(GraphQLString), 'first_name'),
+    'lastName': _field(GraphQLNonNull(GraphQLString), 'last_name'),
+    'createdAt': _field(GraphQLNonNull(DateTime), 'created_at'),
+    'updatedAt': _field(GraphQLNonNull(DateTime), 'updated_at'),
+    'stats': GraphQLField(
+        GraphQLNonNull(TaskStatsType),
+        resolve=lambda user, info: info.context.loaders.stats.load(user.pk),
+    ),
+    'tasks': GraphQLField(
+        GraphQLNonNull(GraphQLList(GraphQLNonNull(TaskType))),
+        description="The user's newest tasks.",
+        args={'status': GraphQLArgument(GraphQLString), 'first': FIRST},
+        resolve=lambda user, info, status=None, first=None: info.context.loaders.user_tasks.load(
+            (user.pk, status, _page_size(first))),
+    ),
+})
+
+TaskType = GraphQLObjectType('Task', lambda: {
+    'id': _field(GraphQLNonNull(GraphQLID), 'pk'),
+    'title': _field(GraphQLNonNull(GraphQLString), 'title'),
+    'description': _field(GraphQLNonNull(GraphQLString), 'description'),
+    'priority': _field(GraphQLNonNull(GraphQLString), 'priority'),
+    'status': _field(GraphQLNonNull(GraphQLString), 'status'),
+    'dueDate': _field(DateTime, 'due_date'),
+    'completedAt': _field(DateTime, 'completed_at'),
+    'isOverdue': _field(GraphQLNonNull(GraphQLBoolean), 'is_overdue'),
+    'archived': GraphQLField(
+        GraphQLNonNull(GraphQLBoolean),
+        resolve=lambda task, info: getattr(task, 'archived', False),
+    ),
+    'createdAt': _field(GraphQLNonNull(DateTime), 'created_at'),
+    'updatedAt': _field(GraphQLNonNull(DateTime), 'updated_at'),
+    'cursor': GraphQLField(
+        GraphQLNonNull(GraphQLString),
+        description='Pass as ``after`` to list the tasks that follow this one.',
+        resolve=lambda task, info: encode_position(task.created_at, task.pk),
+    ),
+    'user': GraphQLField(
+        GraphQLNonNull(UserType),
+        resolve=lambda task, info: info.context.loaders.users.load(task.user_id),
+    ),
+})
+
+
+def _tasks(info, include_archived):
+    model = TaskHistory if include_archived else Task
+    return model.objects.filter(user=info.context.user)
+
+
+async def resolve_task(root, info, id, includeArchived=False):
+    try:
+        pk = int(id)
+    except ValueError:
+        return None
+    return await _tasks(info, includeArchived).filter(pk=pk).afirst()
+
+
+async def resolve_tasks(root, info, status=None, priority=None, search=None, overdue=None,
+                        includeArchived=False, first=None, after=None):
+    tasks = _tasks(info, includeArchived)
+    if status:
+        tasks = tasks.filter(status=status)
+    if priority:
+        tasks = tasks.filter(priority=priority)
+    if search:
+        tasks = tasks.filter(Q(title__icontains=search) | Q(description__icontains=search))
+    if overdue is not None:
+        tasks = tasks.filter(is_overdue=overdue)
+    if after:
+        # The same seek on (created_at, id) as the REST cursor pagination
+        tasks = seek(tasks, *_decode_cursor(after))
+    else:
+        tasks = tasks.order_by('-created_at', '-id')
+    tasks = tasks[:_page_size(first)]
+    return [task async for task in tasks]
+
+
+QueryType = GraphQLObjectType('Query', {
+    'me': GraphQLField(GraphQLNonNull(UserType), resolve=lambda root, info: info.context.user),
+    'task': GraphQLField(
+        TaskType,
+        args={
+            'id': GraphQLArgument(GraphQLNonNull(GraphQLID)),
+            'includeArchived': GraphQLArgument(GraphQLBoolean, default_value=False),
+        },
+        resolve=resolve_task,
+    ),
+    'tasks': GraphQLField(
+        GraphQLNonNull(GraphQLList(GraphQLNonNull(TaskType))),
+        description='Your tasks, newest first.',
+        args={
+            'status': GraphQLArgument(GraphQLString),
+            'priority': GraphQLArgument(GraphQLString),
+            'search': GraphQLArgument(GraphQLString, description='Text in the title or description.'),
+            'overdue': GraphQLArgument(GraphQLBoolean),
+            'includeArchived': GraphQLArgument(GraphQLBoolean, default_value=False),
+            'first': FIRST,
+            'after': GraphQLArgument(GraphQLString, description='The cursor of the last task seen.'),
+        },
+        resolve=resolve_tasks,
+    ),
+    'stats': GraphQLField(
+        GraphQLNonNull(TaskStatsType),
+        description='Your task counters.',
+        resolve=lambda root, info: info.context.loaders.stats.load(info.context.user.pk),
+    ),
+})
+
+schema = GraphQLSchema(query=QueryType)
+
+
+def query_cost(document, operation, variables=None):
+    """Return the estimated ``(cost, depth)`` of ``operation``.
+
+    Each object the query can return costs 1, with a list counted at its
+    page size, so ``tasks(first: 100) { user { stats } }`` costs 300. The
+    depth is the deepest nesting of objects.
+    """
+    if operation.operation != OperationType.QUERY:
+        return 0, 0
+    fragments = {
+        definition.name.value: definition
+        for definition in document.definitions if isinstance(definition, FragmentDefinitionNode)
+    }
+    return _selection_cost(schema.query_type, operation.selection_set, fragments, variables or {})
+
+
+def _selection_cost(parent_type, selection_set, fragments, variables):
+    cost = depth = 0
+    for selection in selection_set.selections:
+        if isinstance(selection, FieldNode):
+            # Scalars, __typename and introspection cost nothing
+            field = parent_type.fields.get(selection.name.value)
+            if field is None or selection.selection_set is None:
+                continue
+            child_cost, child_depth = _selection_cost(
+                get_named_type(field.type), selection.selection_set, fragments, variables)
+            cost += _list_size(field, selection, variables) * (1 + child_cost)
+            depth = max(depth, 1 + child_depth)
+            continue
+        if isinstance(selection, FragmentSpreadNode):
+            selection = fragments[selection.name.value]
+        # The schema has no interfaces or unions, so a fragment's type is its parent's
+        fragment_cost, fragment_depth = _selection_cost(parent_type, selection.selection_set, fragments, variables)
+        cost += fragment_cost
+        depth = max(depth, fragment_depth)
+    return cost, depth
+
+
+def _list_size(field, node, variables):
+    if not is_list_type(get_nullable_type(field.type)):
+        return 1
+    if 'size' in field.extensions:
+        return field.extensions['size']
+    first = None
+    for argument in node.arguments:
+        if argument.name.value == 'first':
+            value = value_from_ast(argument.value, field.args['first'].type, variables)
+            if isinstance(value, int):
+                first = value
+    return _page_size(first)
+
+
+async def execute_query(user, query, variables=None, operation_name=None):
+    """Run a GraphQL request for ``user``.
+
+    Returns the response body and its HTTP status: 400 for queries that do
+    not parse, fail validation or exceed the cost limits, 200 otherwise.
+    """
+    try:
+        document = parse(query)
+    except GraphQLError as error:
+        return {'errors': [error.formatted]}, 400
+    # The standard rules first, which also reject fragment cycles
+    errors = validate(schema, document)
+    if not errors:
+        operation = get_operation_ast(document, operation_name)
+        if operation is not None:
+            cost, depth = query_cost(document, operation, variables)
+            if depth > settings.GRAPHQL_MAX_DEPTH:
+                errors.append(GraphQLError(
+                    f'Query depth {depth} exceeds the limit of {settings.GRAPHQL_MAX_DEPTH}.', operation))
+            if cost > settings.GRAPHQL_MAX_COST:
+                errors.append(GraphQLError(
+                    f'Query cost {cost} exceeds the limit of {settings.GRAPHQL_MAX_COST}.', operation))
+    if errors:
+        return {'errors': [error.formatted for error in errors]}, 400
+
+    result = execute(schema, document, context_value=Context(user),
+                     variable_values=variables, operation_name=operation_name)
+    if isawaitable(result):
+        result = await result
+    return result.formatted, 200 if result.data is not None else 400
@@ -1,5 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
+from django.db import transaction
+from django.db.models import QuerySet
+from .jobs import enqueue
 from .models import User, Task
 
 class UserSerializer(serializers.ModelSerializer):
@@ -9,6 +12,26 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+class UserTaskStatsSerializer(serializers.BaseSerializer):
+    """Serializer for the profile statistics of a UserTaskStats row."""
+
+    def to_representation(self, stats):
+        return {
+            'total_tasks': stats.total,
+            'completed_tasks': stats.done,
+            'pending_tasks': stats.open,
+            'cancelled_tasks': stats.cancelled,
+            'overdue_tasks': stats.overdue,
+            'status_distribution': {
+                'todo': stats.todo,
+                'in_progress': stats.in_progress,
+                'review': stats.review,
+                'done': stats.done,
+                'cancelled': stats.cancelled,
+            },
+            'completion_rate': round((stats.done / stats.total * 100) if stats.total > 0 else 0, 2)
+        }
+
 class UserRegistrationSerializer(serializers.ModelSerializer):
     """Serializer for user registration."""
     password = serializers.CharField(write_only=True, min_length=8)
@@ -25,7 +48,10 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         validated_data.pop('password_confirm')
-        user = User.objects.create_user(**validated_data)
+        with transaction.atomic():
+            user = User.objects.create_user(**validated_data)
+            # The welcome email is sent by the job worker, off the request path
+            enqueue('send_welcome_email', {'user_id': user.id})
         return user
 
 class UserLoginSerializer(serializers.Serializer):
@@ -55,19 +81,65 @@ class TaskSerializer(serializers.ModelSerializer):
         model = Task
         fields = [
             'id', 'title', 'description', 'user', 'priority', 
-            'status', 'due_date', 'completed_at', 'created_at', 'updated_at'
+            'status', 'due_date', 'completed_at', 'is_overdue', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'user', 'completed_at', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'user', 'completed_at', 'is_overdue', 'created_at', 'updated_at']
 
     def create(self, validated_data):
         # The user will be set by the view
         task = Task.objects.create(**validated_data)
         return task
 
+class TaskRowListSerializer(serializers.ListSerializer):
+    """Fast path for serializing many tasks at once.
+
+    Produces the same output as running ``TaskListSerializer`` per task, but
+    reads querysets with a single ``values_list()`` query and formats each row
+    directly instead of going through every field's ``get_attribute`` and
+    ``to_representation``. Each owning user is rendered once per response.
+    """
+
+    def to_representation(self, data):
+        fields = self.child.fields
+        format_due_date = fields['due_date'].to_representation
+        format_created_at = fields['created_at'].to_representation
+
+        users = {}
+        if isinstance(data, QuerySet):
+            rows = data.values_list(
+                'id', 'title', 'priority', 'status', 'due_date',
+                'user_id', 'user__username', 'created_at'
+            )
+        else:
+            rows = []
+            for task in data:
+                if task.user_id not in users:
+                    users[task.user_id] = str(task.user)
+                rows.append((
+                    task.id, task.title, task.priority, task.status, task.due_date,
+                    task.user_id, None, task.created_at
+                ))
+
+        result = []
+        for task_id, title, priority, status, due_date, user_id, username, created_at in rows:
+            if user_id not in users:
+                users[user_id] = username
+            result.append({
+                'id': task_id,
+                'title': title,
+                'priority': priority,
+                'status': status,
+                'due_date': format_due_date(due_date) if due_date is not None else None,
+                'user': users[user_id],
+                'created_at': format_created_at(created_at) if created_at is not None else None,
+            })
+        return result
+
 class TaskListSerializer(serializers.ModelSerializer):
     """Simplified serializer for task lists."""
     user = serializers.StringRelatedField()
 
     class Meta:
         model = Task
-        fields = ['id', 'title', 'priority', 'status', 'due_date', 'user', 'created_at'] 
\ No newline at end of file
+        fields = ['id', 'title', 'priority', 'status', 'due_date', 'user', 'created_at']
+        list_serializer_class = TaskRowListSerializer 
\ No newline at end of file
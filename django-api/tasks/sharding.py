@@ -0,0 +1,336 @@
+"""
+Per-user sharding of the task store
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+
+SQLite lets one connection write to a database file at a time. With
+``TASK_SHARDS`` above 1 each user's tasks live in one of that many SQLite
+databases (``shard_0``, ``shard_1``, ...), picked by ``user_id %
+TASK_SHARDS``, so writes for users on different shards no longer queue
+behind each other. Users, jobs, sessions and the admin log stay in
+``default``.
+
+``TaskShardRouter`` sends the models in ``SHARDED_MODELS`` to:
+
+- the shard of the user an instance belongs to, for saves, deletes and
+  related managers such as ``user.tasks``;
+- otherwise the active task database, set with ``use_db()`` or, for a
+  request, by ``CachedJWTAuthentication`` to the authenticated user's shard;
+- otherwise ``default``.
+
+Every shard keeps a copy of the users table, written by the signal handlers
+in ``tasks.signals``, so foreign keys and ``select_related('user')`` work
+inside a shard. Task ids are handed out in blocks from ``IdSequence`` in
+``default`` (``allocate_ids``) and stay unique across shards, which lets a
+task keep its id when its user moves to another shard.
+
+Work over every user's tasks (archiving, the overdue scheduler, the
+replicator, pruning and rebuilding the counters) runs once for each database
+in ``task_databases()``, one after the other. ``rebalance_task_shards`` moves
+the rows of users whose shard changed, e.g. after ``TASK_SHARDS`` was raised.
+
+With ``TASK_SHARDS=1``, the default, there are no shards, no router is
+installed and every query goes to ``default`` as before.
+"""
+
+import contextvars
+import functools
+import re
+import threading
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.signals import setting_changed
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F, Max
+from django.dispatch import receiver
+
+SHARD_ALIAS = re.compile(r'shard_(\d+)')
+
+# Models whose rows live in their user's shard (lowercase model labels)
+SHARDED_MODELS = {
+    'tasks.task',
+    'tasks.archivedtask',
+    'tasks.taskhistory',
+    'tasks.usertaskstats',
+    'tasks.tasktombstone',
+    # Each database has its own outbox and replication checkpoints
+    'tasks.outboxevent',
+    'tasks.replicationcheckpoint',
+}
+
+_active_db = contextvars.ContextVar('task_db', default=None)
+
+
+@functools.cache
+def shard_aliases():
+    """Return the shard database aliases in shard order, or ``['default']``."""
+    # Not their read replicas, e.g. shard_0_replica_0
+    shards = {}
+    for alias in settings.DATABASES:
+        if match := SHARD_ALIAS.fullmatch(alias):
+            shards[int(match[1])] = alias
+    return [shards[index] for index in sorted(shards)] or [DEFAULT_DB_ALIAS]
+
+
+@receiver(setting_changed)
+def _reset_shard_aliases(setting, **kwargs):
+    if setting == 'DATABASES':
+        shard_aliases.cache_clear()
+
+
+def is_sharded():
+    return shard_aliases() != [DEFAULT_DB_ALIAS]
+
+
+def task_databases():
+    """Return every database that can hold tasks: ``default``, then the shards.
+
+    ``default`` holds the tasks created before sharding was turned on until
+    ``rebalance_task_shards`` has moved them.
+    """
+    return list(dict.fromkeys([DEFAULT_DB_ALIAS, *shard_aliases()]))
+
+
+def shard_for_user(user_id):
+    aliases = shard_aliases()
+    return aliases[user_id % len(aliases)]
+
+
+def current_db():
+    """Return the database sharded models use when nothing else decides."""
+    return _active_db.get() or DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def use_db(alias):
+    """Make ``alias`` the active task database inside the block.
+
+    ``None`` clears it, so queries go to ``default``.
+    """
+    token = _active_db.set(alias)
+    try:
+        yield alias
+    finally:
+        _active_db.reset(token)
+
+
+def activate_user(user_id):
+    """Send the rest of this request's task queries to ``user_id``'s shard."""
+    _active_db.set(shard_for_user(user_id))
+
+
+def atomic(using=None):
+    """``transaction.atomic()`` on ``using`` or the active task database."""
+    return transaction.atomic(using=using or current_db())
+
+
+class ShardMiddleware:
+    """Start every request with no active task database.
+
+    Threads serve many requests, and a shard activated for one user must not
+    carry over to the next request, e.g. an anonymous one.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with use_db(None):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with use_db(None):
+            return await self.get_response(request)
+
+
+class TaskShardRouter:
+    """Routes the sharded models. See the module docstring."""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.label_lower not in SHARDED_MODELS:
+            return None
+        user_id = _instance_user_id(hints.get('instance'))
+        if user_id is not None:
+            return shard_for_user(user_id)
+        return current_db()
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every shard has a copy of every user
+        User = get_user_model()
+        if isinstance(obj1, User) or isinstance(obj2, User):
+            return True
+        return None
+
+
+def _instance_user_id(instance):
+    if instance is None:
+        return None
+    if isinstance(instance, get_user_model()):
+        return instance.pk
+    return getattr(instance, 'user_id', None)
+
+
+def mirror_users(users, using=None):
+    """Write ``users`` into every shard, or only into ``using``."""
+    User = get_user_model()
+    aliases = [using] if using else [alias for alias in shard_aliases() if alias != DEFAULT_DB_ALIAS]
+    fields = [field.attname for field in User._meta.concrete_fields]
+    # Copies, so bulk_create does not move the caller's instances to a shard
+    copies = [User(**{name: getattr(user, name) for name in fields}) for user in users]
+    for alias in aliases:
+        User._base_manager.using(alias).bulk_create(
+            copies, batch_size=500, update_conflicts=True,
+            unique_fields=['id'], update_fields=[name for name in fields if name != 'id'],
+        )
+
+
+# Models whose ids come from each sequence of ``allocate_ids``
+ID_SEQUENCES = {
+    'tasks': ['tasks.Task', 'tasks.ArchivedTask'],
+}
+
+_id_blocks = {}
+_id_lock = threading.Lock()
+
+
+def allocate_ids(name, count):
+    """Return ``count`` new ids from the sequence ``name``, unique across shards.
+
+    Each process reserves ``TASK_ID_BLOCK_SIZE`` ids at a time with one
+    write to ``default``, so ids are unique but not in creation order.
+    """
+    ids = []
+    with _id_lock:
+        while len(ids) < count:
+            next_id, end = _id_blocks.get(name, (1, 0))
+            if next_id > end:
+                size = max(settings.TASK_ID_BLOCK_SIZE, count - len(ids))
+                end = _reserve(name, size)
+                next_id = end - size + 1
+            take = min(end - next_id + 1, count - len(ids))
+            ids.extend(range(next_id, next_id + take))
+            _id_blocks[name] = (next_id + take, end)
+    return ids
+
+
+def forget_id_blocks():
+    """Drop this process's reserved ids, e.g. after their reservation was rolled back."""
+    with _id_lock:
+        _id_blocks.clear()
+
+
+def _reserve(name, size):
+    """Move sequence ``name`` forward by ``size`` and return its new last id."""
+    sequences = apps.get_model('tasks', 'IdSequence').objects.using(DEFAULT_DB_ALIAS)
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        # Update first, so the write lock is taken before the read
+        if not sequences.filter(name=name).update(last_id=F('last_id') + size):
+            # A new sequence starts after every id already in use
+            start = max(
+                apps.get_model(label)._base_manager.using(alias).aggregate(last=Max('pk'))['last'] or 0
+                for label in ID_SEQUENCES[name]
+                for alias in task_databases()
+            )
+            sequences.create(name=name, last_id=start + size)
+        return sequences.filter(name=name).values_list('last_id', flat=True).get()
+
+
+# Rows that move with their user in ``rebalance``. The user's counters are
+# rebuilt in the new shard instead, which may already hold some of its tasks.
+MOVED_MODELS = ['tasks.Task', 'tasks.ArchivedTask', 'tasks.TaskTombstone']
+
+
+def misplaced_users(db):
+    """Return the ids of the users with rows in ``db`` that belong to another shard."""
+    user_ids = set()
+    for label in [*MOVED_MODELS, 'tasks.UserTaskStats']:
+        rows = apps.get_model(label)._base_manager.using(db)
+        user_ids.update(rows.order_by().values_list('user_id', flat=True).distinct())
+    return sorted(user_id for user_id in user_ids if shard_for_user(user_id) != db)
+
+
+def rebalance(batch_size=500, dry_run=False, progress=None):
+    """Move every user's rows to the shard it belongs to now.
+
+    Copies each user into every shard first. Rows are copied in batches and
+    deleted from their old database once copied, so an interrupted run can
+    be started again. Writes to a user's tasks while they are moved can be
+    lost: run it while the API and the background commands are stopped.
+    ``progress`` is called with each moved user id. Returns the number of
+    users and of rows moved.
+    """
+    User = get_user_model()
+    if not dry_run and is_sharded():
+        users = User._base_manager.using(DEFAULT_DB_ALIAS).order_by('pk')
+        last_id = 0
+        while batch := list(users.filter(pk__gt=last_id)[:batch_size]):
+            mirror_users(batch)
+            last_id = batch[-1].pk
+
+    moved_users = moved_rows = 0
+    for db in task_databases():
+        for user_id in misplaced_users(db):
+            moved_users += 1
+            if dry_run:
+                moved_rows += sum(
+                    apps.get_model(label)._base_manager.using(db).filter(user_id=user_id).count()
+                    for label in MOVED_MODELS
+                )
+            else:
+                moved_rows += _move_user(user_id, db, batch_size)
+            if progress:
+                progress(user_id)
+    return moved_users, moved_rows
+
+
+def _move_user(user_id, source, batch_size):
+    # tasks.cache imports this module
+    from .cache import invalidate_user
+
+    target = shard_for_user(user_id)
+    moved = 0
+    for label in MOVED_MODELS:
+        model = apps.get_model(label)
+        rows = model._base_manager.using(source).filter(user_id=user_id).order_by('pk')
+        while batch := list(rows[:batch_size]):
+            # Tombstone ids are only ordered within a database, so moved
+            # tombstones are numbered anew; cursors from the old shard expire
+            _copy_rows(model, batch, target, keep_ids=label != 'tasks.TaskTombstone')
+            with transaction.atomic(using=source):
+                model._base_manager.using(source).filter(pk__in=[row.pk for row in batch]).delete()
+            moved += len(batch)
+    stats = apps.get_model('tasks', 'UserTaskStats')
+    stats._base_manager.using(source).filter(user_id=user_id).delete()
+    with use_db(target):
+        stats.rebuild(user_ids=[user_id])
+    invalidate_user(user_id)
+    return moved
+
+
+def _copy_rows(model, rows, target, keep_ids=True):
+    """Insert ``rows`` into ``target`` as they are, replacing rows with the same id."""
+    connection = connections[target]
+    fields = [field for field in model._meta.concrete_fields if keep_ids or not field.primary_key]
+    qn = connection.ops.quote_name
+    sql = (
+        f'INSERT OR REPLACE INTO {qn(model._meta.db_table)} ({", ".join(qn(f.column) for f in fields)}) '
+        f'VALUES ({", ".join(["%s"] * len(fields))})'
+    )
+    # Raw SQL, because a model save would reset created_at and updated_at
+    params = [[field.get_db_prep_save(getattr(row, field.attname), connection) for field in fields] for row in rows]
+    with transaction.atomic(using=target), connection.cursor() as cursor:
+        cursor.executemany(sql, params)
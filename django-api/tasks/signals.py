@@ -0,0 +1,56 @@
+"""
+Signal handlers for the tasks app
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+"""
+
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .authentication import user_cache
+from .cache import invalidate_user
+from .models import User, Task, UserTaskStats
+from .sharding import is_sharded, mirror_users, shard_aliases, shard_for_user
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def invalidate_task_cache(sender, instance, **kwargs):
+    """Drop the owner's cached task responses when a task changes."""
+    invalidate_user(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    """Cached task lists and profiles embed user details."""
+    invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def mirror_user_to_shards(sender, instance, using, **kwargs):
+    """Keep the copy of the user in every shard current (see ``tasks.sharding``)."""
+    if is_sharded() and using == DEFAULT_DB_ALIAS:
+        mirror_users([instance])
+
+
+@receiver(post_delete, sender=User)
+def delete_user_from_shards(sender, instance, using, **kwargs):
+    """Delete the user's copies; its tasks and counters cascade in its shard."""
+    if is_sharded() and using == DEFAULT_DB_ALIAS:
+        for alias in shard_aliases():
+            User._base_manager.using(alias).filter(pk=instance.pk).delete()
+
+
+@receiver(post_save, sender=User)
+def create_user_task_stats(sender, instance, created, raw=False, using=DEFAULT_DB_ALIAS, **kwargs):
+    """Every user gets an (empty) counters row when the account is created."""
+    if created and not raw and using == DEFAULT_DB_ALIAS:
+        UserTaskStats.objects.using(shard_for_user(instance.pk)).get_or_create(user=instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_authenticated_user(sender, instance, **kwargs):
+    """Make this process reload the user on its next authenticated request."""
+    user_cache.invalidate(instance.pk)
@@ -0,0 +1,144 @@
+"""
+Changes feed for task sync clients
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+
+``GET /api/tasks/changes/?cursor=...`` returns the tasks written and the ids
+of the tasks deleted or archived since the cursor, so a client that holds a
+copy of its tasks only fetches what changed.
+
+Written tasks are read in (``updated_at``, ``id``) order from the
+``tasks_user_updated_idx`` index and deletes from ``task_tombstones`` in id
+order, so a poll reads only the rows that changed. A write can commit after
+another one stamped later, so once a client has caught up its cursor is set
+back to ``now - TASK_SYNC_SETTLE_SECONDS``: recent tasks may be returned
+twice, but none is missed. Clients apply tasks by id, which makes repeats
+harmless.
+
+Cursors are opaque to clients. A cursor older than
+``TASK_SYNC_TOMBSTONE_DAYS`` may have missed pruned tombstones and is
+rejected, and the client loads its tasks again from scratch. So is a cursor
+from another shard (see ``tasks.sharding``): tombstone ids are only ordered
+within one database, and a user moved by ``rebalance_task_shards`` starts over.
+"""
+
+import base64
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Max, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import Task, TaskTombstone
+from .sharding import shard_for_user, task_databases, use_db
+
+
+class InvalidCursor(ValueError):
+    """The cursor cannot be decoded."""
+
+
+class ExpiredCursor(ValueError):
+    """The cursor is older than the tombstones kept."""
+
+
+def encode_cursor(updated_at, task_id, tombstone_id, db=None):
+    data = [updated_at.isoformat() if updated_at else None, task_id, tombstone_id]
+    if db is not None:
+        data.append(db)
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return ``(updated_at, task_id, tombstone_id, db)`` for a cursor string.
+
+    ``db`` is None for cursors that do not name their database.
+    """
+    try:
+        updated_at, task_id, tombstone_id, *db = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if updated_at:
+            updated_at = parse_datetime(updated_at)
+            # Cursors are always written with an offset; a naive time cannot be compared
+            if updated_at is None or timezone.is_naive(updated_at):
+                raise ValueError
+        else:
+            updated_at = None
+        if len(db) > 1 or (db and not isinstance(db[0], str)):
+            raise ValueError
+        return updated_at, int(task_id), int(tombstone_id), (db[0] if db else None)
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+
+
+def changes_since(user, cursor=None, limit=None):
+    """Return the changes to ``user``'s tasks after ``cursor``.
+
+    Returns a dict with the changed ``tasks`` (a list of Task), the ``deleted``
+    task ids, the ``cursor`` to send next and whether there are ``more``
+    changes to fetch right away. Without a cursor every task is returned and
+    no deletes.
+    """
+    with use_db(shard_for_user(user.pk)) as db:
+        return _changes_since(user, cursor, limit, db)
+
+
+def _changes_since(user, cursor, limit, db):
+    limit = min(limit or settings.TASK_SYNC_PAGE_SIZE, settings.TASK_SYNC_MAX_PAGE_SIZE)
+    now = timezone.now()
+    settled = now - timedelta(seconds=settings.TASK_SYNC_SETTLE_SECONDS)
+
+    tasks = Task.objects.filter(user=user)
+    if cursor is None:
+        after_at, after_id = None, 0
+        # Deletes before the first load are already reflected in it
+        tombstone_id = TaskTombstone.objects.filter(user=user).aggregate(last=Max('id'))['last'] or 0
+    else:
+        after_at, after_id, tombstone_id, cursor_db = decode_cursor(cursor)
+        # Cursors from before sharding come from the default database
+        if (cursor_db or DEFAULT_DB_ALIAS) != db:
+            raise ExpiredCursor('Cursor expired')
+        if after_at is not None:
+            if after_at < now - timedelta(days=settings.TASK_SYNC_TOMBSTONE_DAYS):
+                raise ExpiredCursor('Cursor expired')
+            # The first condition bounds the index range; the second drops
+            # the rows at the same timestamp that were already returned
+            tasks = tasks.filter(Q(updated_at__gte=after_at) & (Q(updated_at__gt=after_at) | Q(id__gt=after_id)))
+
+    changed = list(tasks.select_related('user').order_by('updated_at', 'id')[:limit + 1])
+    tasks_more = len(changed) > limit
+    changed = changed[:limit]
+    if tasks_more:
+        after_at, after_id = changed[-1].updated_at, changed[-1].id
+    elif after_at is None or after_at < settled:
+        # Caught up: restart from the settle point, past every returned row
+        # that is safely committed
+        after_at, after_id = settled, 0
+
+    tombstones = list(
+        TaskTombstone.objects.filter(user=user, id__gt=tombstone_id)
+        .order_by('id').values_list('id', 'task_id')[:limit + 1]
+    )
+    tombstones_more = len(tombstones) > limit
+    tombstones = tombstones[:limit]
+    if tombstones:
+        tombstone_id = tombstones[-1][0]
+
+    return {
+        'tasks': changed,
+        'deleted': [task_id for _, task_id in tombstones],
+        'cursor': encode_cursor(after_at, after_id, tombstone_id, db),
+        'more': tasks_more or tombstones_more,
+    }
+
+
+def prune_tombstones(older_than_days=None):
+    """Delete tombstones no valid cursor can still need. Returns the number deleted."""
+    if older_than_days is None:
+        older_than_days = settings.TASK_SYNC_TOMBSTONE_DAYS
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    deleted = 0
+    for db in task_databases():
+        deleted += TaskTombstone.objects.using(db).filter(deleted_at__lt=cutoff).delete()[0]
+    return deleted
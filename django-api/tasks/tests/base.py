@@ -0,0 +1,70 @@
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from tasks.sharding import forget_id_blocks, shard_for_user, task_databases, use_db
+
+
+class TaskTestCase(TestCase):
+    """Test case that may use every database holding tasks.
+
+    With TASK_SHARDS above 1, tasks, their counters and the users mirrored
+    into each shard are written to the shard databases as well as
+    ``default``. Not the read replicas: in tests they mirror the primaries
+    on connections of their own, which cannot read inside the test
+    transactions.
+
+    Like a request, a test with a ``user`` runs with that user's shard
+    active once set up, so task queries that name no user read the tasks
+    the user wrote. ``use_shard_of()`` activates it earlier, e.g. during
+    ``setUp()``.
+    """
+    databases = set(task_databases())
+
+    def use_shard_of(self, user):
+        """Send task queries that name no user to ``user``'s shard for the rest of the test."""
+        self.enterContext(use_db(shard_for_user(user.pk)))
+        self._shard_active = True
+
+    def _callSetUp(self):
+        # Task ids reserved by an earlier test were rolled back with it
+        forget_id_blocks()
+        self._shard_active = False
+        super()._callSetUp()
+        user = getattr(self, 'user', None)
+        if user is not None and not self._shard_active:
+            self.use_shard_of(user)
+
+    def assertNumQueries(self, num, func=None, *args, using=None, **kwargs):
+        """Like ``TestCase.assertNumQueries``, counting the queries on all the test's databases."""
+        if using is not None:
+            return super().assertNumQueries(num, func, *args, using=using, **kwargs)
+        context = self._count_queries(num)
+        if func is None:
+            return context
+        with context:
+            func(*args, **kwargs)
+
+    @contextmanager
+    def capture_queries(self):
+        """Collect the queries run on all the test's databases into the list yielded."""
+        queries = []
+        with ExitStack() as stack:
+            captured = [
+                stack.enter_context(CaptureQueriesContext(connections[alias]))
+                for alias in sorted(self.databases)
+            ]
+            yield queries
+        queries.extend(query for context in captured for query in context.captured_queries)
+
+    @contextmanager
+    def _count_queries(self, num):
+        with self.capture_queries() as queries:
+            yield
+        self.assertEqual(
+            len(queries), num,
+            '%d queries executed, %d expected\nCaptured queries were:\n%s' % (
+                len(queries), num, '\n'.join(f'{i}. {query["sql"]}' for i, query in enumerate(queries, start=1)),
+            ),
+        )
@@ -0,0 +1,93 @@
+from django.test import override_settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from tasks.models import Task
+from tasks.sharding import is_sharded, shard_for_user
+from tasks.tests.base import TaskTestCase
+from datetime import timedelta
+
+User = get_user_model()
+
+class TaskAdminTest(TaskTestCase):
+    """Test cases for the task and user admin changelists."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.admin = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='testpass123'
+        )
+        self.client.force_login(self.admin)
+        self.use_shard_of(self.admin)
+        self.tasks = [Task.objects.create(title=f'Task {i}', user=self.admin) for i in range(150)]
+        # Spread the tasks over two years, one day apart
+        start = timezone.now().replace(year=2025, month=12, day=1)
+        for i, task in enumerate(self.tasks):
+            Task.objects.filter(pk=task.pk).update(created_at=start + timedelta(days=i))
+        # With shards the changelist shows the admin's shard only when asked
+        self.shard = {'shard': shard_for_user(self.admin.pk)} if is_sharded() else {}
+
+    def test_changelist_pages_with_cursor(self):
+        """Test that pages follow each other through the after cursor."""
+        response = self.client.get('/admin/tasks/task/', self.shard)
+        self.assertEqual(response.status_code, 200)
+        first_page = list(response.context['cl'].result_list)
+        self.assertEqual(len(first_page), 100)
+        self.assertEqual(first_page[0].title, 'Task 149')
+
+        next_url = response.context['cl'].next_page_url
+        self.assertIn('after=', next_url)
+        response = self.client.get('/admin/tasks/task/' + next_url)
+        second_page = list(response.context['cl'].result_list)
+        self.assertEqual([t.title for t in second_page], [f'Task {i}' for i in range(49, -1, -1)])
+        self.assertIsNone(response.context['cl'].next_page_url)
+        self.assertContains(response, 'First page')
+
+    def test_invalid_cursor(self):
+        """Test that a bad cursor is treated like any bad lookup."""
+        response = self.client.get('/admin/tasks/task/?after=yesterday,1')
+        self.assertRedirects(response, '/admin/tasks/task/?e=1', fetch_redirect_response=False)
+
+    def test_sorted_changelist_uses_pages(self):
+        """Test that sorting by another column falls back to numbered pages."""
+        response = self.client.get('/admin/tasks/task/', {**self.shard, 'o': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['cl'].keyset)
+        self.assertEqual(response.context['cl'].result_count, 150)
+
+    def test_created_drill_down(self):
+        """Test the year and month drill down on created_at."""
+        response = self.client.get('/admin/tasks/task/', self.shard)
+        self.assertContains(response, 'created=2026')
+        self.assertContains(response, 'created=2025')
+
+        response = self.client.get('/admin/tasks/task/', {**self.shard, 'created': 2025})
+        self.assertEqual(response.context['cl'].result_count, 31)
+        self.assertContains(response, 'December 2025')
+
+        response = self.client.get('/admin/tasks/task/', {**self.shard, 'created': '2026-01'})
+        self.assertEqual(response.context['cl'].result_count, 31)
+
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=100)
+    def test_estimated_counts(self):
+        """Test that large lists report an estimate instead of counting every row."""
+        response = self.client.get('/admin/tasks/task/', self.shard)
+        self.assertTrue(response.context['cl'].count_is_estimate)
+        self.assertEqual(response.context['cl'].result_count, self.tasks[-1].pk)
+        self.assertContains(response, f'About {self.tasks[-1].pk} tasks')
+
+        response = self.client.get('/admin/tasks/task/', {**self.shard, 'status__exact': 'todo'})
+        self.assertEqual(response.context['cl'].result_count, 100)
+
+    def test_change_form_uses_raw_id_user(self):
+        """Test that the task form does not list every user."""
+        response = self.client.get(f'/admin/tasks/task/{self.tasks[0].pk}/change/')
+        self.assertContains(response, 'vForeignKeyRawIdAdminField')
+
+    def test_user_changelist(self):
+        """Test the user changelist."""
+        response = self.client.get('/admin/tasks/user/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['cl'].keyset)
+        self.assertEqual(response.context['cl'].result_count, 1)
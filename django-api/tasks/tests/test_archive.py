@@ -0,0 +1,124 @@
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from tasks.archive import archive_tasks
+from tasks.models import Task, ArchivedTask, OutboxEvent, UserTaskStats
+from django.utils import timezone
+from tasks.tests.base import TaskTestCase
+from datetime import timedelta
+from io import StringIO
+
+User = get_user_model()
+
+class TaskArchiveTest(TaskTestCase):
+    """Test cases for archiving old done and cancelled tasks."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.use_shard_of(self.user)
+        old = timezone.now() - timedelta(days=365)
+        self.old_done = Task.objects.create(title='Old done', user=self.user, status='done')
+        self.old_cancelled = Task.objects.create(title='Old cancelled', user=self.user, status='cancelled')
+        self.recent_done = Task.objects.create(title='Recent done', user=self.user, status='done')
+        self.open_task = Task.objects.create(title='Open', user=self.user)
+        # update() leaves updated_at alone, so the tasks look long closed
+        Task.objects.filter(pk=self.old_done.pk).update(completed_at=old)
+        Task.objects.filter(pk__in=[self.old_cancelled.pk, self.open_task.pk]).update(updated_at=old)
+
+    def test_archive_moves_old_closed_tasks(self):
+        """Test that only tasks closed before the cutoff are archived."""
+        archived = archive_tasks(older_than_days=90, batch_size=1, pause=0)
+        self.assertEqual(archived, 2)
+        self.assertEqual(
+            set(ArchivedTask.objects.values_list('id', flat=True)),
+            {self.old_done.id, self.old_cancelled.id},
+        )
+        self.assertEqual(
+            set(Task.objects.values_list('id', flat=True)),
+            {self.recent_done.id, self.open_task.id},
+        )
+        archived_task = ArchivedTask.objects.get(pk=self.old_done.pk)
+        self.assertEqual(archived_task.title, 'Old done')
+        self.assertEqual(archived_task.user, self.user)
+
+    def test_archive_limit(self):
+        """Test that a run stops after the limit."""
+        self.assertEqual(archive_tasks(older_than_days=90, pause=0, limit=1), 1)
+        self.assertEqual(ArchivedTask.objects.count(), 1)
+
+    def test_archive_keeps_counters_and_records_events(self):
+        """Test that archiving leaves the counters and records archive events."""
+        before = UserTaskStats.objects.get(pk=self.user.pk)
+        archive_tasks(older_than_days=90, pause=0)
+        after = UserTaskStats.objects.get(pk=self.user.pk)
+        self.assertEqual((after.total, after.done, after.cancelled), (before.total, before.done, before.cancelled))
+        self.assertEqual(
+            set(OutboxEvent.objects.filter(operation='archive').values_list('row_id', flat=True)),
+            {self.old_done.id, self.old_cancelled.id},
+        )
+        UserTaskStats.rebuild()
+        rebuilt = UserTaskStats.objects.get(pk=self.user.pk)
+        self.assertEqual(rebuilt.total, 4)
+
+    def test_archive_command(self):
+        """Test the archive_tasks management command."""
+        out = StringIO()
+        call_command('archive_tasks', '--older-than-days', '90', '--pause', '0', stdout=out)
+        self.assertIn('2', out.getvalue())
+        self.assertEqual(ArchivedTask.objects.count(), 2)
+
+    def test_user_delete_removes_archived_tasks(self):
+        """Test that deleting a user deletes its archived tasks too."""
+        archive_tasks(older_than_days=90, pause=0)
+        self.user.delete()
+        self.assertFalse(ArchivedTask.objects.exists())
+
+
+class TaskArchiveAPITest(TaskTestCase):
+    """Test cases for reading archived tasks through the API."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        token = str(RefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.use_shard_of(self.user)
+        self.archived = Task.objects.create(title='Archived', user=self.user, status='done')
+        self.live = Task.objects.create(title='Live', user=self.user)
+        Task.objects.filter(pk=self.archived.pk).update(completed_at=timezone.now() - timedelta(days=365))
+        archive_tasks(older_than_days=90, pause=0)
+
+    def test_list_excludes_archived_by_default(self):
+        """Test that listings only show live tasks unless asked."""
+        response = self.client.get('/api/tasks/')
+        self.assertEqual([t['id'] for t in response.data['results']], [self.live.id])
+
+        response = self.client.get('/api/tasks/', {'include_archived': 'true'})
+        self.assertEqual(
+            {t['id'] for t in response.data['results']},
+            {self.live.id, self.archived.id},
+        )
+
+    def test_retrieve_archived(self):
+        """Test that an archived task is only found with include_archived."""
+        response = self.client.get(f'/api/tasks/{self.archived.id}/')
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(f'/api/tasks/{self.archived.id}/', {'include_archived': 'true'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['title'], 'Archived')
+
+    def test_archived_tasks_are_read_only(self):
+        """Test that writes never reach archived tasks."""
+        response = self.client.post(f'/api/tasks/{self.archived.id}/cancel/?include_archived=true')
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,129 @@
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, override_settings
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from django.urls import include, path
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from tasks.authentication import user_cache
+from tasks.models import Task
+from tasks.tests.base import TaskTestCase
+from taskmanager.urls import urlpatterns as router_urlpatterns
+from datetime import timedelta
+
+User = get_user_model()
+
+# The project's URLs as they are with TASK_ASYNC_VIEWS on
+urlpatterns = [path('api/', include('tasks.async_urls'))] + router_urlpatterns
+
+class AsyncViewsTest(TaskTestCase):
+    """Test cases for the async read views."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='testpass123'
+        )
+        token = str(RefreshToken.for_user(self.user).access_token)
+        self.auth = f'Bearer {token}'
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=self.auth)
+        self.async_client = AsyncClient()
+        now = timezone.now()
+        self.tasks = [
+            Task.objects.create(
+                title=f'Task {i}',
+                description='Needle' if i % 3 == 0 else '',
+                priority=['low', 'medium', 'high'][i % 3],
+                status=['todo', 'in_progress', 'done'][i % 3],
+                due_date=now + timedelta(days=i),
+                user=self.user,
+            )
+            for i in range(15)
+        ]
+        self.not_mine = Task.objects.create(title='Not mine', user=other_user)
+
+    def get_async(self, url, **headers):
+        headers.setdefault('authorization', self.auth)
+        return async_to_sync(self.async_client.get)(url, headers=headers)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def assertSameAsSync(self, url):
+        response = self.get_async(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.content)
+        # Both views share the response cache
+        cache.clear()
+        with self.settings(ROOT_URLCONF='taskmanager.urls'):
+            expected = self.client.get(url)
+        self.assertEqual(response.content, expected.content)
+        return response.json()
+
+    def test_list_matches_drf(self):
+        """Test that the async list returns the DRF list, page by page."""
+        data = self.assertSameAsSync('/api/tasks/')
+        self.assertEqual(len(data['results']), 10)
+        next_page = self.assertSameAsSync(data['next'])
+        self.assertEqual([t['id'] for t in next_page['results']], [t.id for t in reversed(self.tasks[:5])])
+        self.assertSameAsSync(next_page['previous'])
+
+    def test_filtered_lists_match_drf(self):
+        """Test that search, by_status and by_priority match the DRF views."""
+        data = self.assertSameAsSync('/api/tasks/search/?q=needle')
+        self.assertEqual(len(data['results']), 5)
+        self.assertSameAsSync('/api/tasks/by_status/?status=done')
+        self.assertSameAsSync('/api/tasks/by_priority/?priority=high&page_size=2')
+
+    def test_retrieve_and_profile_match_drf(self):
+        """Test that a single task and the profile match the DRF views."""
+        data = self.assertSameAsSync(f'/api/tasks/{self.tasks[0].id}/')
+        self.assertEqual(data['title'], 'Task 0')
+        data = self.assertSameAsSync('/api/users/profile/')
+        self.assertEqual(data['username'], 'testuser')
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_other_users_task_not_found(self):
+        """Test that another user's task is a 404."""
+        response = self.get_async(f'/api/tasks/{self.not_mine.id}/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_authentication_required(self):
+        """Test that requests without a valid token get a 401."""
+        response = async_to_sync(self.async_client.get)('/api/tasks/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.json(), {'detail': 'Authentication credentials were not provided.'})
+        self.assertTrue(response['WWW-Authenticate'].startswith('Bearer'))
+
+        response = self.get_async('/api/tasks/', authorization='Bearer not-a-token')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_writes_reach_drf_view(self):
+        """Test that other methods on the same URLs are served by the viewset."""
+        response = async_to_sync(self.async_client.post)(
+            '/api/tasks/', {'title': 'Created'}, content_type='application/json',
+            headers={'authorization': self.auth},
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Task.objects.filter(title='Created', user=self.user).exists())
+
+        # The write invalidated the cached list
+        data = self.get_async('/api/tasks/').json()
+        self.assertEqual(data['results'][0]['title'], 'Created')
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_query_headers(self):
+        """Test that the query instrumentation reports the async views' queries."""
+        user_cache.clear()
+        response = self.get_async('/api/tasks/search/?q=needle')
+        # The user, then the page
+        self.assertEqual(response['X-DB-Query-Count'], '2')
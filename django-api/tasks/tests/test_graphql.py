@@ -0,0 +1,146 @@
+from django.test import override_settings
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from tasks.authentication import user_cache
+from tasks.models import Task
+from tasks.tests.base import TaskTestCase
+
+User = get_user_model()
+
+TASKS_WITH_USERS = '''
+query Tasks($first: Int) {
+  tasks(first: $first) {
+    id
+    title
+    user { username stats { total byPriority { priority count } } }
+  }
+}
+'''
+
+class GraphQLTest(TaskTestCase):
+    """Test cases for the GraphQL endpoint."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        self.authenticate(self.user)
+        self.tasks = [
+            Task.objects.create(
+                title=f'Task {i}',
+                priority=['low', 'medium', 'high'][i % 3],
+                status=['todo', 'done'][i % 2],
+                user=self.user,
+            )
+            for i in range(6)
+        ]
+        self.not_mine = Task.objects.create(title='Not mine', user=self.other_user)
+
+    def authenticate(self, user):
+        token = str(RefreshToken.for_user(user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def query(self, query, variables=None, expected_status=status.HTTP_200_OK):
+        response = self.client.post('/api/graphql/', {'query': query, 'variables': variables}, format='json')
+        self.assertEqual(response.status_code, expected_status, response.content)
+        return response.json()
+
+    def test_tasks_with_users(self):
+        """Test that tasks list the user's own tasks, newest first, with their owner."""
+        data = self.query(TASKS_WITH_USERS)['data']
+        self.assertEqual([t['id'] for t in data['tasks']], [str(t.id) for t in reversed(self.tasks)])
+        user = data['tasks'][0]['user']
+        self.assertEqual(user['username'], 'testuser')
+        self.assertEqual(user['stats']['total'], 6)
+        self.assertEqual(
+            {c['priority']: c['count'] for c in user['stats']['byPriority']},
+            {'low': 2, 'medium': 2, 'high': 2, 'urgent': 0},
+        )
+
+    def test_query_count_does_not_grow_with_tasks(self):
+        """Test that a query for many tasks with their users runs a constant number of statements."""
+        Task.objects.bulk_create([Task(title=f'Bulk {i}', user=self.other_user) for i in range(500)])
+        counts = {}
+        for user, first in ((self.user, 6), (self.other_user, 500)):
+            self.authenticate(user)
+            user_cache.clear()
+            with self.capture_queries() as queries:
+                data = self.query(TASKS_WITH_USERS, {'first': first})['data']
+            self.assertEqual(len(data['tasks']), first)
+            counts[first] = len(queries)
+        # The user, the tasks, the counters and the priority counts
+        self.assertEqual(counts, {6: 4, 500: 4})
+
+    def test_filters_and_cursor(self):
+        """Test filtering tasks and paging through them with cursors."""
+        page = self.query('{ tasks(status: "done", first: 2) { id status cursor } }')['data']['tasks']
+        self.assertEqual([t['id'] for t in page], [str(self.tasks[5].id), str(self.tasks[3].id)])
+        query = 'query Next($after: String) { tasks(status: "done", first: 2, after: $after) { id } }'
+        rest = self.query(query, {'after': page[-1]['cursor']})['data']['tasks']
+        self.assertEqual([t['id'] for t in rest], [str(self.tasks[1].id)])
+
+        errors = self.query(query, {'after': 'bogus'}, expected_status=status.HTTP_400_BAD_REQUEST)['errors']
+        self.assertEqual(errors[0]['message'], 'Invalid cursor.')
+
+    def test_me_and_single_task(self):
+        """Test the profile, its newest tasks and fetching one task by id."""
+        data = self.query(f'''{{
+            me {{ username tasks(first: 2) {{ title }} }}
+            mine: task(id: "{self.tasks[0].id}") {{ title archived }}
+            theirs: task(id: "{self.not_mine.id}") {{ title }}
+        }}''')['data']
+        self.assertEqual(data['me'], {'username': 'testuser', 'tasks': [{'title': 'Task 5'}, {'title': 'Task 4'}]})
+        self.assertEqual(data['mine'], {'title': 'Task 0', 'archived': False})
+        self.assertIsNone(data['theirs'])
+
+    @override_settings(GRAPHQL_MAX_COST=1000, GRAPHQL_MAX_DEPTH=5)
+    def test_cost_limit(self):
+        """Test that queries above the cost or depth limit are rejected before they run."""
+        query = '{ tasks(first: 100) { user { tasks(first: 100) { id } } } }'
+        with self.capture_queries() as queries:
+            errors = self.query(query, expected_status=status.HTTP_400_BAD_REQUEST)['errors']
+        self.assertEqual(errors[0]['message'], 'Query cost 10200 exceeds the limit of 1000.')
+        # Only the authentication
+        self.assertLessEqual(len(queries), 1)
+
+        # Fragments and variables count as well
+        query = '''query Deep($first: Int) {
+            tasks(first: $first) { ...Owner }
+        }
+        fragment Owner on Task { user { tasks(first: 1) { user { tasks(first: 1) { user { id } } } } } }'''
+        errors = self.query(query, {'first': 400}, expected_status=status.HTTP_400_BAD_REQUEST)['errors']
+        self.assertEqual(
+            [e['message'] for e in errors],
+            ['Query depth 6 exceeds the limit of 5.', 'Query cost 2400 exceeds the limit of 1000.'],
+        )
+
+    def test_invalid_requests(self):
+        """Test that malformed and invalid queries get 400 and mutations are not served."""
+        self.query('{ tasks { nope } }', expected_status=status.HTTP_400_BAD_REQUEST)
+        self.query('{ tasks', expected_status=status.HTTP_400_BAD_REQUEST)
+        self.query('mutation { tasks { id } }', expected_status=status.HTTP_400_BAD_REQUEST)
+        response = self.client.post('/api/graphql/', 'not json', content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_get_request(self):
+        """Test that queries can be sent as GET parameters."""
+        response = self.client.get('/api/graphql/', {'query': '{ me { username } }'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {'data': {'me': {'username': 'testuser'}}})
+
+    def test_authentication_required(self):
+        """Test that the endpoint requires a valid token."""
+        self.client.credentials()
+        response = self.client.post('/api/graphql/', {'query': '{ me { username } }'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,115 @@
+from django.core import mail
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from tasks.jobs import job, enqueue, claim_jobs, run_job, run_pending
+from tasks.models import Job
+from tasks.tests.base import TaskTestCase
+from datetime import timedelta
+from io import StringIO
+
+User = get_user_model()
+
+calls = []
+
+@job('test_record')
+def record(value):
+    calls.append(value)
+
+@job('test_fail')
+def fail():
+    raise RuntimeError('boom')
+
+class JobQueueTest(TaskTestCase):
+    """Test cases for the database-backed job queue."""
+
+    def setUp(self):
+        """Set up test data."""
+        calls.clear()
+
+    def test_successful_job_is_removed(self):
+        """Test that a job runs once and is deleted afterwards."""
+        enqueue('test_record', {'value': 42})
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(calls, [42])
+        self.assertEqual(Job.objects.count(), 0)
+
+    def test_delayed_job_waits(self):
+        """Test that a job is not run before its run_at time."""
+        enqueue('test_record', {'value': 1}, delay=60)
+        self.assertEqual(run_pending(), 0)
+
+    def test_failed_job_is_retried_with_backoff(self):
+        """Test that a failing job is requeued in the future with its error."""
+        queued = enqueue('test_fail')
+        run_pending()
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, 'queued')
+        self.assertEqual(queued.attempts, 1)
+        self.assertGreater(queued.run_at, timezone.now())
+        self.assertIn('boom', queued.last_error)
+
+    def test_job_fails_permanently_after_max_attempts(self):
+        """Test that a job stops being retried after max_attempts."""
+        queued = enqueue('test_fail', max_attempts=2)
+        for _ in range(2):
+            Job.objects.filter(id=queued.id).update(run_at=timezone.now())
+            run_pending()
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, 'failed')
+        self.assertEqual(queued.attempts, 2)
+
+    def test_visibility_timeout(self):
+        """Test that claimed jobs are hidden until their lock expires."""
+        queued = enqueue('test_record', {'value': 7})
+        self.assertEqual(len(claim_jobs()), 1)
+        self.assertEqual(claim_jobs(), [])
+
+        Job.objects.filter(id=queued.id).update(locked_until=timezone.now() - timedelta(seconds=1))
+        reclaimed = claim_jobs()
+        self.assertEqual([j.id for j in reclaimed], [queued.id])
+        self.assertEqual(reclaimed[0].attempts, 2)
+
+    def test_expired_claim_does_not_finish_the_job(self):
+        """Test that a worker whose claim expired leaves the job to the new owner."""
+        queued = enqueue('test_record', {'value': 7})
+        stale = claim_jobs()[0]
+        Job.objects.filter(id=queued.id).update(locked_until=timezone.now() - timedelta(seconds=1))
+        current = claim_jobs()[0]
+
+        self.assertTrue(run_job(stale))
+        self.assertEqual(Job.objects.get(id=queued.id).status, 'running')
+        stale.name = 'test_fail'
+        self.assertFalse(run_job(stale))
+        self.assertEqual(Job.objects.get(id=queued.id).last_error, '')
+
+        self.assertTrue(run_job(current))
+        self.assertFalse(Job.objects.filter(id=queued.id).exists())
+
+    def test_worker_command_once(self):
+        """Test that run_jobs --once drains the due jobs."""
+        enqueue('test_record', {'value': 'a'})
+        enqueue('test_record', {'value': 'b'})
+        call_command('run_jobs', '--once', stdout=StringIO())
+        self.assertEqual(calls, ['a', 'b'])
+
+class RegistrationJobTest(TaskTestCase):
+    """Test cases for the jobs enqueued by registration."""
+
+    def test_welcome_email_is_sent_by_the_worker(self):
+        """Test that registration enqueues the welcome email instead of sending it."""
+        response = APIClient().post('/api/users/register/', {
+            'username': 'newuser',
+            'email': 'new@example.com',
+            'password': 'testpass123',
+            'password_confirm': 'testpass123',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(Job.objects.get().name, 'send_welcome_email')
+
+        run_pending()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['new@example.com'])
@@ -0,0 +1,35 @@
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase
+from tasks.maintenance import optimize
+
+class SQLiteProfileTest(TransactionTestCase):
+    """Test cases for the SQLite connection profile and its maintenance task."""
+    # Not TestCase: a WAL checkpoint cannot run inside its test transaction
+
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_connections_use_the_profile(self):
+        """Test that new connections get the configured pragmas."""
+        self.assertEqual(self.pragma('synchronous'), {'OFF': 0, 'NORMAL': 1, 'FULL': 2}[settings.SQLITE_PRAGMAS['synchronous'].upper()])
+        self.assertEqual(self.pragma('cache_size'), settings.SQLITE_PRAGMAS['cache_size'])
+        self.assertEqual(self.pragma('temp_store'), {'DEFAULT': 0, 'FILE': 1, 'MEMORY': 2}[settings.SQLITE_PRAGMAS['temp_store'].upper()])
+        self.assertEqual(connection.transaction_mode, settings.SQLITE_TRANSACTION_MODE)
+
+    def test_optimize(self):
+        """Test that the maintenance task analyzes the database and reports the checkpoint."""
+        result = optimize('default', checkpoint='PASSIVE')
+        self.assertFalse(result['busy'])
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'sqlite_stat1'")
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+        out = StringIO()
+        call_command('optimize_sqlite', databases=['default'], checkpoint='PASSIVE', stdout=out)
+        self.assertIn('default: statistics updated', out.getvalue())
@@ -1,12 +1,16 @@
-from django.test import TestCase
 from django.utils import timezone
 from django.contrib.auth import get_user_model
-from tasks.models import Task
+from django.core.management import call_command
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from tasks.models import Task, UserTaskStats
+from tasks.tests.base import TaskTestCase
 from datetime import datetime, timedelta
+from io import StringIO
 
 User = get_user_model()
 
-class UserModelTest(TestCase):
+class UserModelTest(TaskTestCase):
     """Test cases for the User model."""
     
     def setUp(self):
@@ -44,7 +48,7 @@ class UserModelTest(TestCase):
                 password='testpass123'
             )
 
-class TaskModelTest(TestCase):
+class TaskModelTest(TaskTestCase):
     """Test cases for the Task model."""
     
     def setUp(self):
@@ -146,4 +150,147 @@ class TaskModelTest(TestCase):
                 user=self.user,
                 status=status
             )
-            self.assertEqual(task.status, status) 
\ No newline at end of file
+            self.assertEqual(task.status, status) 
+class UserTaskStatsTest(TaskTestCase):
+    """Test cases for the denormalized per-user task counters."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+
+    def assertStats(self, **expected):
+        """Assert the stored counters and that they match a full rebuild."""
+        stats = UserTaskStats.objects.get(user=self.user)
+        for name, value in expected.items():
+            self.assertEqual(getattr(stats, name), value, name)
+        stored = {f: getattr(stats, f) for f in ('total', 'todo', 'in_progress', 'review',
+                                                  'done', 'cancelled', 'overdue_candidates')}
+        UserTaskStats.rebuild(user_ids=[self.user.pk])
+        rebuilt = UserTaskStats.objects.get(user=self.user)
+        self.assertEqual(stored, {f: getattr(rebuilt, f) for f in stored})
+
+    def test_stats_row_created_with_user(self):
+        """Test that new users start with zeroed counters."""
+        self.assertStats(total=0, todo=0, done=0)
+
+    def test_counters_follow_task_lifecycle(self):
+        """Test counters across create, status change, due date change and delete."""
+        task = Task.objects.create(title='Task', user=self.user, due_date=timezone.now())
+        self.assertStats(total=1, todo=1, overdue_candidates=1)
+
+        task.status = 'in_progress'
+        task.save()
+        self.assertStats(total=1, todo=0, in_progress=1, overdue_candidates=1)
+
+        task.status = 'done'
+        task.save()
+        self.assertStats(total=1, in_progress=0, done=1, overdue_candidates=0)
+
+        task = Task.objects.get(pk=task.pk)
+        task.status = 'todo'
+        task.due_date = None
+        task.save()
+        self.assertStats(total=1, todo=1, done=0, overdue_candidates=0)
+
+        task.delete()
+        self.assertStats(total=0, todo=0)
+
+    def test_bulk_paths_keep_counters_exact(self):
+        """Test counters through the bulk create, update and delete helpers."""
+        from tasks.bulk import bulk_create_tasks, bulk_update_tasks, bulk_delete_tasks
+        tasks = bulk_create_tasks(self.user, [
+            {'title': 'A', 'due_date': timezone.now()},
+            {'title': 'B', 'status': 'done'},
+            {'title': 'C', 'status': 'review'},
+        ])
+        self.assertStats(total=3, todo=1, done=1, review=1, overdue_candidates=1)
+
+        loaded = Task.objects.in_bulk([t.id for t in tasks])
+        bulk_update_tasks([(loaded[tasks[0].id], {'status': 'cancelled'}),
+                           (loaded[tasks[1].id], {'status': 'todo'})])
+        self.assertStats(total=3, todo=1, done=0, cancelled=1, overdue_candidates=0)
+
+        bulk_delete_tasks(Task.objects.filter(user=self.user), [tasks[1].id, tasks[2].id])
+        self.assertStats(total=1, todo=0, review=0, cancelled=1)
+
+    def test_rebuild_command_repairs_counters(self):
+        """Test that rebuild_task_stats fixes drifted counters."""
+        Task.objects.create(title='Task', user=self.user, status='done')
+        UserTaskStats.objects.filter(user=self.user).update(total=42, done=0)
+        call_command('rebuild_task_stats', stdout=StringIO())
+        self.assertStats(total=1, done=1)
+
+class TaskChangedFieldsTest(TaskTestCase):
+    """Test cases for saving only changed fields and conditional transitions."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.task = Task.objects.create(title='Task', user=self.user)
+
+    def updates(self, func):
+        """Return the UPDATE statements run on the tasks table by ``func``."""
+        with CaptureQueriesContext(connections[self.task._state.db]) as queries:
+            func()
+        return [q['sql'] for q in queries if q['sql'].startswith('UPDATE "tasks"')]
+
+    def test_save_writes_changed_columns(self):
+        """Test that a save only writes the changed columns and derived fields."""
+        task = Task.objects.get(pk=self.task.pk)
+        task.status = 'done'
+        [sql] = self.updates(task.save)
+        self.assertIn('"status"', sql)
+        self.assertIn('"completed_at"', sql)
+        self.assertIn('"updated_at"', sql)
+        self.assertNotIn('"title"', sql)
+        self.assertEqual(task.changed_fields(), [])
+
+    def test_noop_save_writes_nothing(self):
+        """Test that saving an unchanged task runs no query."""
+        task = Task.objects.get(pk=self.task.pk)
+        with self.assertNumQueries(0):
+            task.save()
+
+    def test_explicit_update_fields_keep_derived_fields(self):
+        """Test that explicit update_fields still save completed_at."""
+        self.task.status = 'done'
+        self.task.save(update_fields=['status'])
+        self.task.refresh_from_db()
+        self.assertIsNotNone(self.task.completed_at)
+
+    def test_transition(self):
+        """Test that a transition is one conditional update and a no-op when repeated."""
+        task = Task.objects.get(pk=self.task.pk)
+        self.assertTrue(task.transition('done'))
+        self.assertIsNotNone(task.completed_at)
+        self.assertEqual(UserTaskStats.objects.get(user=self.user).done, 1)
+
+        with self.assertNumQueries(0):
+            self.assertFalse(task.transition('done'))
+
+    def test_transition_after_concurrent_change(self):
+        """Test that a transition reloads a task changed by someone else."""
+        task = Task.objects.get(pk=self.task.pk)
+        other = Task.objects.get(pk=self.task.pk)
+        other.status = 'review'
+        other.save()
+
+        self.assertTrue(task.transition('cancelled'))
+        stats = UserTaskStats.objects.get(user=self.user)
+        self.assertEqual((stats.todo, stats.review, stats.cancelled), (0, 0, 1))
+
+    def test_transition_after_concurrent_delete(self):
+        """Test that a transition of a task deleted by someone else raises DoesNotExist."""
+        task = Task.objects.get(pk=self.task.pk)
+        Task.objects.filter(pk=self.task.pk).delete()
+
+        with self.assertRaises(Task.DoesNotExist):
+            task.transition('done')
@@ -0,0 +1,155 @@
+from django.core import mail
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from tasks.bulk import bulk_create_tasks
+from tasks.jobs import run_pending
+from tasks.models import Task, Job, OutboxEvent, UserTaskStats
+from tasks.overdue import OverdueScheduler, mark_overdue
+from tasks.tests.base import TaskTestCase
+from datetime import timedelta
+from io import StringIO
+
+User = get_user_model()
+
+class OverdueTest(TaskTestCase):
+    """Test cases for the overdue flag, counters and scheduler."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.now = timezone.now()
+
+    def stats(self):
+        return UserTaskStats.objects.get(pk=self.user.pk)
+
+    def test_save_sets_overdue(self):
+        """Test that saving a task past its due date flags it and counts it."""
+        task = Task.objects.create(title='Late', user=self.user, due_date=self.now - timedelta(hours=1))
+        self.assertTrue(task.is_overdue)
+        self.assertEqual(self.stats().overdue, 1)
+
+        task.status = 'done'
+        task.save()
+        self.assertFalse(task.is_overdue)
+        self.assertEqual(self.stats().overdue, 0)
+
+    def test_bulk_create_sets_overdue(self):
+        """Test that bulk created tasks are flagged and counted."""
+        bulk_create_tasks(self.user, [
+            {'title': 'Late', 'due_date': self.now - timedelta(days=1)},
+            {'title': 'Later', 'due_date': self.now + timedelta(days=1)},
+        ])
+        self.assertEqual(list(Task.objects.filter(is_overdue=True).values_list('title', flat=True)), ['Late'])
+        self.assertEqual(self.stats().overdue, 1)
+
+    def test_mark_overdue(self):
+        """Test that tasks are flagged once their due date passes."""
+        due = self.now + timedelta(minutes=5)
+        task = Task.objects.create(title='Soon', user=self.user, due_date=due)
+        closed = Task.objects.create(title='Closed', user=self.user, due_date=due, status='done')
+        updated_at = task.updated_at
+        OutboxEvent.objects.all().delete()
+
+        self.assertEqual(mark_overdue(self.now), [])
+        self.assertEqual(mark_overdue(due + timedelta(seconds=1)), [task.id])
+
+        task.refresh_from_db()
+        closed.refresh_from_db()
+        self.assertTrue(task.is_overdue)
+        self.assertFalse(closed.is_overdue)
+        self.assertGreater(task.updated_at, updated_at)
+        self.assertEqual(self.stats().overdue, 1)
+        self.assertEqual(list(OutboxEvent.objects.values_list('row_id', flat=True)), [task.id])
+        self.assertEqual(Job.objects.get().payload, {'task_id': task.id})
+
+    def test_scheduler_flags_at_due_date(self):
+        """Test that the scheduler flags tasks from its heap as they fall due."""
+        first = Task.objects.create(title='First', user=self.user, due_date=self.now + timedelta(minutes=1))
+        second = Task.objects.create(title='Second', user=self.user, due_date=self.now + timedelta(minutes=2))
+        scheduler = OverdueScheduler(horizon=3600, refresh_interval=600)
+
+        self.assertEqual(scheduler.run_pending(self.now), 0)
+        self.assertEqual(len(scheduler.heap), 2)
+        self.assertEqual(scheduler.seconds_until_next(self.now), 60)
+
+        # Completed after the heap was loaded: its entry is stale
+        second.status = 'done'
+        second.save()
+        self.assertEqual(scheduler.run_pending(self.now + timedelta(minutes=3)), 1)
+        self.assertEqual(list(Task.objects.filter(is_overdue=True).values_list('id', flat=True)), [first.id])
+        self.assertEqual(scheduler.heap, [])
+
+    def test_scheduler_with_full_heap_reloads_early(self):
+        """Test that a heap capped before the horizon is reloaded when it runs out."""
+        due_dates = [self.now + timedelta(minutes=i) for i in (1, 2, 3)]
+        for i, due_date in enumerate(due_dates):
+            Task.objects.create(title=f'Task {i}', user=self.user, due_date=due_date)
+        scheduler = OverdueScheduler(horizon=3600, max_pending=2, refresh_interval=600)
+        scheduler.run_pending(self.now)
+        self.assertEqual(scheduler.refresh_at, due_dates[1])
+
+        self.assertEqual(scheduler.run_pending(due_dates[1]), 2)
+        self.assertEqual(scheduler.run_pending(due_dates[2]), 1)
+        self.assertEqual(self.stats().overdue, 3)
+
+    def test_schedule_overdue_command_once(self):
+        """Test the schedule_overdue management command."""
+        task = Task.objects.create(title='Soon', user=self.user, due_date=self.now + timedelta(seconds=1))
+        Task.objects.filter(pk=task.pk).update(due_date=self.now - timedelta(seconds=1))
+        out = StringIO()
+        call_command('schedule_overdue', '--once', stdout=out)
+        self.assertIn('Flagged 1 task(s) overdue.', out.getvalue())
+
+    def test_overdue_notification(self):
+        """Test that the overdue job emails the task's owner."""
+        task = Task.objects.create(title='Soon', user=self.user, due_date=self.now + timedelta(seconds=1))
+        mark_overdue(self.now + timedelta(seconds=2))
+        with self.settings(EMAIL_HOST='localhost'):
+            run_pending()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['test@example.com'])
+        self.assertIn(task.title, mail.outbox[0].subject)
+
+    def test_rebuild_counts_overdue(self):
+        """Test that rebuilding the counters counts overdue tasks."""
+        Task.objects.create(title='Late', user=self.user, due_date=self.now - timedelta(hours=1))
+        UserTaskStats.objects.filter(pk=self.user.pk).update(overdue=0)
+        UserTaskStats.rebuild(user_ids=[self.user.pk])
+        self.assertEqual(self.stats().overdue, 1)
+
+
+class OverdueAPITest(TaskTestCase):
+    """Test cases for the overdue task listing."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        token = str(RefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        now = timezone.now()
+        self.late = Task.objects.create(title='Late', user=self.user, due_date=now - timedelta(days=1))
+        Task.objects.create(title='Upcoming', user=self.user, due_date=now + timedelta(days=1))
+        Task.objects.create(title='Done', user=self.user, due_date=now - timedelta(days=1), status='done')
+
+    def test_overdue_listing(self):
+        """Test that only open tasks past their due date are listed."""
+        response = self.client.get('/api/tasks/overdue/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([t['id'] for t in response.data['results']], [self.late.id])
+
+    def test_task_shows_overdue(self):
+        """Test that the task representation includes the flag."""
+        response = self.client.get(f'/api/tasks/{self.late.id}/')
+        self.assertTrue(response.data['is_overdue'])
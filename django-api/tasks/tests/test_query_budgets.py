@@ -0,0 +1,248 @@
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+from tasks.authentication import user_cache
+from tasks.enhanced_views import EnhancedUserViewSet
+from tasks.models import Task
+from tasks.sharding import is_sharded, shard_aliases, shard_for_user, use_db
+from tasks.sync import encode_cursor
+from django.utils import timezone
+from tasks.tests.base import TaskTestCase
+from datetime import timedelta
+import os
+import time
+
+User = get_user_model()
+
+# Users are seeded with each of these task counts; every endpoint must run
+# the same number of queries for all of them
+TASK_COUNTS = [1, 25, 150]
+
+# Queries per request, on a cold response cache and user cache. Lower a
+# budget when an endpoint gets cheaper; raising one needs a reason.
+QUERY_BUDGETS = {
+    'list': 3,
+    'retrieve': 2,
+    'search': 2,
+    'by_status': 2,
+    'by_priority': 2,
+    'changes': 3,
+    'complete': 7,
+    'cancel': 7,
+    'profile': 2,
+    'enhanced_profile': 2,
+    # Two of these are the SAVEPOINT and RELEASE of registration's transaction
+    # inside the test's own; outside a transaction it takes one BEGIN instead
+    'register': 13,
+    'login': 3,
+}
+
+# Queries added per shard with TASK_SHARDS: a new user is mirrored into each
+SHARD_QUERY_BUDGETS = {
+    'register': 1,
+}
+
+# Wall time per request in milliseconds. Generous enough for slow CI
+# machines; QUERY_BUDGET_TIME_FACTOR scales them all.
+TIME_BUDGETS_MS = {
+    'list': 250,
+    'retrieve': 150,
+    'search': 250,
+    'by_status': 250,
+    'by_priority': 250,
+    'changes': 250,
+    'complete': 200,
+    'cancel': 200,
+    'profile': 150,
+    'enhanced_profile': 150,
+    # Password hashing dominates these two
+    'register': 1500,
+    'login': 1500,
+}
+TIME_FACTOR = float(os.environ.get('QUERY_BUDGET_TIME_FACTOR', '1'))
+
+STATUSES = ['todo', 'in_progress', 'review', 'done']
+PRIORITIES = ['low', 'medium', 'high', 'urgent']
+
+class QueryBudgetTest(TaskTestCase):
+    """Test that no task endpoint's query count grows with the amount of data."""
+
+    timings = {}
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up test data."""
+        now = timezone.now()
+        cls.users = {}
+        cls.task_ids = {}
+        for count in TASK_COUNTS:
+            user = User.objects.create_user(
+                username=f'user{count}',
+                email=f'user{count}@example.com',
+                password='testpass123'
+            )
+            # bulk_create() and the query below name no user to route by
+            with use_db(shard_for_user(user.pk)):
+                Task.objects.bulk_create([
+                    Task(
+                        title=f'Task {i} for user {count}',
+                        description='Seeded for query budgets',
+                        user=user,
+                        status=STATUSES[i % len(STATUSES)],
+                        priority=PRIORITIES[i % len(PRIORITIES)],
+                        due_date=now + timedelta(days=i % 10) if i % 3 else None,
+                        completed_at=now if STATUSES[i % len(STATUSES)] == 'done' else None,
+                    )
+                    for i in range(count)
+                ])
+                cls.task_ids[user.pk] = (
+                    Task.objects.filter(user=user, status='todo').order_by('id').values_list('id', flat=True)[0]
+                )
+            cls.users[count] = user
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if os.environ.get('QUERY_BUDGET_REPORT'):
+            for name, samples in sorted(cls.timings.items()):
+                print(f'{name:<18} ' + '  '.join(f'{n:>4} tasks {ms:7.1f} ms' for n, ms in samples))
+
+    def setUp(self):
+        """Set up test data."""
+        self.client = APIClient()
+        self.factory = APIRequestFactory()
+
+    def authenticate(self, user):
+        token = str(RefreshToken.for_user(user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return token
+
+    def measure(self, name, request):
+        """Run ``request`` once per seeded user and check its budgets.
+
+        ``request`` is called with the user and its task count and returns
+        the response.
+        """
+        counts = {}
+        for task_count, user in self.users.items():
+            cache.clear()
+            user_cache.clear()
+            # Every database the test may use: with shards the task queries
+            # run outside default, and no other database can run any
+            with self.capture_queries() as queries:
+                started = time.perf_counter()
+                response = request(user, task_count)
+                elapsed_ms = (time.perf_counter() - started) * 1000
+            self.assertLess(response.status_code, 400, f'{name}: {response.status_code} {response.data}')
+            counts[task_count] = len(queries)
+            self.timings.setdefault(name, []).append((task_count, elapsed_ms))
+            self.assertLess(
+                elapsed_ms, TIME_BUDGETS_MS[name] * TIME_FACTOR,
+                f'{name} took {elapsed_ms:.0f} ms with {task_count} tasks',
+            )
+
+        self.assertEqual(
+            len(set(counts.values())), 1,
+            f'{name} query count depends on the number of tasks: {counts}',
+        )
+        budget = QUERY_BUDGETS[name]
+        if is_sharded():
+            budget += SHARD_QUERY_BUDGETS.get(name, 0) * len(shard_aliases())
+        self.assertLessEqual(
+            counts[TASK_COUNTS[0]], budget,
+            f'{name} ran {counts[TASK_COUNTS[0]]} queries, budget is {budget}',
+        )
+
+    def test_list(self):
+        """Test the query budget of listing tasks."""
+        def request(user, count):
+            self.authenticate(user)
+            return self.client.get('/api/tasks/')
+        self.measure('list', request)
+
+    def test_retrieve(self):
+        """Test the query budget of retrieving a task."""
+        def request(user, count):
+            self.authenticate(user)
+            return self.client.get(f'/api/tasks/{self.task_ids[user.pk]}/')
+        self.measure('retrieve', request)
+
+    def test_search(self):
+        """Test the query budget of searching tasks."""
+        def request(user, count):
+            self.authenticate(user)
+            return self.client.get('/api/tasks/search/', {'q': 'Task'})
+        self.measure('search', request)
+
+    def test_by_status(self):
+        """Test the query budget of filtering tasks by status."""
+        def request(user, count):
+            self.authenticate(user)
+            return self.client.get('/api/tasks/by_status/', {'status': 'todo'})
+        self.measure('by_status', request)
+
+    def test_by_priority(self):
+        """Test the query budget of filtering tasks by priority."""
+        def request(user, count):
+            self.authenticate(user)
+            return self.client.get('/api/tasks/by_priority/', {'priority': 'low'})
+        self.measure('by_priority', request)
+
+    def test_changes(self):
+        """Test the query budget of polling the changes feed."""
+        def request(user, count):
+            self.authenticate(user)
+            cursor = encode_cursor(timezone.now() - timedelta(minutes=5), 0, 0, shard_for_user(user.pk))
+            return self.client.get('/api/tasks/changes/', {'cursor': cursor})
+        self.measure('changes', request)
+
+    def test_complete(self):
+        """Test the query budget of completing a task."""
+        def request(user, count):
+            self.authenticate(user)
+            return self.client.post(f'/api/tasks/{self.task_ids[user.pk]}/complete/')
+        self.measure('complete', request)
+
+    def test_cancel(self):
+        """Test the query budget of cancelling a task."""
+        def request(user, count):
+            self.authenticate(user)
+            return self.client.post(f'/api/tasks/{self.task_ids[user.pk]}/cancel/')
+        self.measure('cancel', request)
+
+    def test_profile(self):
+        """Test the query budget of the user profile."""
+        def request(user, count):
+            self.authenticate(user)
+            return self.client.get('/api/users/profile/')
+        self.measure('profile', request)
+
+    def test_enhanced_profile(self):
+        """Test the query budget of the profile with task statistics."""
+        view = EnhancedUserViewSet.as_view({'get': 'profile'}, **EnhancedUserViewSet.profile.kwargs)
+
+        def request(user, count):
+            token = str(RefreshToken.for_user(user).access_token)
+            return view(self.factory.get('/api/users/profile/', HTTP_AUTHORIZATION=f'Bearer {token}'))
+        self.measure('enhanced_profile', request)
+
+    def test_register(self):
+        """Test the query budget of registering a user."""
+        def request(user, count):
+            return self.client.post('/api/users/register/', {
+                'username': f'new{count}',
+                'email': f'new{count}@example.com',
+                'password': 'newpass12345',
+                'password_confirm': 'newpass12345',
+            }, format='json')
+        self.measure('register', request)
+
+    def test_login(self):
+        """Test the query budget of logging in."""
+        def request(user, count):
+            return self.client.post('/api/users/login/', {
+                'username': user.username,
+                'password': 'testpass123',
+            }, format='json')
+        self.measure('login', request)
@@ -0,0 +1,148 @@
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from contextlib import ExitStack
+
+from django.test import SimpleTestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections, router
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from tasks import read_replicas
+from tasks.authentication import user_cache
+from tasks.models import Task
+from tasks.sharding import shard_for_user
+
+User = get_user_model()
+
+class SnapshotTest(SimpleTestCase):
+    """Test cases for copying a database to its read replicas."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.source = os.path.join(self.dir.name, 'db.sqlite3')
+        with sqlite3.connect(self.source) as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('CREATE TABLE tasks (title TEXT)')
+            db.execute("INSERT INTO tasks VALUES ('Copied')")
+        db.close()
+
+    def test_snapshot_copies_to_every_replica(self):
+        """Test that each replica gets a read-only copy stamped with its snapshot time."""
+        targets = [os.path.join(self.dir.name, f'db_replica_{i}.sqlite3') for i in range(2)]
+        before = time.time()
+        snapshot_at = read_replicas.snapshot(self.source, targets)
+        self.assertGreaterEqual(snapshot_at, before)
+
+        for target in targets:
+            db = sqlite3.connect(f'file:{target}?mode=ro', uri=True)
+            self.assertEqual(db.execute('SELECT title FROM tasks').fetchall(), [('Copied',)])
+            self.assertEqual(db.execute('SELECT snapshot_at FROM replica_status').fetchone()[0], snapshot_at)
+            db.close()
+        self.assertFalse([name for name in os.listdir(self.dir.name) if name.endswith('.tmp')])
+
+    def test_snapshot_replaces_the_old_copy(self):
+        """Test that a new snapshot replaces the copy and its snapshot time."""
+        target = os.path.join(self.dir.name, 'db_replica_0.sqlite3')
+        first = read_replicas.snapshot(self.source, [target])
+        with sqlite3.connect(self.source) as db:
+            db.execute("INSERT INTO tasks VALUES ('Later')")
+        db.close()
+        second = read_replicas.snapshot(self.source, [target])
+
+        db = sqlite3.connect(f'file:{target}?mode=ro', uri=True)
+        self.assertEqual(db.execute('SELECT COUNT(*) FROM tasks').fetchone()[0], 2)
+        self.assertEqual(db.execute('SELECT snapshot_at FROM replica_status').fetchall(), [(second,)])
+        db.close()
+        self.assertGreaterEqual(second, first)
+
+    def test_refresh_copies_only_after_a_write(self):
+        """Test that a refresh without a write since the last copy only restamps it."""
+        target = os.path.join(self.dir.name, 'db_replica_0.sqlite3')
+        first = read_replicas.refresh(self.source, [target])
+        copied = os.stat(target).st_ino
+
+        second = read_replicas.refresh(self.source, [target])
+        self.assertEqual(os.stat(target).st_ino, copied)
+        db = sqlite3.connect(f'file:{target}?mode=ro', uri=True)
+        self.assertEqual(db.execute('SELECT snapshot_at FROM replica_status').fetchall(), [(second,)])
+        db.close()
+        self.assertGreaterEqual(second, first)
+
+        with sqlite3.connect(self.source) as db:
+            db.execute("INSERT INTO tasks VALUES ('Later')")
+        db.close()
+        read_replicas.refresh(self.source, [target])
+        self.assertNotEqual(os.stat(target).st_ino, copied)
+        db = sqlite3.connect(f'file:{target}?mode=ro', uri=True)
+        self.assertEqual(db.execute('SELECT COUNT(*) FROM tasks').fetchone()[0], 2)
+        db.close()
+
+@unittest.skipUnless(read_replicas.replica_aliases(), 'run with DB_READ_REPLICAS=1 or more to test the read replicas')
+class ReadReplicaRoutingTest(TransactionTestCase):
+    """Test cases for sending the API's reads to the read replicas."""
+    # In tests each replica mirrors its primary on a connection of its own,
+    # which only sees committed rows
+    databases = '__all__'
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        user_cache.clear()
+        read_replicas._snapshot_times.clear()
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        Task.objects.create(title='Existing', user=self.user)
+        self.primary = shard_for_user(self.user.pk)
+        self.replicas = read_replicas.replica_aliases(self.primary)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        # The writes above would keep the user on the primary
+        cache.clear()
+
+    def get_tasks(self):
+        """Return the number of queries the task list ran on the replicas and on the primary."""
+        with ExitStack() as stack:
+            replicas = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in self.replicas]
+            primary = stack.enter_context(CaptureQueriesContext(connections[self.primary]))
+            response = self.client.get('/api/tasks/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return sum(len(queries) for queries in replicas), len(primary)
+
+    def test_reads_go_to_a_replica(self):
+        """Test that a GET request reads from a replica of the user's database."""
+        on_replica, on_primary = self.get_tasks()
+        self.assertGreater(on_replica, 0)
+        self.assertEqual(on_primary, 0)
+
+    def test_writer_reads_the_primary(self):
+        """Test that a user's reads stay on the primary right after they write."""
+        response = self.client.post('/api/tasks/', {'title': 'New'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        on_replica, on_primary = self.get_tasks()
+        self.assertEqual(on_replica, 0)
+        self.assertGreater(on_primary, 0)
+
+    def test_stale_replica_is_skipped(self):
+        """Test that reads fall back to the primary when the replica lags too far behind."""
+        stale = time.time() - 2 * settings.READ_REPLICA_MAX_LAG
+        for alias in self.replicas:
+            read_replicas._snapshot_times[alias] = (time.monotonic(), stale)
+        on_replica, on_primary = self.get_tasks()
+        self.assertEqual(on_replica, 0)
+        self.assertGreater(on_primary, 0)
+
+    def test_writes_and_migrations_use_the_primary(self):
+        """Test that the router never writes to or migrates a replica."""
+        with read_replicas.read_from_replicas():
+            self.assertIn(router.db_for_read(Task, instance=self.user), self.replicas)
+            self.assertEqual(router.db_for_write(Task, instance=self.user), self.primary)
+            self.assertEqual(router.db_for_read(Task, instance=self.user), self.primary)
+        self.assertFalse(router.allow_migrate(self.replicas[0], 'tasks'))
@@ -0,0 +1,210 @@
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+from tasks.archive import archive_tasks
+from tasks.bulk import bulk_create_tasks, bulk_delete_tasks
+from tasks.models import Task, OutboxEvent, ReplicationCheckpoint
+from tasks import replication
+from tasks.tests.base import TaskTestCase
+from io import StringIO
+from datetime import timedelta
+import os
+import sqlite3
+import tempfile
+
+User = get_user_model()
+
+# Tables as created by the Flask and FastAPI services' SQLAlchemy models
+FLASK_SCHEMA = '''
+CREATE TABLE user (
+    id INTEGER NOT NULL PRIMARY KEY, username VARCHAR(80) NOT NULL UNIQUE,
+    email VARCHAR(120) NOT NULL UNIQUE, password_hash VARCHAR(128),
+    created_at DATETIME, updated_at DATETIME
+);
+CREATE TABLE task (
+    id INTEGER NOT NULL PRIMARY KEY, title VARCHAR(200) NOT NULL, description TEXT,
+    user_id INTEGER NOT NULL, category_id INTEGER, priority VARCHAR(10), status VARCHAR(15),
+    due_date DATETIME, completed_at DATETIME, created_at DATETIME, updated_at DATETIME
+);
+'''
+
+FASTAPI_SCHEMA = '''
+CREATE TABLE users (
+    id INTEGER NOT NULL PRIMARY KEY, username VARCHAR, email VARCHAR,
+    hashed_password VARCHAR, created_at DATETIME
+);
+CREATE UNIQUE INDEX ix_users_username ON users (username);
+CREATE UNIQUE INDEX ix_users_email ON users (email);
+CREATE TABLE tasks (
+    id INTEGER NOT NULL PRIMARY KEY, title VARCHAR, description TEXT, user_id INTEGER,
+    priority VARCHAR, status VARCHAR, due_date DATETIME, completed_at DATETIME,
+    created_at DATETIME, updated_at DATETIME
+);
+'''
+
+class ReplicationTest(TaskTestCase):
+    """Test cases for the outbox and the replicator."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.targets = {}
+        for name, schema in (('flask', FLASK_SCHEMA), ('fastapi', FASTAPI_SCHEMA)):
+            path = os.path.join(self.tmpdir.name, f'{name}.db')
+            conn = sqlite3.connect(path)
+            conn.executescript(schema)
+            conn.close()
+            self.targets[name] = {'schema': name, 'path': path}
+
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+
+    def replicate_all(self):
+        for name, config in self.targets.items():
+            while replication.replicate(name, config):
+                pass
+
+    def query(self, target, sql, params=()):
+        conn = sqlite3.connect(self.targets[target]['path'])
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def test_writes_record_outbox_events(self):
+        """Test that task saves and deletes append outbox events."""
+        OutboxEvent.objects.all().delete()
+        task = Task.objects.create(title='Task', user=self.user)
+        task_id = task.id
+        task.status = 'done'
+        task.save()
+        task.delete()
+        events = list(OutboxEvent.objects.values_list('table', 'row_id', 'operation'))
+        self.assertEqual(events, [
+            ('tasks', task_id, 'upsert'),
+            ('tasks', task_id, 'upsert'),
+            ('tasks', task_id, 'delete'),
+        ])
+
+    def test_bulk_writes_record_outbox_events(self):
+        """Test that the bulk helpers append one event per task."""
+        OutboxEvent.objects.all().delete()
+        tasks = bulk_create_tasks(self.user, [{'title': 'A'}, {'title': 'B'}])
+        bulk_delete_tasks(Task.objects.all(), [tasks[0].id])
+        self.assertEqual(OutboxEvent.objects.filter(operation='upsert').count(), 2)
+        self.assertEqual(
+            list(OutboxEvent.objects.filter(operation='delete').values_list('row_id', flat=True)),
+            [tasks[0].id],
+        )
+
+    def test_user_delete_records_task_deletes(self):
+        """Test that deleting a user records deletes for its cascaded tasks."""
+        task = Task.objects.create(title='Task', user=self.user)
+        user_id = self.user.id
+        self.user.delete()
+        # Recorded where the user is deleted, not in the shard holding its tasks
+        events = OutboxEvent.objects.using(DEFAULT_DB_ALIAS).filter(operation='delete')
+        deleted = set(events.values_list('table', 'row_id'))
+        self.assertEqual(deleted, {('tasks', task.id), ('users', user_id)})
+
+    def test_changes_reach_both_targets(self):
+        """Test that users and tasks are upserted and deleted in both replicas."""
+        kept = Task.objects.create(title='Kept', user=self.user, status='done')
+        removed = Task.objects.create(title='Removed', user=self.user)
+        self.replicate_all()
+        removed.delete()
+        kept.title = 'Renamed'
+        kept.save()
+        self.replicate_all()
+
+        self.assertEqual(self.query('flask', 'SELECT id, username FROM user'), [(self.user.id, 'testuser')])
+        self.assertEqual(self.query('fastapi', 'SELECT id, username FROM users'), [(self.user.id, 'testuser')])
+        for target, table in (('flask', 'task'), ('fastapi', 'tasks')):
+            rows = self.query(target, f'SELECT id, title, user_id, status, completed_at FROM {table}')
+            self.assertEqual(len(rows), 1)
+            self.assertEqual(rows[0][:4], (kept.id, 'Renamed', self.user.id, 'done'))
+            self.assertIsNotNone(rows[0][4])
+
+    def test_replay_is_idempotent(self):
+        """Test that applying the same events again leaves the replicas unchanged."""
+        Task.objects.create(title='Task', user=self.user)
+        self.replicate_all()
+        before = self.query('fastapi', 'SELECT * FROM tasks')
+        ReplicationCheckpoint.objects.update(last_event_id=0)
+        self.replicate_all()
+        self.assertEqual(self.query('fastapi', 'SELECT * FROM tasks'), before)
+
+    def test_replica_owned_columns_are_kept(self):
+        """Test that a Flask task's category survives later updates."""
+        task = Task.objects.create(title='Task', user=self.user)
+        self.replicate_all()
+        conn = sqlite3.connect(self.targets['flask']['path'])
+        with conn:
+            conn.execute('UPDATE task SET category_id = 3 WHERE id = ?', (task.id,))
+        conn.close()
+        task.title = 'Changed'
+        task.save()
+        self.replicate_all()
+        self.assertEqual(self.query('flask', 'SELECT title, category_id FROM task'), [('Changed', 3)])
+
+    def test_conflicting_replica_user_is_replaced(self):
+        """Test that a replica-only user with the same username gives way."""
+        conn = sqlite3.connect(self.targets['fastapi']['path'])
+        with conn:
+            conn.execute("INSERT INTO users (id, username, email) VALUES (999, 'testuser', 'x@example.com')")
+        conn.close()
+        self.replicate_all()
+        self.assertEqual(self.query('fastapi', 'SELECT id FROM users'), [(self.user.id,)])
+
+    def test_status_reports_lag_and_prune_removes_applied_events(self):
+        """Test the lag report and that applied events are pruned."""
+        Task.objects.create(title='Task', user=self.user)
+        report = {row['target']: row for row in replication.status(self.targets)}
+        self.assertGreater(report['flask']['pending_events'], 0)
+        self.assertGreaterEqual(report['flask']['lag_seconds'], 0)
+
+        self.replicate_all()
+        report = {row['target']: row for row in replication.status(self.targets)}
+        self.assertEqual(report['flask']['pending_events'], 0)
+        self.assertEqual(report['flask']['lag_seconds'], 0)
+        self.assertGreater(replication.prune(self.targets), 0)
+        self.assertEqual(OutboxEvent.objects.count(), 0)
+
+    def test_command_catches_up_once(self):
+        """Test that replicate_changes --once applies every event."""
+        Task.objects.create(title='Task', user=self.user)
+        out = StringIO()
+        with self.settings(REPLICATION_TARGETS=self.targets):
+            call_command('replicate_changes', '--once', stdout=out)
+            call_command('replicate_changes', '--status', stdout=out)
+        self.assertIn('0 pending', out.getvalue())
+        self.assertEqual(len(self.query('flask', 'SELECT id FROM task')), 1)
+
+    def test_archived_tasks_move_to_archive_table(self):
+        """Test that archived tasks leave the replica task table for its archive table."""
+        task = Task.objects.create(title='Old', user=self.user, status='done')
+        self.replicate_all()
+        Task.objects.filter(pk=task.pk).update(completed_at=timezone.now() - timedelta(days=365))
+        archive_tasks(older_than_days=90, pause=0)
+        self.replicate_all()
+
+        self.assertEqual(self.query('flask', 'SELECT id FROM task'), [])
+        self.assertEqual(self.query('flask', 'SELECT id, title FROM task_archive'), [(task.id, 'Old')])
+        self.assertEqual(self.query('fastapi', 'SELECT id FROM tasks'), [])
+        self.assertEqual(self.query('fastapi', 'SELECT id, title FROM tasks_archive'), [(task.id, 'Old')])
+
+        self.user.delete()
+        self.replicate_all()
+        self.assertEqual(self.query('fastapi', 'SELECT id FROM tasks_archive'), [])
+
+    def test_overdue_flag_reaches_replicas(self):
+        """Test that is_overdue is added to the replica tables and replicated."""
+        task = Task.objects.create(title='Late', user=self.user, due_date=timezone.now() - timedelta(days=1))
+        self.replicate_all()
+        self.assertEqual(self.query('flask', 'SELECT id, is_overdue FROM task'), [(task.id, 1)])
+        self.assertEqual(self.query('fastapi', 'SELECT id, is_overdue FROM tasks'), [(task.id, 1)])
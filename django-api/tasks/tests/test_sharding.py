@@ -0,0 +1,128 @@
+import unittest
+
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from tasks.archive import archive_tasks
+from tasks.models import ArchivedTask, Task, UserTaskStats
+from tasks.overdue import OverdueScheduler
+from tasks.sharding import is_sharded, rebalance, shard_aliases, shard_for_user, task_databases
+from tasks.sync import encode_cursor
+from tasks.tests.base import TaskTestCase
+from datetime import timedelta
+
+User = get_user_model()
+
+@unittest.skipUnless(is_sharded(), 'run with TASK_SHARDS=2 or more to test sharding')
+class ShardingTest(TaskTestCase):
+    """Test cases for tasks sharded by user (TASK_SHARDS above 1)."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.users = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='testpass123')
+            for i in range(len(shard_aliases()) + 1)
+        ]
+        self.user = self.users[0]
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def tasks_in(self, db, user):
+        return Task.objects.using(db).filter(user=user)
+
+    def test_tasks_live_in_their_users_shard(self):
+        """Test that each user's tasks and counters are written to its shard only."""
+        tasks = [Task.objects.create(title=f'Task of {user}', user=user) for user in self.users]
+        self.assertEqual(len({task.id for task in tasks}), len(tasks))
+        for user in self.users:
+            for db in task_databases():
+                expected = 1 if db == shard_for_user(user.pk) else 0
+                self.assertEqual(self.tasks_in(db, user).count(), expected)
+            stats = UserTaskStats.objects.using(shard_for_user(user.pk)).get(pk=user.pk)
+            self.assertEqual(stats.total, 1)
+
+    def test_api_reads_and_writes_the_users_shard(self):
+        """Test that the task API works on the authenticated user's shard."""
+        for user in self.users[1:]:
+            Task.objects.create(title='Not mine', user=user)
+        response = self.client.post('/api/tasks/', {'title': 'Mine', 'due_date': timezone.now() + timedelta(days=1)})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        task_id = response.data['id']
+        self.assertTrue(self.tasks_in(shard_for_user(self.user.pk), self.user).filter(pk=task_id).exists())
+
+        response = self.client.get('/api/tasks/')
+        self.assertEqual([t['title'] for t in response.data['results']], ['Mine'])
+        response = self.client.post(f'/api/tasks/{task_id}/complete/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stats = UserTaskStats.objects.using(shard_for_user(self.user.pk)).get(pk=self.user.pk)
+        self.assertEqual(stats.done, 1)
+
+    def test_users_are_copied_to_every_shard(self):
+        """Test that shards hold a current copy of every user, removed with the user."""
+        self.user.first_name = 'Renamed'
+        self.user.save()
+        Task.objects.create(title='Gone with the user', user=self.user)
+        for db in shard_aliases():
+            self.assertEqual(User.objects.using(db).get(pk=self.user.pk).first_name, 'Renamed')
+
+        user_id = self.user.pk
+        self.user.delete()
+        for db in shard_aliases():
+            self.assertFalse(User.objects.using(db).filter(pk=user_id).exists())
+        self.assertFalse(Task.objects.using(shard_for_user(user_id)).filter(user_id=user_id).exists())
+
+    def test_background_work_covers_every_shard(self):
+        """Test that archiving and the overdue scheduler reach every shard."""
+        old = timezone.now() - timedelta(days=365)
+        for user in self.users:
+            task = Task.objects.create(title='Old', user=user, status='done')
+            Task.objects.using(shard_for_user(user.pk)).filter(pk=task.pk).update(completed_at=old)
+            Task.objects.create(title='Late', user=user, due_date=timezone.now() + timedelta(minutes=1))
+
+        self.assertEqual(archive_tasks(pause=0), len(self.users))
+        later = timezone.now() + timedelta(minutes=2)
+        self.assertEqual(OverdueScheduler().run_pending(later), len(self.users))
+        for user in self.users:
+            db = shard_for_user(user.pk)
+            self.assertTrue(ArchivedTask.objects.using(db).filter(user=user).exists())
+            self.assertTrue(self.tasks_in(db, user).get().is_overdue)
+
+    def test_cursor_from_another_shard_expires(self):
+        """Test that the changes feed restarts clients whose cursor names another database."""
+        other_db = next(db for db in task_databases() if db != shard_for_user(self.user.pk))
+        cursor = encode_cursor(timezone.now(), 0, 0, other_db)
+        response = self.client.get('/api/tasks/changes/', {'cursor': cursor})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+    def test_rebalance_moves_tasks(self):
+        """Test that rebalancing moves tasks written before sharding to their user's shard."""
+        tasks = Task.objects.using(DEFAULT_DB_ALIAS).bulk_create(
+            [Task(title=f'Task {i}', user=self.user) for i in range(3)]
+        )
+
+        self.assertEqual(rebalance(dry_run=True), (1, 3))
+        self.assertEqual(rebalance(batch_size=2), (1, 3))
+        db = shard_for_user(self.user.pk)
+        self.assertEqual(sorted(self.tasks_in(db, self.user).values_list('pk', flat=True)),
+                         sorted(task.pk for task in tasks))
+        self.assertFalse(self.tasks_in(DEFAULT_DB_ALIAS, self.user).exists())
+        self.assertEqual(UserTaskStats.objects.using(db).get(pk=self.user.pk).total, 3)
+        self.assertEqual(rebalance(), (0, 0))
+
+    def test_admin_finds_tasks_in_any_shard(self):
+        """Test that the task admin lists a chosen shard and opens tasks from any shard."""
+        admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='x')
+        self.client.force_login(admin)
+        task = Task.objects.create(title='Sharded', user=self.users[-1])
+        db = shard_for_user(task.user_id)
+
+        response = self.client.get('/admin/tasks/task/', {'shard': db})
+        self.assertEqual([t.pk for t in response.context['cl'].result_list], [task.pk])
+        self.assertContains(response, f'Tasks in {db} only')
+        response = self.client.get('/admin/tasks/task/')
+        self.assertContains(response, f'Tasks in {shard_aliases()[0]} only')
+        response = self.client.get(f'/admin/tasks/task/{task.pk}/change/')
+        self.assertContains(response, 'Sharded')
@@ -0,0 +1,120 @@
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from tasks.archive import archive_tasks
+from tasks.bulk import bulk_delete_tasks
+from tasks.models import Task, TaskTombstone
+from tasks.sync import encode_cursor
+from tasks.tests.base import TaskTestCase
+from datetime import timedelta
+from io import StringIO
+import base64
+import json
+
+User = get_user_model()
+
+class TaskChangesAPITest(TaskTestCase):
+    """Test cases for the task changes feed."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='testpass123'
+        )
+        token = str(RefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.tasks = [Task.objects.create(title=f'Task {i}', user=self.user) for i in range(3)]
+        Task.objects.create(title='Not mine', user=self.other_user)
+        # Settle every existing write so polls only see what a test changes
+        Task.objects.update(updated_at=timezone.now() - timedelta(minutes=1))
+
+    def changes(self, cursor=None, **params):
+        if cursor:
+            params['cursor'] = cursor
+        response = self.client.get('/api/tasks/changes/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return response.data
+
+    def test_first_load_returns_every_task(self):
+        """Test that a poll without a cursor returns all of the user's tasks."""
+        data = self.changes()
+        self.assertEqual([t['id'] for t in data['tasks']], [t.id for t in self.tasks])
+        self.assertEqual(data['deleted'], [])
+        self.assertFalse(data['more'])
+
+    def test_poll_returns_only_changes(self):
+        """Test that a later poll returns the changed tasks and tombstones."""
+        cursor = self.changes()['cursor']
+        self.assertEqual(self.changes(cursor)['tasks'], [])
+
+        changed = self.tasks[0]
+        changed.title = 'Renamed'
+        changed.save()
+        created = Task.objects.create(title='New', user=self.user)
+        deleted_id = self.tasks[1].id
+        self.tasks[1].delete()
+
+        data = self.changes(cursor)
+        self.assertEqual([t['id'] for t in data['tasks']], [changed.id, created.id])
+        self.assertEqual(data['tasks'][0]['title'], 'Renamed')
+        self.assertEqual(data['deleted'], [deleted_id])
+
+        # Recent writes are repeated until they settle; deletes are not
+        data = self.changes(data['cursor'])
+        self.assertEqual(data['deleted'], [])
+        self.assertEqual({t['id'] for t in data['tasks']}, {changed.id, created.id})
+
+    def test_pages(self):
+        """Test that changes are paged with limit and more."""
+        data = self.changes(limit=2)
+        self.assertEqual(len(data['tasks']), 2)
+        self.assertTrue(data['more'])
+        data = self.changes(data['cursor'], limit=2)
+        self.assertEqual([t['id'] for t in data['tasks']], [self.tasks[2].id])
+        self.assertFalse(data['more'])
+
+    def test_bulk_deletes_and_archiving_leave_tombstones(self):
+        """Test that bulk deletes and archived tasks are reported as deleted."""
+        cursor = self.changes()['cursor']
+        bulk_delete_tasks(Task.objects.filter(user=self.user), [self.tasks[0].id])
+        self.tasks[1].status = 'done'
+        self.tasks[1].save()
+        Task.objects.filter(pk=self.tasks[1].pk).update(completed_at=timezone.now() - timedelta(days=365))
+        archive_tasks(older_than_days=90, pause=0)
+        self.assertEqual(self.changes(cursor)['deleted'], [self.tasks[0].id, self.tasks[1].id])
+
+    def test_invalid_and_expired_cursors(self):
+        """Test that bad cursors are rejected and old ones expire."""
+        response = self.client.get('/api/tasks/changes/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        for updated_at in ['2026-01-01T10:00:00', 'yesterday']:
+            crafted = base64.urlsafe_b64encode(json.dumps([updated_at, 0, 0]).encode()).decode()
+            response = self.client.get('/api/tasks/changes/', {'cursor': crafted})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        expired = encode_cursor(timezone.now() - timedelta(days=365), 0, 0)
+        response = self.client.get('/api/tasks/changes/', {'cursor': expired})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+    def test_prune_tombstones_command(self):
+        """Test that old tombstones are pruned."""
+        old_id = self.tasks[0].id
+        self.tasks[0].delete()
+        self.tasks[1].delete()
+        TaskTombstone.objects.filter(task_id=old_id).update(deleted_at=timezone.now() - timedelta(days=365))
+        out = StringIO()
+        call_command('prune_task_tombstones', stdout=out)
+        self.assertIn('Deleted 1 tombstone(s).', out.getvalue())
+        self.assertEqual(TaskTombstone.objects.count(), 1)
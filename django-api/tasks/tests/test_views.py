@@ -1,19 +1,38 @@
-from django.test import TestCase
+from django.core.cache import cache
 from django.urls import reverse
 from django.contrib.auth import get_user_model
-from rest_framework.test import APIClient
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.http import HttpResponse
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
 from rest_framework import status
-from tasks.models import Task
+from rest_framework_simplejwt.tokens import RefreshToken
+from tasks.authentication import user_cache
+from tasks.enhanced_views import EnhancedUserViewSet
+from tasks.middleware import QueryInstrumentationMiddleware
+from taskmanager_common.queries import fingerprint
+from tasks.models import Task, UserTaskStats
+from tasks.pagination import TaskCursorPagination
+from tasks.serializers import TaskListSerializer
+from tasks.views import TaskViewSet
 from django.utils import timezone
+from tasks.tests.base import TaskTestCase
 from datetime import timedelta
+from io import StringIO
+import json
+from unittest import mock
+import os
+import tempfile
+import time
 
 User = get_user_model()
 
-class TaskAPITest(TestCase):
+class TaskAPITest(TaskTestCase):
     """Test cases for Task API endpoints."""
     
     def setUp(self):
         """Set up test data."""
+        cache.clear()
         self.client = APIClient()
         self.user = User.objects.create_user(
             username='testuser',
@@ -134,6 +153,21 @@ class TaskAPITest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(Task.objects.count(), 0)
     
+    def test_complete_task_deleted_meanwhile(self):
+        """Test that completing a task deleted during the request returns 404."""
+        task = Task.objects.create(title='Test Task', user=self.user)
+        get_object = TaskViewSet.get_object
+
+        def get_then_delete(view):
+            obj = get_object(view)
+            Task.objects.filter(pk=obj.pk).delete()
+            return obj
+
+        self.client.force_authenticate(user=self.user)
+        with mock.patch.object(TaskViewSet, 'get_object', get_then_delete):
+            response = self.client.post(f'/api/tasks/{task.id}/complete/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+    
     def test_search_tasks(self):
         """Test searching tasks."""
         # Clear any existing tasks
@@ -158,8 +192,8 @@ class TaskAPITest(TestCase):
         self.client.force_authenticate(user=self.user)
         response = self.client.get('/api/tasks/search/', {'q': 'Python'})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['title'], 'Python Task')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['title'], 'Python Task')
     
     def test_filter_tasks_by_status(self):
         """Test filtering tasks by status."""
@@ -180,8 +214,8 @@ class TaskAPITest(TestCase):
         self.client.force_authenticate(user=self.user)
         response = self.client.get('/api/tasks/by_status/', {'status': 'todo'})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['title'], 'Todo Task')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['title'], 'Todo Task')
     
     def test_filter_tasks_by_priority(self):
         """Test filtering tasks by priority."""
@@ -202,14 +236,15 @@ class TaskAPITest(TestCase):
         self.client.force_authenticate(user=self.user)
         response = self.client.get('/api/tasks/by_priority/', {'priority': 'high'})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['title'], 'High Priority Task')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['title'], 'High Priority Task')
 
-class UserAPITest(TestCase):
+class UserAPITest(TaskTestCase):
     """Test cases for User API endpoints."""
     
     def setUp(self):
         """Set up test data."""
+        cache.clear()
         self.client = APIClient()
         self.user_data = {
             'username': 'testuser',
@@ -266,7 +301,20 @@ class UserAPITest(TestCase):
         }
         response = self.client.post('/api/users/login/', login_data)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-    
+
+    def test_token_refresh(self):
+        """Test getting a new access token with the refresh token from login."""
+        user_data = {k: v for k, v in self.user_data.items() if k != 'password_confirm'}
+        User.objects.create_user(**user_data)
+        response = self.client.post('/api/users/login/', {'username': 'testuser', 'password': 'testpass123'})
+        response = self.client.post('/api/token/refresh/', {'refresh': response.data['tokens']['refresh']})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        self.assertEqual(self.client.get('/api/users/profile/').status_code, status.HTTP_200_OK)
+
+        response = self.client.post('/api/token/refresh/', {'refresh': 'bogus'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
     def test_user_profile_authenticated(self):
         """Test getting user profile when authenticated."""
         # Create user without password_confirm
@@ -277,8 +325,579 @@ class UserAPITest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['username'], 'testuser')
         self.assertEqual(response.data['email'], 'test@example.com')
+
+    def test_user_profile_stats(self):
+        """Test that the profile carries task statistics from the counters."""
+        user_data = {k: v for k, v in self.user_data.items() if k != 'password_confirm'}
+        user = User.objects.create_user(**user_data)
+        for task_status in ['todo', 'in_progress', 'done', 'done', 'cancelled']:
+            Task.objects.create(title='Task', user=user, status=task_status)
+        self.client.force_authenticate(user=user)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/users/profile/')
+        stats = response.data['stats']
+        self.assertEqual(stats['total_tasks'], 5)
+        self.assertEqual(stats['pending_tasks'], 2)
+        self.assertEqual(stats['completion_rate'], 40.0)
+
+        Task.objects.create(title='Task', user=user, status='done')
+        response = self.client.get('/api/users/profile/')
+        self.assertEqual(response.data['stats']['completed_tasks'], 3)
     
     def test_user_profile_unauthenticated(self):
         """Test getting user profile when not authenticated."""
         response = self.client.get('/api/users/profile/')
-        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED) 
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED) 
+
+
+class TaskListSerializationTest(TaskTestCase):
+    """Test cases for the fast task list serialization path."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        for i in range(5):
+            Task.objects.create(
+                title=f'Task {i}',
+                user=self.user,
+                priority='high' if i % 2 else 'low',
+                due_date=timezone.now() + timedelta(days=i) if i % 2 else None
+            )
+        self.client.force_authenticate(user=self.user)
+
+    def _field_by_field(self, tasks):
+        """Serialize tasks one at a time through the regular DRF field path."""
+        return [TaskListSerializer(task).data for task in tasks]
+
+    def test_queryset_output_matches_field_serialization(self):
+        """Test that serializing a queryset matches per-task serialization."""
+        tasks = Task.objects.filter(user=self.user)
+        self.assertEqual(
+            TaskListSerializer(tasks, many=True).data,
+            self._field_by_field(tasks)
+        )
+
+    def test_instance_list_output_matches_field_serialization(self):
+        """Test that serializing a list of instances matches per-task serialization."""
+        tasks = list(Task.objects.filter(user=self.user))
+        self.assertEqual(
+            TaskListSerializer(tasks, many=True).data,
+            self._field_by_field(tasks)
+        )
+
+    def test_search_query_count_is_constant(self):
+        """Test that search runs the same number of queries regardless of size."""
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/tasks/search/')
+        self.assertEqual(len(response.data['results']), 5)
+
+        for i in range(20):
+            Task.objects.create(title=f'Extra {i}', user=self.user)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/tasks/search/', {'page_size': 100})
+        self.assertEqual(len(response.data['results']), 25)
+
+
+class TaskCursorPaginationTest(TaskTestCase):
+    """Test cases for cursor pagination of task listings."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        # Identical created_at values exercise the id tie-breaker
+        created_at = timezone.now()
+        tasks = Task.objects.bulk_create([
+            Task(title=f'Task {i}', user=self.user, status='todo')
+            for i in range(25)
+        ])
+        Task.objects.filter(id__in=[t.id for t in tasks[:10]]).update(created_at=created_at)
+        self.client.force_authenticate(user=self.user)
+
+    def _collect(self, url, params):
+        """Follow next links and return every task id in page order."""
+        ids = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            ids.extend(task['id'] for task in response.data['results'])
+            if not response.data['next']:
+                return ids
+            response = self.client.get(response.data['next'])
+
+    def test_list_walks_every_task_once(self):
+        """Test that following cursors returns each task exactly once."""
+        ids = self._collect('/api/tasks/', {'page_size': 7})
+        self.assertEqual(len(ids), 25)
+        self.assertEqual(len(set(ids)), 25)
+
+    def test_walks_past_a_thousand_identical_timestamps(self):
+        """Test that cursors page through more than 1,000 tasks created at once."""
+        created_at = timezone.now()
+        tasks = Task.objects.bulk_create([
+            Task(title=f'Imported {i}', user=self.user, status='todo')
+            for i in range(1200)
+        ])
+        Task.objects.filter(id__in=[t.id for t in tasks]).update(created_at=created_at)
+        with mock.patch.object(TaskCursorPagination, 'max_page_size', 100):
+            ids = self._collect('/api/tasks/', {'page_size': 100})
+        self.assertEqual(len(ids), 1225)
+        self.assertEqual(len(set(ids)), 1225)
+
+    def test_previous_link_returns_the_previous_page(self):
+        """Test that the previous link of the second page returns the first page."""
+        first = self.client.get('/api/tasks/', {'page_size': 7})
+        self.assertIsNone(first.data['previous'])
+        second = self.client.get(first.data['next'])
+        previous = self.client.get(second.data['previous'])
+        self.assertEqual([t['id'] for t in previous.data['results']],
+                         [t['id'] for t in first.data['results']])
+        self.assertIsNone(previous.data['previous'])
+        self.assertEqual(previous.data['next'], first.data['next'])
+
+    def test_invalid_cursor_is_not_found(self):
+        """Test that a malformed cursor is rejected."""
+        response = self.client.get('/api/tasks/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_custom_actions_are_paginated(self):
+        """Test that search, by_status and by_priority return cursor pages."""
+        for url, params in [
+            ('/api/tasks/search/', {'q': 'Task'}),
+            ('/api/tasks/by_status/', {'status': 'todo'}),
+            ('/api/tasks/by_priority/', {'priority': 'medium'}),
+        ]:
+            response = self.client.get(url, params)
+            self.assertEqual(len(response.data['results']), 10)
+            self.assertIsNotNone(response.data['next'])
+            self.assertEqual(len(set(self._collect(url, params))), 25)
+
+    def test_page_size_is_capped(self):
+        """Test that page_size cannot exceed TASK_MAX_PAGE_SIZE."""
+        with mock.patch.object(TaskCursorPagination, 'max_page_size', 5):
+            response = self.client.get('/api/tasks/', {'page_size': 10000})
+        self.assertEqual(len(response.data['results']), 5)
+        response = self.client.get('/api/tasks/by_status/', {'status': 'todo', 'page_size': 3})
+        self.assertEqual(len(response.data['results']), 3)
+
+
+class TaskBulkAPITest(TaskTestCase):
+    """Test cases for the bulk task endpoint."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_bulk_create(self):
+        """Test creating several tasks in one request."""
+        response = self.client.post('/api/tasks/bulk/', [
+            {'title': 'First', 'priority': 'high'},
+            {'title': 'Second', 'status': 'done'},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([t['title'] for t in response.data['results']], ['First', 'Second'])
+        self.assertEqual(Task.objects.filter(user=self.user).count(), 2)
+        done = Task.objects.get(title='Second')
+        self.assertIsNotNone(done.completed_at)
+        self.assertIsNotNone(response.data['results'][1]['completed_at'])
+
+    def test_bulk_create_validates_all_items(self):
+        """Test that one invalid item rejects the whole batch."""
+        response = self.client.post('/api/tasks/bulk/', [
+            {'title': 'Valid'},
+            {'title': 'Invalid', 'priority': 'whenever'},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['errors'][0], {})
+        self.assertIn('priority', response.data['errors'][1])
+        self.assertEqual(Task.objects.count(), 0)
+
+    def test_bulk_update(self):
+        """Test partially updating several tasks and the completed_at rules."""
+        first = Task.objects.create(title='First', user=self.user)
+        second = Task.objects.create(title='Second', user=self.user, status='done')
+        response = self.client.patch('/api/tasks/bulk/', [
+            {'id': first.id, 'status': 'done'},
+            {'id': second.id, 'status': 'todo', 'priority': 'urgent'},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.status, 'done')
+        self.assertIsNotNone(first.completed_at)
+        self.assertEqual(second.priority, 'urgent')
+        self.assertIsNone(second.completed_at)
+
+    def test_bulk_update_rejects_other_users_tasks(self):
+        """Test that tasks of other users are reported as not found."""
+        other = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='testpass123'
+        )
+        mine = Task.objects.create(title='Mine', user=self.user)
+        theirs = Task.objects.create(title='Theirs', user=other)
+        response = self.client.patch('/api/tasks/bulk/', [
+            {'id': mine.id, 'title': 'Changed'},
+            {'id': theirs.id, 'title': 'Changed'},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['errors'][1], {'id': ['Not found.']})
+        mine.refresh_from_db()
+        self.assertEqual(mine.title, 'Mine')
+
+    def test_bulk_delete(self):
+        """Test deleting several tasks with per-item results."""
+        tasks = [Task.objects.create(title=f'Task {i}', user=self.user) for i in range(3)]
+        ids = [tasks[0].id, tasks[1].id, 999999]
+        response = self.client.delete('/api/tasks/bulk/', {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['deleted'], 2)
+        self.assertEqual([r['deleted'] for r in response.data['results']], [True, True, False])
+        self.assertEqual(list(Task.objects.values_list('id', flat=True)), [tasks[2].id])
+
+    def test_bulk_rejects_boolean_ids(self):
+        """Test that true and false are not accepted as the ids 1 and 0."""
+        task = Task.objects.create(title='Task', user=self.user)
+        Task.objects.filter(pk=task.pk).update(id=1)
+        response = self.client.patch('/api/tasks/bulk/', [{'id': True, 'title': 'Changed'}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['errors'][0], {'id': ['A valid integer is required.']})
+        response = self.client.delete('/api/tasks/bulk/', {'ids': [True]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Task.objects.get(pk=1).title, 'Task')
+
+
+class TaskImportAPITest(TaskTestCase):
+    """Test cases for the streaming task import endpoint."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_import_csv_body(self):
+        """Test importing a CSV request body, skipping invalid rows."""
+        body = (
+            'title,description,priority,status,due_date\n'
+            'First,Some text,high,todo,2026-01-01T10:00:00Z\n'
+            ',Missing title,low,todo,\n'
+            'Second,,urgent,done,\n'
+            'Third,,bogus,todo,not a date\n'
+        ).encode()
+        response = self.client.post('/api/tasks/import/', body, content_type='text/csv')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['failed'], 2)
+        self.assertEqual([e['row'] for e in response.data['errors']], [2, 4])
+        self.assertIn('title', response.data['errors'][0]['errors'])
+        self.assertEqual(set(response.data['errors'][1]['errors']), {'priority', 'due_date'})
+
+        first = Task.objects.get(title='First')
+        self.assertEqual(first.user, self.user)
+        self.assertEqual(first.priority, 'high')
+        self.assertEqual(first.due_date.year, 2026)
+        self.assertIsNotNone(Task.objects.get(title='Second').completed_at)
+        self.assertEqual(UserTaskStats.objects.get(pk=self.user.pk).total, 2)
+
+    def test_import_ndjson_upload(self):
+        """Test importing an NDJSON file from a multipart upload."""
+        upload = SimpleUploadedFile('tasks.ndjson', (
+            b'{"title": "One", "status": "in_progress"}\n'
+            b'\n'
+            b'not json\n'
+            b'{"title": "Two", "status": "done", "completed_at": "2025-05-01T12:00:00Z"}\n'
+        ))
+        response = self.client.post('/api/tasks/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['errors'][0]['row'], 2)
+        self.assertEqual(Task.objects.get(title='Two').completed_at.year, 2025)
+
+    def test_import_is_chunked(self):
+        """Test that rows are inserted across several chunks."""
+        body = 'title\n' + ''.join(f'Task {i}\n' for i in range(25))
+        with self.settings(TASK_IMPORT_CHUNK_SIZE=10):
+            response = self.client.post('/api/tasks/import/', body.encode(), content_type='text/csv')
+        self.assertEqual(response.data['created'], 25)
+        self.assertEqual(Task.objects.filter(user=self.user).count(), 25)
+
+    def test_imported_rows_page_in_id_order(self):
+        """Test that rows sharing an import timestamp are paged once each, by id."""
+        body = 'title\n' + ''.join(f'Task {i}\n' for i in range(30))
+        self.client.post('/api/tasks/import/', body.encode(), content_type='text/csv')
+        tasks = Task.objects.filter(user=self.user)
+        self.assertEqual(tasks.values('created_at').distinct().count(), 1)
+        imported = list(tasks.order_by('id').values_list('id', flat=True))
+
+        ids = []
+        response = self.client.get('/api/tasks/', {'page_size': 7})
+        while True:
+            ids.extend(task['id'] for task in response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(ids, imported[::-1])
+
+        ids, params = [], {'limit': 7}
+        while True:
+            data = self.client.get('/api/tasks/changes/', params).data
+            ids.extend(task['id'] for task in data['tasks'])
+            if not data['more']:
+                break
+            params['cursor'] = data['cursor']
+        self.assertEqual(ids, imported)
+
+    def test_import_rejects_unknown_format(self):
+        """Test that a file of an unknown type is rejected."""
+        response = self.client.post('/api/tasks/import/', b'title', content_type='text/plain')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_import_rejects_non_string_values(self):
+        """Test that list and object values are reported as row errors."""
+        body = (
+            b'{"title": "x", "priority": ["a"]}\n'
+            b'{"title": "y", "status": {"a": 1}}\n'
+            b'{"title": {"a": 1}}\n'
+        )
+        response = self.client.post('/api/tasks/import/', body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['failed'], 3)
+        self.assertEqual([list(e['errors']) for e in response.data['errors']],
+                         [['priority'], ['status'], ['title']])
+
+    def test_import_rejects_invalid_encoding(self):
+        """Test that a body that is not UTF-8 is rejected."""
+        body = b'\xff\xfet\x00i\x00t\x00l\x00e\x00\n\x00'
+        response = self.client.post('/api/tasks/import/', body, content_type='text/csv')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], 'Invalid encoding, expected UTF-8.')
+
+    def test_import_rejects_malformed_csv(self):
+        """Test that a CSV file with a NUL byte stops the import with an error."""
+        body = b'title\nFirst\nSec\x00ond\n'
+        response = self.client.post('/api/tasks/import/', body, content_type='text/csv')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Malformed CSV file', response.data['error'])
+        self.assertEqual(response.data['created'], 1)
+
+    def test_import_tasks_command(self):
+        """Test the import_tasks management command."""
+        with tempfile.NamedTemporaryFile('wb', suffix='.csv', delete=False) as f:
+            f.write(b'title,priority\nA,low\nB,high\n')
+        self.addCleanup(os.unlink, f.name)
+        out = StringIO()
+        call_command('import_tasks', f.name, user='testuser', stdout=out)
+        self.assertIn('Imported 2 task(s)', out.getvalue())
+        self.assertEqual(Task.objects.filter(user=self.user).count(), 2)
+
+
+class TaskCacheTest(TaskTestCase):
+    """Test cases for the versioned per-user response cache."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.task = Task.objects.create(title='Cached', user=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def test_repeat_list_and_retrieve_skip_the_database(self):
+        """Test that repeated reads are answered from the cache."""
+        first = self.client.get('/api/tasks/').data
+        detail = self.client.get(f'/api/tasks/{self.task.id}/').data
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/tasks/').data, first)
+            self.assertEqual(self.client.get(f'/api/tasks/{self.task.id}/').data, detail)
+
+    def test_task_writes_invalidate(self):
+        """Test that single and bulk writes are visible on the next read."""
+        self.client.get('/api/tasks/')
+        self.client.get(f'/api/tasks/{self.task.id}/')
+
+        self.client.patch(f'/api/tasks/{self.task.id}/', {'title': 'Renamed'})
+        self.assertEqual(self.client.get(f'/api/tasks/{self.task.id}/').data['title'], 'Renamed')
+
+        self.client.post('/api/tasks/bulk/', [{'title': 'Bulk'}], format='json')
+        self.assertEqual(len(self.client.get('/api/tasks/').data['results']), 2)
+
+        self.client.delete('/api/tasks/bulk/', {'ids': [self.task.id]}, format='json')
+        titles = [t['title'] for t in self.client.get('/api/tasks/').data['results']]
+        self.assertEqual(titles, ['Bulk'])
+
+    def test_cache_is_per_user(self):
+        """Test that users never see each other's cached lists."""
+        other = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='testpass123'
+        )
+        self.client.get('/api/tasks/')
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.client.get('/api/tasks/').data['results'], [])
+
+
+class EnhancedProfileTest(TaskTestCase):
+    """Test cases for the profile statistics of EnhancedUserViewSet."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.factory = APIRequestFactory()
+        self.view = EnhancedUserViewSet.as_view({'get': 'profile'})
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+
+    def _get_profile(self):
+        request = self.factory.get('/api/users/profile/')
+        force_authenticate(request, user=self.user)
+        return self.view(request)
+
+    def test_profile_stats_are_a_single_read(self):
+        """Test that profile stats come from one primary-key read."""
+        for task_status in ['todo', 'in_progress', 'done', 'done', 'cancelled']:
+            Task.objects.create(title='Task', user=self.user, status=task_status)
+        cache.clear()
+        with self.assertNumQueries(1):
+            response = self._get_profile()
+        stats = response.data['stats']
+        self.assertEqual(stats['total_tasks'], 5)
+        self.assertEqual(stats['completed_tasks'], 2)
+        self.assertEqual(stats['pending_tasks'], 2)
+        self.assertEqual(stats['completion_rate'], 40.0)
+
+
+class CachedJWTAuthenticationTest(TaskTestCase):
+    """Test cases for the cached JWT authentication class."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        user_cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_repeat_requests_skip_user_query(self):
+        """Test that only the first request loads the user."""
+        # The user and their task counters
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/users/profile/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/users/profile/')
+        self.assertEqual(response.data['username'], 'testuser')
+
+    def test_deactivation_is_enforced(self):
+        """Test that deactivating a user invalidates the cached entry."""
+        self.client.get('/api/users/profile/')
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get('/api/users/profile/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_user_update_is_visible(self):
+        """Test that profile changes are not served from a stale entry."""
+        self.client.get('/api/users/profile/')
+        self.user.first_name = 'Changed'
+        self.user.save()
+        response = self.client.get('/api/users/profile/')
+        self.assertEqual(response.data['first_name'], 'Changed')
+
+    def test_entries_expire(self):
+        """Test that cached users are reloaded after the TTL."""
+        self.client.get('/api/users/profile/')
+        with mock.patch('tasks.authentication.time.monotonic', return_value=time.monotonic() + 3600):
+            with self.assertNumQueries(1):
+                self.client.get('/api/users/profile/')
+
+
+class QueryInstrumentationTest(TaskTestCase):
+    """Test cases for the per-request query instrumentation middleware."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_headers_report_queries(self):
+        """Test that responses carry the query count and time."""
+        Task.objects.create(title='Task', user=self.user)
+        response = self.client.get('/api/tasks/')
+        self.assertGreater(int(response['X-DB-Query-Count']), 0)
+        self.assertGreaterEqual(float(response['X-DB-Time-Ms']), 0)
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertFalse(response.has_header('X-DB-N-Plus-One'))
+
+    def test_repeated_statement_is_flagged(self):
+        """Test that the same statement run many times is flagged as an N+1."""
+        users = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='x')
+            for i in range(8)
+        ]
+
+        def view(request):
+            for user in users:
+                User.objects.get(pk=user.pk)
+            return HttpResponse()
+
+        request = APIRequestFactory().get('/')
+        with self.assertLogs('tasks.queries', level='WARNING') as logs:
+            response = QueryInstrumentationMiddleware(view)(request)
+        self.assertEqual(response['X-DB-N-Plus-One'], '8')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['db_queries'], 8)
+        self.assertEqual(record['n_plus_one'][0]['count'], 8)
+
+    def test_fingerprint_collapses_literals_and_in_lists(self):
+        """Test that statements differing only in values share a fingerprint."""
+        self.assertEqual(
+            fingerprint("SELECT * FROM tasks WHERE id IN (%s, %s, %s) AND title = 'a'"),
+            fingerprint("SELECT * FROM tasks WHERE id IN (%s) AND title = 'b'"),
+        )
+        self.assertEqual(fingerprint('SELECT * FROM tasks WHERE id = 1'),
+                         fingerprint('SELECT * FROM tasks WHERE id = 2'))
@@ -9,17 +9,48 @@ This module contains the API viewsets for users and tasks.
 
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
 from django.contrib.auth import authenticate
 from django.db.models import Q
-from .models import User, Task
+from .models import User, Task, TaskHistory, UserTaskStats
+from . import importer, sharding, sync
+from .bulk import bulk_create_tasks, bulk_update_tasks, bulk_delete_tasks
+from .cache import user_cache_key, get_cached, set_cached
+from .pagination import TaskCursorPagination
 from .serializers import (
-    UserSerializer, UserRegistrationSerializer, UserLoginSerializer,
+    UserSerializer, UserRegistrationSerializer, UserLoginSerializer, UserTaskStatsSerializer,
     TaskSerializer, TaskListSerializer
 )
 
-class UserViewSet(viewsets.ModelViewSet):
+
+def profile_data(user, stats):
+    """The profile representation: the user's fields and their task statistics."""
+    return {**UserSerializer(user).data, 'stats': UserTaskStatsSerializer(stats).data}
+
+
+def _is_id(value):
+    """Whether a JSON value is a task id; JSON true and false are not 1 and 0."""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class UserShardMixin:
+    """Send the request's task queries to the authenticated user's shard.
+
+    ``CachedJWTAuthentication`` does this already; this covers users set any
+    other way, e.g. by another authentication class or ``force_authenticate``.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.user.is_authenticated:
+            sharding.activate_user(request.user.pk)
+
+
+class UserViewSet(UserShardMixin, viewsets.ModelViewSet):
     """ViewSet for User model."""
     queryset = User.objects.all()
     serializer_class = UserSerializer
@@ -64,28 +95,69 @@ class UserViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def profile(self, request):
-        """Get current user profile."""
-        serializer = UserSerializer(request.user)
-        return Response(serializer.data)
+        """Get current user profile with task statistics, from the per-user cache when possible."""
+        key = user_cache_key(request.user.pk, 'profile')
+        data = get_cached(key)
+        if data is None:
+            data = profile_data(request.user, UserTaskStats.for_user(request.user.pk))
+            set_cached(key, data)
+        return Response(data)
 
-class TaskViewSet(viewsets.ModelViewSet):
+class TaskViewSet(UserShardMixin, viewsets.ModelViewSet):
     """ViewSet for Task model."""
     serializer_class = TaskSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = TaskCursorPagination
 
     def get_queryset(self):
-        """Filter tasks by current user."""
-        return Task.objects.filter(user=self.request.user)
+        """Filter tasks by current user.
+
+        Reads with ``?include_archived=true`` also see archived tasks;
+        writes only ever reach live ones.
+        """
+        model = TaskHistory if self.include_archived() else Task
+        return model.objects.filter(user=self.request.user).select_related('user')
+
+    def include_archived(self):
+        """Whether this request asks for archived tasks as well."""
+        return (self.request.method in permissions.SAFE_METHODS
+                and self.request.query_params.get('include_archived', '').lower() in ('1', 'true', 'yes'))
 
     def get_serializer_class(self):
         if self.action == 'list':
             return TaskListSerializer
         return TaskSerializer
 
+    def list(self, request, *args, **kwargs):
+        """List tasks, served from the per-user cache when possible."""
+        key = user_cache_key(request.user.pk, 'list', request.build_absolute_uri())
+        data = get_cached(key)
+        if data is not None:
+            return Response(data)
+        response = super().list(request, *args, **kwargs)
+        set_cached(key, response.data)
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        """Retrieve a task, served from the per-user cache when possible."""
+        key = user_cache_key(request.user.pk, 'retrieve', kwargs.get('pk'), self.include_archived())
+        data = get_cached(key)
+        if data is not None:
+            return Response(data)
+        response = super().retrieve(request, *args, **kwargs)
+        set_cached(key, response.data)
+        return response
+
     def perform_create(self, serializer):
         """Set the user to the current user when creating a task."""
         serializer.save(user=self.request.user)
 
+    def _paginated_list(self, tasks):
+        """Return one cursor page of tasks in the list representation."""
+        page = self.paginate_queryset(tasks)
+        serializer = TaskListSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
     @action(detail=False, methods=['get'])
     def search(self, request):
         """Search tasks by title or description."""
@@ -97,8 +169,7 @@ class TaskViewSet(viewsets.ModelViewSet):
         else:
             tasks = self.get_queryset()
         
-        serializer = TaskListSerializer(tasks, many=True)
-        return Response(serializer.data)
+        return self._paginated_list(tasks)
 
     @action(detail=False, methods=['get'])
     def by_status(self, request):
@@ -109,8 +180,7 @@ class TaskViewSet(viewsets.ModelViewSet):
         else:
             tasks = self.get_queryset()
         
-        serializer = TaskListSerializer(tasks, many=True)
-        return Response(serializer.data)
+        return self._paginated_list(tasks)
 
     @action(detail=False, methods=['get'])
     def by_priority(self, request):
@@ -121,23 +191,169 @@ class TaskViewSet(viewsets.ModelViewSet):
         else:
             tasks = self.get_queryset()
         
-        serializer = TaskListSerializer(tasks, many=True)
-        return Response(serializer.data)
+        return self._paginated_list(tasks)
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """Return the tasks changed and deleted since ``cursor``.
+
+        Without a cursor every task is returned. Send back the returned
+        ``cursor`` on the next poll; while ``more`` is true there are further
+        changes to fetch right away. See ``tasks.sync``.
+        """
+        try:
+            limit = int(request.query_params.get('limit', 0)) or None
+        except ValueError:
+            return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            changes = sync.changes_since(request.user, request.query_params.get('cursor'), limit)
+        except sync.InvalidCursor as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        except sync.ExpiredCursor as exc:
+            return Response({'error': f'{exc}; load all tasks again'}, status=status.HTTP_410_GONE)
+        changes['tasks'] = TaskSerializer(changes['tasks'], many=True).data
+        return Response(changes)
+
+    @action(detail=False, methods=['get'])
+    def overdue(self, request):
+        """List open tasks past their due date."""
+        return self._paginated_list(self.get_queryset().filter(is_overdue=True))
 
     @action(detail=True, methods=['post'])
     def complete(self, request, pk=None):
         """Mark a task as completed."""
-        task = self.get_object()
-        task.status = 'done'
-        task.save()
-        serializer = TaskSerializer(task)
-        return Response(serializer.data)
+        return self._transition('done')
 
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
         """Cancel a task."""
+        return self._transition('cancelled')
+
+    def _transition(self, task_status):
         task = self.get_object()
-        task.status = 'cancelled'
-        task.save()
+        try:
+            task.transition(task_status)
+        except Task.DoesNotExist:
+            # Deleted by another request since get_object
+            raise NotFound()
         serializer = TaskSerializer(task)
-        return Response(serializer.data) 
\ No newline at end of file
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['post', 'patch', 'delete'])
+    def bulk(self, request):
+        """Create (POST), partially update (PATCH) or delete (DELETE) many tasks.
+
+        POST takes a list of tasks, PATCH a list of partial tasks with an
+        ``id`` each and DELETE an object with a list of ``ids``. All items
+        are validated before anything is written, and the writes happen in
+        a single transaction. Results are returned per item, in request order.
+        """
+        items = request.data
+        if request.method == 'DELETE':
+            items = items.get('ids') if isinstance(items, dict) else None
+        if not isinstance(items, list):
+            return Response({
+                'error': 'Expected a list of ids' if request.method == 'DELETE' else 'Expected a list of tasks'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > settings.TASK_BULK_MAX_ITEMS:
+            return Response({
+                'error': f'At most {settings.TASK_BULK_MAX_ITEMS} items per request'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.method == 'POST':
+            return self._bulk_create(items)
+        if request.method == 'PATCH':
+            return self._bulk_update(items)
+        return self._bulk_delete(items)
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_file(self, request):
+        """Import tasks from a CSV or NDJSON file.
+
+        The file is either the ``file`` field of a multipart form or the raw
+        request body sent as ``text/csv`` or ``application/x-ndjson``. It is
+        read as a stream and imported in chunks; invalid rows are skipped
+        and listed with their row number. A file that is not UTF-8 or not
+        valid CSV stops the import with an ``error``.
+        """
+        if request.content_type.startswith('multipart/'):
+            upload = request.FILES.get('file')
+            if upload is None:
+                return Response({'error': 'No file uploaded'}, status=status.HTTP_400_BAD_REQUEST)
+            file_format = importer.detect_format(upload.name, upload.content_type)
+            lines = upload
+        else:
+            file_format = importer.detect_format(content_type=request.content_type)
+            # Iterating the underlying HttpRequest reads the body line by line
+            lines = request._request
+
+        if file_format is None:
+            return Response({
+                'error': 'Unsupported file format, expected CSV or NDJSON'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        result = importer.import_tasks(request.user, lines, file_format)
+        # A malformed file is a 400 even when the rows before the problem were imported
+        created = result.created and not result.error
+        return Response(
+            result.as_dict(),
+            status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST,
+        )
+
+    def _bulk_create(self, items):
+        serializer = TaskSerializer(data=items, many=True)
+        if not serializer.is_valid():
+            return Response({'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        with sharding.atomic():
+            tasks = bulk_create_tasks(self.request.user, serializer.validated_data)
+        return Response({
+            'results': TaskSerializer(tasks, many=True).data
+        }, status=status.HTTP_201_CREATED)
+
+    def _bulk_update(self, items):
+        ids = [item.get('id') if isinstance(item, dict) else None for item in items]
+        with sharding.atomic():
+            tasks = self.get_queryset().select_for_update().in_bulk(
+                [task_id for task_id in ids if _is_id(task_id)]
+            )
+
+            errors = []
+            changes = []
+            seen = set()
+            for task_id, item in zip(ids, items):
+                if not _is_id(task_id):
+                    errors.append({'id': ['A valid integer is required.']})
+                    continue
+                if task_id in seen:
+                    errors.append({'id': ['Duplicate id in request.']})
+                    continue
+                seen.add(task_id)
+                if task_id not in tasks:
+                    errors.append({'id': ['Not found.']})
+                    continue
+                serializer = TaskSerializer(tasks[task_id], data=item, partial=True)
+                if serializer.is_valid():
+                    errors.append({})
+                    changes.append((tasks[task_id], serializer.validated_data))
+                else:
+                    errors.append(serializer.errors)
+
+            if any(errors):
+                return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+            updated = bulk_update_tasks(changes)
+        return Response({'results': TaskSerializer(updated, many=True).data})
+
+    def _bulk_delete(self, ids):
+        if not all(_is_id(task_id) for task_id in ids):
+            return Response({
+                'error': 'ids must be a list of integers'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        with sharding.atomic():
+            deleted = bulk_delete_tasks(self.get_queryset(), set(ids))
+        return Response({
+            'deleted': len(deleted),
+            'results': [{'id': task_id, 'deleted': task_id in deleted} for task_id in ids]
+        })
@@ -10,7 +10,7 @@ This module provides real-time task statistics and analytics endpoints.
 from fastapi import FastAPI, HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, ForeignKey, func
+from sqlalchemy import create_engine, event, Boolean, Column, Index, Integer, String, Text, DateTime, ForeignKey, func
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from pydantic import BaseModel, Field
@@ -20,7 +20,24 @@ import jwt
 from jose import JWTError, jwt as jose_jwt
 from passlib.context import CryptContext
 import asyncio
+import logging
+import os
+import time
 from collections import defaultdict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from taskmanager_common import sqlite
+from taskmanager_common.queries import RESPONSE_HEADERS, QueryStats, report
+
+@asynccontextmanager
+async def lifespan(app):
+    """Run the periodic SQLite maintenance (see optimize_database) while the app serves."""
+    maintenance = None
+    if SQLITE_OPTIMIZE_INTERVAL > 0:
+        maintenance = asyncio.create_task(optimize_periodically(SQLITE_OPTIMIZE_INTERVAL))
+    yield
+    if maintenance:
+        maintenance.cancel()
 
 # FastAPI app initialization
 app = FastAPI(
@@ -28,7 +45,8 @@ app = FastAPI(
     description="Real-time task statistics and analytics API",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 # CORS middleware
@@ -38,14 +56,100 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=RESPONSE_HEADERS,
 )
 
 # Database configuration
 SQLALCHEMY_DATABASE_URL = "sqlite:///./analytics.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+SQLITE_BUSY_TIMEOUT = float(os.environ.get("SQLITE_BUSY_TIMEOUT", "15"))
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT},
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Pragmas run on every new connection, the profile shared with the other
+# services. In WAL mode the analytics reads do not block the writes
+# replicated from Django.
+SQLITE_PRAGMAS = sqlite.pragmas_from_env()
+# Seconds between two runs of optimize_database in each worker; 0 turns it off
+SQLITE_OPTIMIZE_INTERVAL = float(os.environ.get("SQLITE_OPTIMIZE_INTERVAL", "3600"))
+maintenance_logger = logging.getLogger("analytics.maintenance")
+
+@event.listens_for(engine, "connect")
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    sqlite.apply_pragmas(dbapi_connection, SQLITE_PRAGMAS)
+
+def optimize_database(checkpoint: str = "TRUNCATE"):
+    """Refresh the query planner statistics and checkpoint the WAL.
+
+    Returns SQLite's (busy, wal_pages, checkpointed); see
+    taskmanager_common.sqlite.optimize.
+    """
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        result = sqlite.optimize(cursor, checkpoint)
+        cursor.close()
+        connection.commit()
+    finally:
+        connection.close()
+    return result
+
+async def optimize_periodically(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            busy, wal_pages, checkpointed = await asyncio.to_thread(optimize_database)
+        except Exception:
+            maintenance_logger.exception("SQLite maintenance failed")
+        else:
+            maintenance_logger.info("SQLite maintenance: %d of %d WAL page(s) checkpointed%s",
+                                    checkpointed, wal_pages, ", busy" if busy else "")
+
+# Per-request query instrumentation: statement count, DB time and repeated
+# statement fingerprints, reported in response headers and a JSON log line.
+# A fingerprint run more than QUERY_N_PLUS_ONE_THRESHOLD times flags an N+1.
+QUERY_INSTRUMENTATION_ENABLED = os.environ.get("QUERY_INSTRUMENTATION", "1") == "1"
+QUERY_N_PLUS_ONE_THRESHOLD = int(os.environ.get("QUERY_N_PLUS_ONE_THRESHOLD", "5"))
+query_logger = logging.getLogger("analytics.queries")
+
+# The stats of the request being handled; sync dependencies run in the
+# threadpool with a copy of the request's context, so they see it too
+_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+@event.listens_for(engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _query_stats.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+@event.listens_for(engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _query_stats.get()
+    started = conn.info.get("query_started")
+    if stats is not None and started:
+        stats.record(statement, time.perf_counter() - started.pop())
+
+@app.middleware("http")
+async def instrument_queries(request, call_next):
+    """Report the queries each request runs."""
+    if not QUERY_INSTRUMENTATION_ENABLED:
+        return await call_next(request)
+
+    stats = QueryStats()
+    token = _query_stats.set(stats)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        _query_stats.reset(token)
+
+    headers = report(stats, QUERY_N_PLUS_ONE_THRESHOLD, query_logger, request.method, request.url.path,
+                     response.status_code, time.perf_counter() - started)
+    response.headers.update(headers)
+    return response
+
 # Security
 SECRET_KEY = "your-secret-key-change-in-production"
 ALGORITHM = "HS256"
@@ -75,9 +179,30 @@ class Task(Base):
     status = Column(String)
     due_date = Column(DateTime, nullable=True)
     completed_at = Column(DateTime, nullable=True)
+    # Replicated from Django, where the overdue scheduler maintains it
+    is_overdue = Column(Boolean, nullable=False, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (Index("ix_tasks_user_overdue", "user_id", "is_overdue"),)
+
+class ArchivedTask(Base):
+    """A task archived in Django, moved here from ``tasks`` by the replicator."""
+    __tablename__ = "tasks_archive"
+
+    id = Column(Integer, primary_key=True)
+    title = Column(String)
+    description = Column(Text)
+    user_id = Column(Integer, index=True)
+    priority = Column(String)
+    status = Column(String)
+    due_date = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    archived_at = Column(DateTime)
+
+
 class TaskAnalytics(Base):
     __tablename__ = "task_analytics"
     
@@ -89,8 +214,27 @@ class TaskAnalytics(Base):
     overdue_tasks = Column(Integer, default=0)
     productivity_score = Column(Integer, default=0)
 
+# Columns added to tables after they were first created. create_all() only
+# creates missing tables, so these are added to existing databases on startup.
+ADDED_COLUMNS = {
+    "tasks": {"is_overdue": "BOOLEAN NOT NULL DEFAULT 0"},
+}
+
+def upgrade_tables():
+    """Add the ADDED_COLUMNS an existing database lacks, and their indexes."""
+    with engine.begin() as conn:
+        for table, columns in ADDED_COLUMNS.items():
+            existing = {row[1] for row in conn.exec_driver_sql(f'PRAGMA table_info("{table}")')}
+            for name, definition in columns.items():
+                if name not in existing:
+                    conn.exec_driver_sql(f'ALTER TABLE "{table}" ADD COLUMN "{name}" {definition}')
+        for table in ADDED_COLUMNS:
+            for index in Base.metadata.tables[table].indexes:
+                index.create(conn, checkfirst=True)
+
 # Create tables
 Base.metadata.create_all(bind=engine)
+upgrade_tables()
 
 # Pydantic Models
 class UserBase(BaseModel):
@@ -100,7 +244,7 @@ class UserBase(BaseModel):
 class UserCreate(UserBase):
     password: str
 
-class User(UserBase):
+class UserResponse(UserBase):
     id: int
     created_at: datetime
     
@@ -117,7 +261,7 @@ class TaskBase(BaseModel):
 class TaskCreate(TaskBase):
     pass
 
-class Task(TaskBase):
+class TaskResponse(TaskBase):
     id: int
     user_id: int
     completed_at: Optional[datetime] = None
@@ -153,6 +297,20 @@ def get_db():
     finally:
         db.close()
 
+def get_user_tasks(db: Session, user_id: int, include_archived: bool = False):
+    """Load a user's tasks, and their archived tasks too with ``include_archived``."""
+    tasks = db.query(Task).filter(Task.user_id == user_id).all()
+    if include_archived:
+        tasks += db.query(ArchivedTask).filter(ArchivedTask.user_id == user_id).all()
+    return tasks
+
+def count_overdue(db: Session, user_id: int) -> int:
+    """Count a user's overdue tasks with one query on the (user_id, is_overdue) index.
+
+    Archived tasks are closed, so they are never overdue.
+    """
+    return db.query(func.count(Task.id)).filter_by(user_id=user_id, is_overdue=True).scalar()
+
 # Security functions
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -178,7 +336,7 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
         raise HTTPException(status_code=401, detail="Invalid token")
 
 # API Endpoints
-@app.post("/api/auth/register", response_model=User)
+@app.post("/api/auth/register", response_model=UserResponse)
 async def register(user: UserCreate, db: Session = Depends(get_db)):
     """Register a new user."""
     db_user = db.query(User).filter(User.username == user.username).first()
@@ -204,6 +362,7 @@ async def login(username: str, password: str, db: Session = Depends(get_db)):
 
 @app.get("/api/analytics/overview", response_model=AnalyticsResponse)
 async def get_analytics_overview(
+    include_archived: bool = False,
     username: str = Depends(verify_token),
     db: Session = Depends(get_db)
 ):
@@ -213,12 +372,12 @@ async def get_analytics_overview(
         raise HTTPException(status_code=404, detail="User not found")
     
     # Get all tasks for the user
-    tasks = db.query(Task).filter(Task.user_id == user.id).all()
+    tasks = get_user_tasks(db, user.id, include_archived)
     
     # Calculate basic metrics
     total_tasks = len(tasks)
     completed_tasks = len([t for t in tasks if t.status == "done"])
-    overdue_tasks = len([t for t in tasks if t.due_date and t.due_date < datetime.utcnow() and t.status != "done"])
+    overdue_tasks = count_overdue(db, user.id)
     
     # Calculate productivity score
     if total_tasks > 0:
@@ -293,6 +452,7 @@ async def get_analytics_overview(
 
 @app.get("/api/analytics/realtime", response_model=RealTimeStats)
 async def get_realtime_stats(
+    include_archived: bool = False,
     username: str = Depends(verify_token),
     db: Session = Depends(get_db)
 ):
@@ -302,7 +462,7 @@ async def get_realtime_stats(
         raise HTTPException(status_code=404, detail="User not found")
     
     # Get current tasks
-    tasks = db.query(Task).filter(Task.user_id == user.id).all()
+    tasks = get_user_tasks(db, user.id, include_archived)
     
     # Active tasks (not completed or cancelled)
     active_tasks = len([t for t in tasks if t.status not in ["done", "cancelled"]])
@@ -315,10 +475,7 @@ async def get_realtime_stats(
     ])
     
     # Overdue tasks
-    overdue_tasks = len([
-        t for t in tasks 
-        if t.due_date and t.due_date < datetime.utcnow() and t.status != "done"
-    ])
+    overdue_tasks = count_overdue(db, user.id)
     
     # Average completion time
     completed_tasks = [t for t in tasks if t.completed_at]
@@ -344,6 +501,7 @@ async def get_realtime_stats(
 
 @app.get("/api/analytics/performance")
 async def get_performance_metrics(
+    include_archived: bool = False,
     username: str = Depends(verify_token),
     db: Session = Depends(get_db)
 ):
@@ -352,7 +510,7 @@ async def get_performance_metrics(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    tasks = db.query(Task).filter(Task.user_id == user.id).all()
+    tasks = get_user_tasks(db, user.id, include_archived)
     
     # Calculate various performance metrics
     metrics = {
@@ -394,6 +552,7 @@ async def get_performance_metrics(
 
 @app.get("/api/analytics/insights")
 async def get_insights(
+    include_archived: bool = False,
     username: str = Depends(verify_token),
     db: Session = Depends(get_db)
 ):
@@ -402,7 +561,7 @@ async def get_insights(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    tasks = db.query(Task).filter(Task.user_id == user.id).all()
+    tasks = get_user_tasks(db, user.id, include_archived)
     
     insights = {
         "recommendations": [],
@@ -413,11 +572,11 @@ async def get_insights(
     # Analyze patterns and generate insights
     if tasks:
         # Overdue tasks analysis
-        overdue_tasks = [t for t in tasks if t.due_date and t.due_date < datetime.utcnow() and t.status != "done"]
+        overdue_tasks = count_overdue(db, user.id)
         if overdue_tasks:
             insights["recommendations"].append({
                 "type": "warning",
-                "message": f"You have {len(overdue_tasks)} overdue tasks. Consider reviewing your priorities."
+                "message": f"You have {overdue_tasks} overdue tasks. Consider reviewing your priorities."
             })
         
         # Completion rate analysis
@@ -7,28 +7,24 @@ Email: eonhimanshu@gmail.com
 This module provides task categories and filtering functionality.
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, current_app
 from flask_sqlalchemy import SQLAlchemy
 from flask_restful import Api, Resource
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, jwt_required, create_access_token, get_jwt_identity
+from collections import Counter
 from datetime import datetime, timedelta
+import click
 import os
+import weakref
 
-# Initialize Flask app
-app = Flask(__name__)
+import instrumentation
+import sqlite_profile
 
-# Configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///tasks.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['JWT_SECRET_KEY'] = 'your-secret-key-change-in-production'
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=1)
-
-# Initialize extensions
-db = SQLAlchemy(app)
-api = Api(app)
-CORS(app)
-jwt = JWTManager(app)
+# Extensions are bound to an application in create_app()
+db = SQLAlchemy()
+cors = CORS()
+jwt = JWTManager()
 
 # Models
 class User(db.Model):
@@ -67,15 +63,21 @@ class Task(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     category_id = db.Column(db.Integer, db.ForeignKey('task_category.id'))
     priority = db.Column(db.String(10), default='medium')
     status = db.Column(db.String(15), default='todo')
     due_date = db.Column(db.DateTime)
     completed_at = db.Column(db.DateTime)
+    # Replicated from Django, where the overdue scheduler maintains it
+    is_overdue = db.Column(db.Boolean, nullable=False, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_task_user_overdue', 'user_id', 'is_overdue'),
+    )
+
     # Relationships
     user = db.relationship('User', backref=db.backref('tasks', lazy=True))
     category = db.relationship('TaskCategory', backref=db.backref('tasks', lazy=True))
@@ -92,10 +94,29 @@ class Task(db.Model):
             'status': self.status,
             'due_date': self.due_date.isoformat() if self.due_date else None,
             'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'is_overdue': self.is_overdue,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         }
 
+class ArchivedTask(db.Model):
+    """A task archived in the Django API, moved here from ``task`` by the replicator.
+
+    Categories belong to live tasks only, so archived tasks have none.
+    """
+    __tablename__ = 'task_archive'
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(200))
+    description = db.Column(db.Text)
+    user_id = db.Column(db.Integer, index=True)
+    priority = db.Column(db.String(10))
+    status = db.Column(db.String(15))
+    due_date = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime)
+
 # API Resources
 class CategoryResource(Resource):
     """Resource for task categories."""
@@ -153,60 +174,74 @@ class CategoryResource(Resource):
         db.session.commit()
         return '', 204
 
+def filter_tasks(query, params):
+    """Apply the task filter parameters to a query.
+
+    ``params`` is any mapping with a ``get`` method, so both the query string
+    of the filter endpoint and the JSON body of the bulk endpoint can be used.
+    Raises ``ValueError`` with a client-facing message on invalid input.
+    """
+    # Filter by category
+    category_id = params.get('category_id')
+    if category_id:
+        query = query.filter_by(category_id=category_id)
+
+    # Filter by status
+    status = params.get('status')
+    if status:
+        query = query.filter_by(status=status)
+
+    # Filter by priority
+    priority = params.get('priority')
+    if priority:
+        query = query.filter_by(priority=priority)
+
+    # Filter by date range
+    start_date = params.get('start_date')
+    end_date = params.get('end_date')
+
+    if start_date:
+        try:
+            start_date = datetime.fromisoformat(start_date)
+        except (TypeError, ValueError):
+            raise ValueError('Invalid start_date format')
+        query = query.filter(Task.created_at >= start_date)
+
+    if end_date:
+        try:
+            end_date = datetime.fromisoformat(end_date)
+        except (TypeError, ValueError):
+            raise ValueError('Invalid end_date format')
+        query = query.filter(Task.created_at <= end_date)
+
+    # Search by title or description
+    search = params.get('search')
+    if search:
+        query = query.filter(
+            db.or_(
+                Task.title.ilike(f'%{search}%'),
+                Task.description.ilike(f'%{search}%')
+            )
+        )
+
+    return query
+
 class TaskFilterResource(Resource):
     """Resource for task filtering."""
-    
+
     @jwt_required()
     def get(self):
         """Filter tasks by various criteria."""
         user_id = get_jwt_identity()
-        
+
         # Base query
         query = Task.query.filter_by(user_id=user_id)
-        
-        # Filter by category
-        category_id = request.args.get('category_id')
-        if category_id:
-            query = query.filter_by(category_id=category_id)
-        
-        # Filter by status
-        status = request.args.get('status')
-        if status:
-            query = query.filter_by(status=status)
-        
-        # Filter by priority
-        priority = request.args.get('priority')
-        if priority:
-            query = query.filter_by(priority=priority)
-        
-        # Filter by date range
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
-        
-        if start_date:
-            try:
-                start_date = datetime.fromisoformat(start_date)
-                query = query.filter(Task.created_at >= start_date)
-            except ValueError:
-                return {'error': 'Invalid start_date format'}, 400
-        
-        if end_date:
-            try:
-                end_date = datetime.fromisoformat(end_date)
-                query = query.filter(Task.created_at <= end_date)
-            except ValueError:
-                return {'error': 'Invalid end_date format'}, 400
-        
-        # Search by title or description
-        search = request.args.get('search')
-        if search:
-            query = query.filter(
-                db.or_(
-                    Task.title.ilike(f'%{search}%'),
-                    Task.description.ilike(f'%{search}%')
-                )
-            )
-        
+
+        try:
+            query = filter_tasks(query, request.args)
+        except ValueError as e:
+            return {'error': str(e)}, 400
+
         # Sort by
         sort_by = request.args.get('sort_by', 'created_at')
         sort_order = request.args.get('sort_order', 'desc')
@@ -235,88 +270,257 @@ class TaskFilterResource(Resource):
             }
         }
 
+class TaskBulkResource(Resource):
+    """Resource for bulk task updates.
+
+    Tasks are replicated from the Django API, which owns them: a change made
+    here to a replicated column would be overwritten by the next replicated
+    write and never reach Django. Only the columns this service owns can be
+    patched; titles, priorities, statuses and due dates are changed through
+    Django's ``PATCH /api/tasks/bulk/``.
+    """
+
+    # Task columns owned by this service and left alone by replication
+    PATCHABLE_FIELDS = ('category_id',)
+    REPLICATED_FIELDS = ('title', 'description', 'priority', 'status', 'due_date', 'completed_at')
+
+    @jwt_required()
+    def patch(self):
+        """Apply a patch to many tasks with set-based UPDATE statements.
+
+        The body selects tasks either by ``ids`` or by ``filter`` (the same
+        parameters ``/api/tasks/filter`` accepts) and carries the ``patch``
+        to apply. All statements run in one transaction.
+        """
+        user_id = get_jwt_identity()
+        data = request.get_json(silent=True) or {}
+
+        ids = data.get('ids')
+        filters = data.get('filter')
+        if (ids is None) == (filters is None):
+            return {'error': 'Provide exactly one of ids or filter'}, 400
+        if ids is not None and (not isinstance(ids, list)
+                                or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids)):
+            return {'error': 'ids must be a list of integers'}, 400
+        if filters is not None and not isinstance(filters, dict):
+            return {'error': 'filter must be an object'}, 400
+
+        try:
+            values = self._build_values(data.get('patch'))
+        except ValueError as e:
+            return {'error': str(e)}, 400
+
+        base_query = Task.query.filter_by(user_id=user_id)
+        if filters is not None:
+            try:
+                queries = [filter_tasks(base_query, filters)]
+            except ValueError as e:
+                return {'error': str(e)}, 400
+        else:
+            ids = sorted(set(ids))
+            chunk_size = current_app.config['BULK_ID_CHUNK_SIZE']
+            queries = [
+                base_query.filter(Task.id.in_(ids[i:i + chunk_size]))
+                for i in range(0, len(ids), chunk_size)
+            ]
+
+        updated = 0
+        try:
+            for query in queries:
+                updated += query.update(values, synchronize_session=False)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        result = {'updated': updated}
+        if ids is not None:
+            result['requested'] = len(ids)
+            result['not_found'] = len(ids) - updated
+        return result
+
+    def _build_values(self, patch):
+        """Validate a patch and turn it into UPDATE column values."""
+        if not isinstance(patch, dict) or not patch:
+            raise ValueError('patch must be a non-empty object')
+
+        replicated = set(patch) & set(self.REPLICATED_FIELDS)
+        if replicated:
+            raise ValueError(f"{', '.join(sorted(replicated))} can only be changed through the Django API "
+                             f"(PATCH /api/tasks/bulk/)")
+        unknown = set(patch) - set(self.PATCHABLE_FIELDS)
+        if unknown:
+            raise ValueError(f"Unsupported patch fields: {', '.join(sorted(unknown))}")
+
+        values = {}
+
+        if 'category_id' in patch:
+            category_id = patch['category_id']
+            if category_id is not None and not db.session.get(TaskCategory, category_id):
+                raise ValueError('Invalid category_id')
+            values[Task.category_id] = category_id
+
+        return values
+
 class TaskStatsResource(Resource):
     """Resource for task statistics."""
     
     @jwt_required()
     def get(self):
-        """Get task statistics for the current user."""
+        """Get task statistics for the current user.
+
+        Tasks archived in the Django API are counted too with
+        ``?include_archived=true``, except in the category distribution.
+        """
         user_id = get_jwt_identity()
-        
-        # Total tasks
-        total_tasks = Task.query.filter_by(user_id=user_id).count()
-        
-        # Tasks by status
-        status_stats = db.session.query(
-            Task.status, db.func.count(Task.id)
-        ).filter_by(user_id=user_id).group_by(Task.status).all()
-        
-        # Tasks by priority
-        priority_stats = db.session.query(
-            Task.priority, db.func.count(Task.id)
-        ).filter_by(user_id=user_id).group_by(Task.priority).all()
+        include_archived = request.args.get('include_archived', '').lower() in ('1', 'true', 'yes')
+        models = (Task, ArchivedTask) if include_archived else (Task,)
+        week_ago = datetime.utcnow() - timedelta(days=7)
+
+        total_tasks = 0
+        status_distribution = Counter()
+        priority_distribution = Counter()
+        completed_this_week = 0
+        for model in models:
+            # Total tasks
+            total_tasks += model.query.filter_by(user_id=user_id).count()
+
+            # Tasks by status
+            status_distribution.update(dict(db.session.query(
+                model.status, db.func.count(model.id)
+            ).filter_by(user_id=user_id).group_by(model.status).all()))
+
+            # Tasks by priority
+            priority_distribution.update(dict(db.session.query(
+                model.priority, db.func.count(model.id)
+            ).filter_by(user_id=user_id).group_by(model.priority).all()))
+
+            # Completed tasks this week
+            completed_this_week += model.query.filter(
+                model.user_id == user_id,
+                model.completed_at >= week_ago
+            ).count()
         
         # Tasks by category
         category_stats = db.session.query(
             TaskCategory.name, db.func.count(Task.id)
         ).join(Task).filter_by(user_id=user_id).group_by(TaskCategory.name).all()
         
-        # Completed tasks this week
-        week_ago = datetime.utcnow() - timedelta(days=7)
-        completed_this_week = Task.query.filter(
-            Task.user_id == user_id,
-            Task.completed_at >= week_ago
-        ).count()
-        
-        # Overdue tasks
-        overdue_tasks = Task.query.filter(
-            Task.user_id == user_id,
-            Task.due_date < datetime.utcnow(),
-            Task.status != 'done'
-        ).count()
+        # Overdue tasks (archived tasks are closed, so never overdue)
+        overdue_tasks = Task.query.filter_by(user_id=user_id, is_overdue=True).count()
         
         return {
             'total_tasks': total_tasks,
-            'status_distribution': dict(status_stats),
-            'priority_distribution': dict(priority_stats),
+            'status_distribution': dict(status_distribution),
+            'priority_distribution': dict(priority_distribution),
             'category_distribution': dict(category_stats),
             'completed_this_week': completed_this_week,
             'overdue_tasks': overdue_tasks
         }
 
-# Register API resources
-api.add_resource(CategoryResource, '/api/categories', '/api/categories/<int:category_id>')
-api.add_resource(TaskFilterResource, '/api/tasks/filter')
-api.add_resource(TaskStatsResource, '/api/tasks/stats')
+DEFAULT_CATEGORIES = [
+    {'name': 'Work', 'description': 'Work-related tasks', 'color': '#dc3545'},
+    {'name': 'Personal', 'description': 'Personal tasks', 'color': '#28a745'},
+    {'name': 'Shopping', 'description': 'Shopping tasks', 'color': '#ffc107'},
+    {'name': 'Health', 'description': 'Health and fitness tasks', 'color': '#17a2b8'},
+    {'name': 'Learning', 'description': 'Learning and education tasks', 'color': '#6f42c1'},
+]
 
-# Error handlers
-@app.errorhandler(404)
-def not_found(error):
-    return jsonify({'error': 'Resource not found'}), 404
+# Columns added to tables after they were first created. create_all() only
+# creates missing tables, so init-db adds these to existing databases.
+ADDED_COLUMNS = {
+    'task': {'is_overdue': 'BOOLEAN NOT NULL DEFAULT 0'},
+}
 
-@app.errorhandler(500)
-def internal_error(error):
-    return jsonify({'error': 'Internal server error'}), 500
+def upgrade_tables():
+    """Add the ADDED_COLUMNS an existing database lacks, and their indexes."""
+    with db.engine.begin() as conn:
+        for table, columns in ADDED_COLUMNS.items():
+            existing = {row[1] for row in conn.exec_driver_sql(f'PRAGMA table_info("{table}")')}
+            for name, definition in columns.items():
+                if name not in existing:
+                    conn.exec_driver_sql(f'ALTER TABLE "{table}" ADD COLUMN "{name}" {definition}')
+        for table in ADDED_COLUMNS:
+            for index in db.metadata.tables[table].indexes:
+                index.create(conn, checkfirst=True)
 
-# Create database tables
-with app.app_context():
+def init_db():
+    """Create database tables and default categories if they don't exist."""
     db.create_all()
-    
-    # Create default categories if they don't exist
-    default_categories = [
-        {'name': 'Work', 'description': 'Work-related tasks', 'color': '#dc3545'},
-        {'name': 'Personal', 'description': 'Personal tasks', 'color': '#28a745'},
-        {'name': 'Shopping', 'description': 'Shopping tasks', 'color': '#ffc107'},
-        {'name': 'Health', 'description': 'Health and fitness tasks', 'color': '#17a2b8'},
-        {'name': 'Learning', 'description': 'Learning and education tasks', 'color': '#6f42c1'},
-    ]
-    
-    for cat_data in default_categories:
+    upgrade_tables()
+
+    for cat_data in DEFAULT_CATEGORIES:
         if not TaskCategory.query.filter_by(name=cat_data['name']).first():
             category = TaskCategory(**cat_data)
             db.session.add(category)
-    
+
     db.session.commit()
 
+@click.command('init-db')
+def init_db_command():
+    """Create tables and seed data. Run once per deploy, before the workers start."""
+    init_db()
+    click.echo('Initialized the database.')
+
+# Apps created in this process, whose pools are dropped in forked children
+_apps = weakref.WeakSet()
+
+def _dispose_engines_after_fork():
+    """Drop pooled connections inherited from the parent process.
+
+    Pre-fork servers may fork after the engine has been created (for example
+    with ``--preload``). SQLite connections must not be shared across
+    processes, so each child starts with an empty pool and connects lazily.
+    """
+    for app in list(_apps):
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
+
+# Registered once: fork hooks cannot be removed, so one per create_app()
+# call would pile up and keep every app ever created alive
+os.register_at_fork(after_in_child=_dispose_engines_after_fork)
+
+def create_app(config_object=None):
+    """Application factory.
+
+    No database work happens here: tables and seed data are created by the
+    ``flask init-db`` command, and connections are opened on first use in
+    each worker process.
+    """
+    app = Flask(__name__)
+    app.config.from_object(config_object or os.environ.get('FLASK_CONFIG', 'config.Config'))
+
+    # Initialize extensions
+    db.init_app(app)
+    sqlite_profile.init_app(app, db)
+    cors.init_app(app)
+    jwt.init_app(app)
+    instrumentation.init_app(app)
+    _apps.add(app)
+
+    # Register API resources
+    api = Api(app)
+    api.add_resource(CategoryResource, '/api/categories', '/api/categories/<int:category_id>')
+    api.add_resource(TaskFilterResource, '/api/tasks/filter')
+    api.add_resource(TaskBulkResource, '/api/tasks/bulk')
+    api.add_resource(TaskStatsResource, '/api/tasks/stats')
+
+    # Error handlers
+    @app.errorhandler(404)
+    def not_found(error):
+        return jsonify({'error': 'Resource not found'}), 404
+
+    @app.errorhandler(500)
+    def internal_error(error):
+        return jsonify({'error': 'Internal server error'}), 500
+
+    app.cli.add_command(init_db_command)
+
+    return app
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000) 
\ No newline at end of file
+    app = create_app('config.DevelopmentConfig')
+    with app.app_context():
+        init_db()
+    app.run(host='0.0.0.0', port=5000)
@@ -0,0 +1,73 @@
+"""
+Configuration for the Flask RESTful API
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+
+Settings are read from the environment so the same image can run in
+development and behind a pre-fork server in production.
+"""
+
+import os
+from datetime import timedelta
+from taskmanager_common.queries import RESPONSE_HEADERS
+from taskmanager_common.sqlite import pragmas_from_env
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def _env_bool(name, default):
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes')
+
+
+class Config:
+    """Default configuration."""
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///tasks.db')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Connection pool settings, applied per worker process. Engines and pools
+    # are created in each worker and no connection is opened until first use.
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': _env_int('DB_POOL_SIZE', 5),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 5),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 10),
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True),
+        # sqlite3 waits this many seconds for a lock before raising
+        'connect_args': {'timeout': _env_int('DB_BUSY_TIMEOUT', 15)},
+    }
+
+    # Pragmas run on every new SQLite connection (sqlite_profile.py), the
+    # profile shared with the other services. In WAL mode readers do not block
+    # the replicator's writes; pooled connections keep their cache between
+    # requests.
+    SQLITE_PRAGMAS = pragmas_from_env()
+
+    JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'your-secret-key-change-in-production')
+    JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
+    # Let Flask-JWT-Extended's handlers answer auth errors with 401 instead of
+    # Flask-RESTful turning them into 500s when not running in debug mode
+    PROPAGATE_EXCEPTIONS = True
+
+    # Keeps IN (...) lists of the bulk endpoint below SQLite's bound-parameter limit
+    BULK_ID_CHUNK_SIZE = 500
+
+    # Per-request query count and timing (instrumentation.py). A request that
+    # runs the same statement more than the threshold is flagged as an N+1.
+    QUERY_INSTRUMENTATION_ENABLED = _env_bool('QUERY_INSTRUMENTATION', True)
+    QUERY_N_PLUS_ONE_THRESHOLD = _env_int('QUERY_N_PLUS_ONE_THRESHOLD', 5)
+    CORS_EXPOSE_HEADERS = RESPONSE_HEADERS
+
+
+class DevelopmentConfig(Config):
+    """Configuration for local development with ``python app.py``."""
+    DEBUG = True
+
+
+class TestingConfig(Config):
+    """Configuration for tests, using an in-memory database."""
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SQLALCHEMY_ENGINE_OPTIONS = {}
@@ -0,0 +1,24 @@
+# Gunicorn configuration for the Flask RESTful API
+#
+# Author: Eon (Himanshu Shekhar)
+# Email: eonhimanshu@gmail.com
+#
+# Run with: gunicorn -c gunicorn.conf.py "app:create_app()"
+# Schema and seed data are created beforehand with `flask --app app init-db`.
+
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Each worker imports the app and builds its own engine after fork, so no
+# connection pool state is ever shared between processes.
+preload_app = False
+
+accesslog = '-'
+errorlog = '-'
@@ -0,0 +1,64 @@
+"""
+Per-request database query instrumentation for the Flask RESTful API
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+
+Counts and times the SQL statements each request runs through SQLAlchemy
+cursor events. The fingerprints, N+1 detection
+(``QUERY_N_PLUS_ONE_THRESHOLD``), response headers and JSON log line, on
+the ``<app>.queries`` logger, are those of ``taskmanager_common.queries``,
+shared with the other services.
+"""
+
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from taskmanager_common.queries import QueryStats, report
+
+
+def _current_stats():
+    return g.get('query_stats') if has_request_context() else None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats() is not None:
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats()
+    started = conn.info.get('query_started')
+    if stats is not None and started:
+        stats.record(statement, time.perf_counter() - started.pop())
+
+
+def init_app(app):
+    """Instrument every request of ``app`` unless QUERY_INSTRUMENTATION_ENABLED is off."""
+    if not app.config.get('QUERY_INSTRUMENTATION_ENABLED', True):
+        return
+    threshold = app.config.get('QUERY_N_PLUS_ONE_THRESHOLD', 5)
+    logger = app.logger.getChild('queries')
+
+    # Listening on the Engine class covers every engine; statements are only
+    # recorded while a request of an instrumented app is active
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def start_query_stats():
+        g.query_stats = QueryStats()
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def report_query_stats(response):
+        stats = g.pop('query_stats', None)
+        if stats is None:
+            return response
+        elapsed = time.perf_counter() - g.request_started
+        headers = report(stats, threshold, logger, request.method, request.path, response.status_code, elapsed)
+        response.headers.update(headers)
+        return response
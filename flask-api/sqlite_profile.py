@@ -0,0 +1,65 @@
+"""
+SQLite connection profile and maintenance for the Flask RESTful API
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+
+Runs the ``SQLITE_PRAGMAS`` of the app config, the shared profile of
+``taskmanager_common.sqlite``, on every new connection of its SQLite
+engines, and adds the ``optimize-db`` command, which refreshes the query
+planner statistics and checkpoints the WAL. Run it periodically, e.g.
+hourly from cron:
+
+    flask --app app optimize-db
+"""
+
+import click
+from sqlalchemy import event
+from taskmanager_common import sqlite
+from taskmanager_common.sqlite import CHECKPOINT_MODES
+
+
+def _sqlite_engines(db):
+    return [engine for engine in db.engines.values() if engine.dialect.name == 'sqlite']
+
+
+def init_app(app, db):
+    """Apply ``SQLITE_PRAGMAS`` to the connections of ``db`` and register ``optimize-db``."""
+    pragmas = app.config.get('SQLITE_PRAGMAS') or {}
+
+    def apply_pragmas(dbapi_connection, connection_record):
+        sqlite.apply_pragmas(dbapi_connection, pragmas)
+
+    # Creating the engines opens no connection; listeners stay with an
+    # engine's pool when it is disposed after fork
+    with app.app_context():
+        for engine in _sqlite_engines(db):
+            if pragmas:
+                event.listen(engine, 'connect', apply_pragmas)
+
+    @app.cli.command('optimize-db')
+    @click.option('--checkpoint', type=click.Choice(CHECKPOINT_MODES), default='TRUNCATE',
+                  help='WAL checkpoint mode.')
+    def optimize_db_command(checkpoint):
+        """Update the query planner statistics and checkpoint the WAL."""
+        for engine in _sqlite_engines(db):
+            busy, wal_pages, checkpointed = optimize(engine, checkpoint)
+            wal = 'no WAL' if wal_pages < 0 else f'{checkpointed} of {wal_pages} WAL page(s) checkpointed'
+            click.echo(f'{engine.url.database}: statistics updated, {wal}{", busy" if busy else ""}.')
+
+
+def optimize(engine, checkpoint='TRUNCATE'):
+    """Refresh the planner statistics of ``engine``'s database and checkpoint its WAL.
+
+    Returns SQLite's ``(busy, wal_pages, checkpointed)``; the page counts are
+    -1 without WAL.
+    """
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        result = sqlite.optimize(cursor, checkpoint)
+        cursor.close()
+        connection.commit()
+    finally:
+        connection.close()
+    return result
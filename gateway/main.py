@@ -0,0 +1,187 @@
+"""
+Dashboard Gateway for Task Management Application
+
+Author: Eon (Himanshu Shekhar)
+Email: eonhimanshu@gmail.com
+
+This module serves GET /api/dashboard, which fetches everything the dashboard
+shows from the Django, Flask and FastAPI services at once and returns it as a
+single response. The calls run concurrently, so the response takes as long
+as the slowest service rather than the sum of them. They go over one pool of
+keep-alive connections per service.
+
+Each service gets its own timeout. A section whose service fails or is too
+slow comes back as null, with the reason under "errors"; the others are
+returned as usual.
+"""
+
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+import asyncio
+import httpx
+import logging
+import os
+import time
+
+logger = logging.getLogger("gateway")
+
+@dataclass
+class Backend:
+    """One upstream API: its base URL, timeout and connection pool."""
+    name: str
+    url: str
+    timeout: float
+    client: httpx.AsyncClient = field(default=None, repr=False)
+
+def _backend(name, default_url, default_timeout):
+    prefix = name.upper()
+    return Backend(
+        name=name,
+        url=os.environ.get(f"{prefix}_API_URL", default_url).rstrip("/"),
+        timeout=float(os.environ.get(f"{prefix}_TIMEOUT", default_timeout)),
+    )
+
+# Upstream services; each one's URL and timeout in seconds come from the
+# environment, e.g. DJANGO_API_URL and DJANGO_TIMEOUT
+BACKENDS = {
+    backend.name: backend
+    for backend in (
+        _backend("django", "http://django-api:8000/api", "2"),
+        _backend("flask", "http://flask-api:5000/api", "2"),
+        _backend("fastapi", "http://fastapi-api:8000/api", "3"),
+    )
+}
+
+# Connections kept open to each service, shared by all requests of a worker
+POOL_SIZE = int(os.environ.get("GATEWAY_POOL_SIZE", "20"))
+KEEPALIVE_EXPIRY = float(os.environ.get("GATEWAY_KEEPALIVE_EXPIRY", "30"))
+
+# The dashboard's sections: the service each one comes from, its path and
+# query parameters
+SECTIONS = {
+    "profile": ("django", "/users/profile/", {}),
+    "recent_tasks": ("django", "/tasks/", {"page_size": 5}),
+    "task_stats": ("flask", "/tasks/stats", {}),
+    "categories": ("flask", "/categories", {}),
+    "realtime": ("fastapi", "/analytics/realtime", {}),
+    "overview": ("fastapi", "/analytics/overview", {}),
+}
+
+@asynccontextmanager
+async def lifespan(app):
+    """Open a connection pool per backend for the life of the worker."""
+    limits = httpx.Limits(
+        max_connections=POOL_SIZE,
+        max_keepalive_connections=POOL_SIZE,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+    for backend in BACKENDS.values():
+        backend.client = httpx.AsyncClient(base_url=backend.url, limits=limits, timeout=backend.timeout)
+    yield
+    await asyncio.gather(*(backend.client.aclose() for backend in BACKENDS.values()))
+
+# FastAPI app initialization
+app = FastAPI(
+    title="Task Management Dashboard Gateway",
+    description="Fetches the dashboard's data from all three APIs in one request",
+    version="1.0.0",
+    docs_url="/docs",
+    redoc_url="/redoc",
+    lifespan=lifespan,
+)
+
+# CORS middleware
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["http://localhost:3000", "http://127.0.0.1:3000", "http://localhost:5173"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=["Server-Timing"],
+)
+
+class SectionError(Exception):
+    def __init__(self, status, detail):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+def _authorization(request: Request, backend: Backend):
+    # The services sign their tokens with different keys, so a client can
+    # pass one per service; otherwise Authorization goes to all of them
+    return (request.headers.get(f"X-{backend.name.capitalize()}-Authorization")
+            or request.headers.get("Authorization"))
+
+async def fetch_section(request: Request, name: str):
+    """Fetch one section; return its data and the time it took in ms."""
+    backend_name, path, params = SECTIONS[name]
+    backend = BACKENDS[backend_name]
+    headers = {}
+    authorization = _authorization(request, backend)
+    if authorization:
+        headers["Authorization"] = authorization
+    started = time.perf_counter()
+    try:
+        # Bounds the whole call, including the wait for a pooled connection
+        response = await asyncio.wait_for(
+            backend.client.get(path, params=params, headers=headers), backend.timeout)
+    except asyncio.TimeoutError:
+        raise SectionError(504, f"{backend.name} did not answer within {backend.timeout:g}s")
+    except httpx.HTTPError as exc:
+        raise SectionError(502, f"{backend.name} is unavailable: {exc.__class__.__name__}")
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if response.status_code >= 400:
+        raise SectionError(response.status_code, f"{backend.name} answered {response.status_code}")
+    try:
+        return response.json(), elapsed_ms
+    except ValueError:
+        raise SectionError(502, f"{backend.name} sent invalid JSON")
+
+@app.get("/api/dashboard")
+async def dashboard(request: Request, sections: str = ""):
+    """Everything the dashboard shows, fetched from the three APIs concurrently.
+
+    ``sections`` is a comma-separated subset of the sections to fetch. The
+    response has each section's data, or null and an entry in "errors" for
+    those that failed. It is 200 when at least one section succeeded;
+    otherwise it carries the failure's status when all agree (e.g. 401),
+    or 502.
+    """
+    names = [name for name in sections.split(",") if name] or list(SECTIONS)
+    unknown = [name for name in names if name not in SECTIONS]
+    if unknown:
+        return JSONResponse({"detail": f"Unknown section(s): {', '.join(unknown)}"}, status_code=400)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(fetch_section(request, name) for name in names), return_exceptions=True)
+    body, errors, timings = {}, {}, []
+    for name, result in zip(names, results):
+        if isinstance(result, SectionError):
+            body[name] = None
+            errors[name] = {"backend": SECTIONS[name][0], "status": result.status, "detail": result.detail}
+            logger.warning("Dashboard section %s failed: %s", name, result.detail)
+        elif isinstance(result, BaseException):
+            raise result
+        else:
+            body[name], elapsed_ms = result
+            timings.append(f"{name};dur={elapsed_ms:.1f}")
+    body["errors"] = errors
+    timings.append(f"total;dur={(time.perf_counter() - started) * 1000:.1f}")
+
+    status_code = 200
+    if len(errors) == len(names):
+        statuses = {error["status"] for error in errors.values()}
+        status_code = statuses.pop() if len(statuses) == 1 else 502
+    return JSONResponse(body, status_code=status_code, headers={"Server-Timing": ", ".join(timings)})
+
+@app.get("/health")
+async def health():
+    """Health check endpoint."""
+    return {"status": "healthy"}
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8002)
@@ -49,10 +49,18 @@ export interface Task {
   status: 'todo' | 'in_progress' | 'review' | 'done' | 'cancelled';
   due_date?: string;
   completed_at?: string;
+  is_overdue: boolean;
   created_at: string;
   updated_at: string;
 }
 
+export interface TaskChanges {
+  tasks: Task[];
+  deleted: number[];
+  cursor: string;
+  more: boolean;
+}
+
 export interface TaskCategory {
   id: number;
   name: string;
@@ -101,6 +109,13 @@ class TaskService {
     return response.data.results || response.data;
   }
 
+  // Tasks changed and deleted since the cursor of the previous call; without
+  // a cursor every task is returned. Keep calling while `more` is true.
+  async getTaskChanges(cursor?: string): Promise<TaskChanges> {
+    const response = await djangoApi.get('/tasks/changes/', { params: cursor ? { cursor } : {} });
+    return response.data;
+  }
+
   async getTask(id: number): Promise<Task> {
     const response = await djangoApi.get(`/tasks/${id}/`);
     return response.data;
@@ -132,17 +147,17 @@ class TaskService {
 
   async searchTasks(query: string): Promise<Task[]> {
     const response = await djangoApi.get(`/tasks/search/?q=${encodeURIComponent(query)}`);
-    return response.data;
+    return response.data.results;
   }
 
   async getTasksByStatus(status: string): Promise<Task[]> {
     const response = await djangoApi.get(`/tasks/by_status/?status=${status}`);
-    return response.data;
+    return response.data.results;
   }
 
   async getTasksByPriority(priority: string): Promise<Task[]> {
     const response = await djangoApi.get(`/tasks/by_priority/?priority=${priority}`);
-    return response.data;
+    return response.data.results;
   }
 
   // Flask API - Filtering and categories
@@ -6,111 +6,79 @@ Author: Eon (Himanshu Shekhar)
 Email: eonhimanshu@gmail.com
 
 This script tests the user registration, login, and authentication functionality.
+It uses the taskmanager_client package, so all requests share one connection.
 """
 
-import requests
-import json
+import os
 import sys
 
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "client"))
+from taskmanager_client import APIError, Client
+
 # Configuration
 DJANGO_API_URL = "http://localhost:8000/api"
 TEST_USER = {
     "username": "testuser123",
     "email": "test@example.com",
     "password": "SecurePass123!",
-    "password_confirm": "SecurePass123!",
     "first_name": "Test",
     "last_name": "User"
 }
 
-def test_registration():
+def test_registration(api):
     """Test user registration endpoint"""
     print("🧪 Testing User Registration...")
     
     try:
         # Test registration
-        response = requests.post(
-            f"{DJANGO_API_URL}/users/register/",
-            json=TEST_USER,
-            headers={"Content-Type": "application/json"}
-        )
-        
-        print(f"Status Code: {response.status_code}")
-        
-        if response.status_code == 201:
-            data = response.json()
-            print("✅ Registration successful!")
-            print(f"User ID: {data['user']['id']}")
-            print(f"Username: {data['user']['username']}")
-            print(f"Email: {data['user']['email']}")
-            print(f"Access Token: {data['tokens']['access'][:50]}...")
-            return data['tokens']['access']
-        else:
-            print("❌ Registration failed!")
-            print(f"Error: {response.text}")
-            return None
+        user = api.register(**TEST_USER)
+        print("✅ Registration successful!")
+        print(f"User ID: {user['id']}")
+        print(f"Username: {user['username']}")
+        print(f"Email: {user['email']}")
+        print(f"Access Token: {api.tokens['django'].access[:50]}...")
+        return True
             
-    except requests.exceptions.ConnectionError:
+    except APIError as e:
+        print("❌ Registration failed!")
+        print(f"Status Code: {e.status}")
+        print(f"Error: {e.data}")
+        return False
+    except httpx.ConnectError:
         print("❌ Could not connect to Django API. Make sure it's running on port 8000.")
-        return None
+        return False
     except Exception as e:
         print(f"❌ Unexpected error: {e}")
-        return None
+        return False
 
-def test_login(token):
+def test_login(api):
     """Test login with registered user"""
-    if not token:
-        return
-        
     print("\n🔐 Testing Login...")
     
     try:
-        response = requests.post(
-            f"{DJANGO_API_URL}/users/login/",
-            json={
-                "username": TEST_USER["username"],
-                "password": TEST_USER["password"]
-            },
-            headers={"Content-Type": "application/json"}
-        )
-        
-        print(f"Status Code: {response.status_code}")
-        
-        if response.status_code == 200:
-            print("✅ Login successful!")
-        else:
-            print("❌ Login failed!")
-            print(f"Error: {response.text}")
-            
+        api.login(TEST_USER["username"], TEST_USER["password"])
+        print("✅ Login successful!")
+    except APIError as e:
+        print("❌ Login failed!")
+        print(f"Status Code: {e.status}")
+        print(f"Error: {e.data}")
     except Exception as e:
         print(f"❌ Login error: {e}")
 
-def test_protected_endpoint(token):
+def test_protected_endpoint(api):
     """Test accessing protected endpoint"""
-    if not token:
-        return
-        
     print("\n🛡️ Testing Protected Endpoint...")
     
     try:
-        response = requests.get(
-            f"{DJANGO_API_URL}/users/profile/",
-            headers={
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/json"
-            }
-        )
-        
-        print(f"Status Code: {response.status_code}")
-        
-        if response.status_code == 200:
-            data = response.json()
-            print("✅ Protected endpoint accessible!")
-            print(f"User Profile: {data}")
-        else:
-            print("❌ Protected endpoint failed!")
-            print(f"Error: {response.text}")
-            
+        data = api.profile()
+        print("✅ Protected endpoint accessible!")
+        print(f"User Profile: {data}")
+    except APIError as e:
+        print("❌ Protected endpoint failed!")
+        print(f"Status Code: {e.status}")
+        print(f"Error: {e.data}")
     except Exception as e:
         print(f"❌ Protected endpoint error: {e}")
 
@@ -119,14 +87,14 @@ def main():
     print("�� User Registration Test Suite")
     print("=" * 40)
     
-    # Test registration
-    token = test_registration()
-    
-    # Test login
-    test_login(token)
-    
-    # Test protected endpoint
-    test_protected_endpoint(token)
+    with Client({"django": DJANGO_API_URL}) as api:
+        # Test registration
+        if test_registration(api):
+            # Test login
+            test_login(api)
+            
+            # Test protected endpoint
+            test_protected_endpoint(api)
     
     print("\n" + "=" * 40)
     print("🏁 Test suite completed!")